@@ -0,0 +1 @@
+"""Benchmarks and load tests (run as ``python -m benchmarks.<name>``; not part of pytest)."""
@@ -0,0 +1,149 @@
+"""Peak memory and event-loop blocking of the catalog download and parse.
+
+Compares the previous path (``response.json()`` and then walking the whole
+tree on the loop) with the streaming parser used by ``_fetch_catalog``,
+on a large synthetic func=7 payload delivered in network-sized chunks::
+
+    PYTHONPATH=src uv run python -m benchmarks.catalog_parse --stops 4000 --lines 80
+
+Each variant runs in its own subprocess so peak RSS (``ru_maxrss``) is not
+polluted by the other one. The loop is probed with a 1 ms ticker: its
+longest delay is the longest time requests would have waited. Swapping
+the catalog in (views, pre-rendered bodies) is identical in both paths
+and is left out.
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from collections.abc import AsyncIterator
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+
+from app.core.config import Settings
+from app.services.catalog import build_catalog_index
+from app.services.transit import TransitService
+from benchmarks.fake_itranvias import generate_catalog
+
+VARIANTS = ("legacy", "stream")
+NETWORK_CHUNK_BYTES = 16 * 1024
+
+
+class _ChunkedBody(httpx.AsyncByteStream):
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for start in range(0, len(self.body), NETWORK_CHUNK_BYTES):
+            yield self.body[start : start + NETWORK_CHUNK_BYTES]
+            await asyncio.sleep(0)
+
+
+async def _legacy(service: TransitService) -> None:
+    payload = await service._fetch_json(service.settings.stops_source_url)
+    actualizacion = payload.get("iTranvias", {}).get("actualizacion", {})
+    stops = [service._map_stop(item) for item in actualizacion.get("paradas", [])]
+    entries = service._parse_line_entries(actualizacion.get("lineas", []))
+    lines = service._build_line_catalog(entries)
+    build_catalog_index(stops, lines)
+
+
+async def _stream(service: TransitService) -> None:
+    stops, entries = await service._fetch_catalog()
+    lines = await asyncio.to_thread(service._build_line_catalog, entries)
+    await asyncio.to_thread(build_catalog_index, stops, lines)
+
+
+async def _measure(variant: str, body: bytes) -> dict[str, float]:
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=_ChunkedBody(body)))
+    service = TransitService(settings=Settings(), transport=transport)
+    load = _legacy if variant == "legacy" else _stream
+    delays: list[float] = []
+
+    async def ticker() -> None:
+        while True:
+            started = perf_counter()
+            await asyncio.sleep(0.001)
+            delays.append(perf_counter() - started - 0.001)
+
+    probe = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = perf_counter()
+    await load(service)
+    elapsed = perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Deja que el ticker registre el retraso del último bloqueo antes de pararlo.
+    await asyncio.sleep(0.01)
+    probe.cancel()
+
+    # Segunda pasada sólo para el pico de memoria Python (tracemalloc ralentiza).
+    tracemalloc.start()
+    await load(service)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await service.close()
+
+    ordered = sorted(delays)
+    return {
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "max_loop_block_ms": round(max(delays) * 1000, 2),
+        "p99_loop_block_ms": round(ordered[int(0.99 * (len(ordered) - 1))] * 1000, 2),
+        # ru_maxrss está en KiB en Linux.
+        "peak_rss_growth_mb": round((rss_after - rss_before) / 1024, 1),
+        "traced_peak_mb": round(traced_peak / 2**20, 1),
+    }
+
+
+def _run_variant(variant: str, body_path: Path) -> dict[str, float]:
+    command = [sys.executable, "-m", "benchmarks.catalog_parse", "--variant", variant]
+    output = subprocess.run(
+        [*command, "--body", str(body_path)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stops", type=int, default=4000)
+    parser.add_argument("--lines", type=int, default=80)
+    parser.add_argument("--stops-per-route", type=int, default=80)
+    parser.add_argument("--json", type=Path, help="guardar los resultados en este fichero")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument("--body", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(asyncio.run(_measure(args.variant, args.body.read_bytes()))))
+        return
+
+    catalog = generate_catalog(
+        stops=args.stops, lines=args.lines, stops_per_route=args.stops_per_route
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        body_path = Path(tmp) / "func7.json"
+        body_path.write_bytes(json.dumps(catalog).encode())
+        size_mb = body_path.stat().st_size / 2**20
+        results = {variant: _run_variant(variant, body_path) for variant in VARIANTS}
+
+    print(f"func=7 payload {size_mb:.1f} MB ({args.stops} stops, {args.lines} lines)")
+    metrics = list(results["legacy"])
+    print(f"  {'':<20} " + " ".join(f"{variant:>10}" for variant in VARIANTS))
+    for metric in metrics:
+        print(f"  {metric:<20} " + " ".join(f"{results[v][metric]:>10}" for v in VARIANTS))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
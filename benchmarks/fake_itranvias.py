@@ -0,0 +1,212 @@
+"""Local stand-in for the itranvias API.
+
+Serves ``func=7`` (stop and line catalog) and ``func=0`` (arrivals for
+``dato=<stop_id>``) with configurable latency and error rate. Payloads are
+either recorded JSON files or a deterministic synthetic network of about
+the size of A Coruña's. Use it in-process through
+``httpx.ASGITransport(app=FakeItranvias(...))`` or as a real server::
+
+    PYTHONPATH=src uv run python -m benchmarks.fake_itranvias --port 8081 --latency 0.05
+
+and point ``STOPS_SOURCE_URL`` / ``ARRIVALS_URL_TEMPLATE`` at
+``http://127.0.0.1:8081/queryitr_v3.php?func=7`` and
+``http://127.0.0.1:8081/queryitr_v3.php?func=0&dato={stop_id}``.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs
+
+from starlette.types import Receive, Scope, Send
+
+CITY_CENTER = (43.3623, -8.4115)
+LINE_NAMES = (
+    "1", "1A", "2", "2A", "3", "3A", "4", "5", "6", "6A", "7", "11", "12", "12A",
+    "14", "17", "20", "21", "22", "23", "23A", "24", "25", "26",
+)  # fmt: skip
+STREET_KINDS = ("Avenida", "Rúa", "Praza", "Ronda", "Estrada", "Paseo")
+STREET_NAMES = (
+    "Finisterre", "Os Mallos", "Linares Rivas", "Alfonso Molina", "San Andrés", "Riazor",
+    "Matogrande", "Elviña", "Monte Alto", "Castrillón", "Juan Flórez", "Cuatro Caminos",
+    "Obelisco", "Pastoriza", "Arteixo", "Oza", "Santa Margarita", "Emilio González López",
+    "Ramón y Cajal", "Pontevedra", "Mesoiro", "Eirís", "Someso", "Labañou", "Catro Camiños",
+)  # fmt: skip
+
+
+def generate_catalog(
+    stops: int = 600, lines: int = 24, stops_per_route: int = 40, seed: int = 7
+) -> dict[str, Any]:
+    """Synthetic ``func=7`` payload with two routes (ida/vuelta) per line."""
+    rng = random.Random(seed)
+    stop_ids = list(range(1, stops + 1))
+    line_ids = [100 + index for index in range(lines)]
+    names = [*LINE_NAMES, *(str(30 + index) for index in range(max(0, lines - len(LINE_NAMES))))]
+
+    enlaces: dict[int, list[int]] = {stop_id: [] for stop_id in stop_ids}
+    lineas = []
+    for line_id, name in zip(line_ids, names, strict=False):
+        ida = rng.sample(stop_ids, min(stops_per_route, stops))
+        vuelta = list(reversed(ida[1:])) + rng.sample(stop_ids, 2)
+        for stop_id in {*ida, *vuelta}:
+            enlaces[stop_id].append(line_id)
+        lineas.append(
+            {
+                "id": line_id,
+                "lin_comer": name,
+                "color": f"{rng.randrange(0x1000000):06X}",
+                "rutas": [{"paradas": ida}, {"paradas": vuelta}],
+            }
+        )
+
+    paradas = [
+        {
+            "id": stop_id,
+            "nombre": f"{rng.choice(STREET_KINDS)} {rng.choice(STREET_NAMES)} {rng.randint(1, 250)}",
+            "posx": round(CITY_CENTER[1] + rng.uniform(-0.04, 0.04), 6),
+            "posy": round(CITY_CENTER[0] + rng.uniform(-0.03, 0.03), 6),
+            "enlaces": enlaces[stop_id],
+        }
+        for stop_id in stop_ids
+    ]
+    return {"iTranvias": {"actualizacion": {"paradas": paradas, "lineas": lineas}}}
+
+
+def generate_arrivals(line_ids: list[int], rng: random.Random, buses: int = 3) -> dict[str, Any]:
+    """Synthetic ``func=0`` payload for a stop served by ``line_ids``."""
+    return {
+        "buses": {
+            "lineas": [
+                {
+                    "linea": str(line_id),
+                    "buses": [
+                        {
+                            "bus": str(rng.randint(1000, 9999)),
+                            "tiempo": str(rng.randint(0, 40)) if rng.random() > 0.1 else "----",
+                            "distancia": str(rng.randint(50, 8000)),
+                            "estado": str(rng.randint(0, 1)),
+                            "ult_parada": str(rng.randint(1, 600)),
+                        }
+                        for _ in range(buses)
+                    ],
+                }
+                for line_id in line_ids
+            ]
+        }
+    }
+
+
+class FakeItranvias:
+    """ASGI app emulating ``queryitr_v3.php``.
+
+    ``latency_seconds`` (plus up to ``jitter_seconds``) is awaited before
+    each response and ``error_rate`` of the requests answer 503. Served
+    requests are counted per ``func`` in :attr:`requests`.
+    """
+
+    def __init__(
+        self,
+        catalog: dict[str, Any] | None = None,
+        arrivals: dict[str, Any] | None = None,
+        latency_seconds: float = 0.0,
+        jitter_seconds: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 7,
+    ) -> None:
+        self.catalog = catalog if catalog is not None else generate_catalog(seed=seed)
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.error_rate = error_rate
+        self.requests: Counter[str] = Counter()
+        self._rng = random.Random(seed)
+        self._catalog_body = json.dumps(self.catalog).encode()
+        self._fixed_arrivals = json.dumps(arrivals).encode() if arrivals is not None else None
+        self._stop_lines = {
+            int(stop["id"]): [int(line) for line in stop.get("enlaces", [])]
+            for stop in self.catalog["iTranvias"]["actualizacion"]["paradas"]
+        }
+
+    @classmethod
+    def from_files(cls, catalog_path: Path, arrivals_path: Path | None = None, **kwargs: Any):
+        """Serve recorded payloads (e.g. saved with ``curl`` from itranvias)."""
+        catalog = json.loads(catalog_path.read_text())
+        arrivals = json.loads(arrivals_path.read_text()) if arrivals_path else None
+        return cls(catalog=catalog, arrivals=arrivals, **kwargs)
+
+    @property
+    def stop_ids(self) -> list[int]:
+        return list(self._stop_lines)
+
+    def _arrivals_body(self, stop_id: int) -> bytes:
+        if self._fixed_arrivals is not None:
+            return self._fixed_arrivals
+        return json.dumps(generate_arrivals(self._stop_lines.get(stop_id, []), self._rng)).encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return
+        query = parse_qs(scope.get("query_string", b"").decode())
+        func = query.get("func", [""])[0]
+        self.requests[func] += 1
+
+        delay = self.latency_seconds + self._rng.uniform(0, self.jitter_seconds)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        status, body = 200, b""
+        if self._rng.random() < self.error_rate:
+            status, body = 503, b"Service Unavailable"
+        elif func == "7":
+            body = self._catalog_body
+        elif func == "0":
+            try:
+                body = self._arrivals_body(int(query.get("dato", [""])[0]))
+            except ValueError:
+                status, body = 400, b"Bad Request"
+        else:
+            status, body = 404, b"Not Found"
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos por respuesta")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--catalog", type=Path, help="func=7 grabado (JSON)")
+    parser.add_argument("--arrivals", type=Path, help="func=0 grabado (JSON)")
+    args = parser.parse_args()
+
+    options = {
+        "latency_seconds": args.latency,
+        "jitter_seconds": args.jitter,
+        "error_rate": args.error_rate,
+    }
+    if args.catalog:
+        app = FakeItranvias.from_files(args.catalog, args.arrivals, **options)
+    else:
+        app = FakeItranvias(**options)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
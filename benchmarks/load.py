@@ -0,0 +1,202 @@
+"""End-to-end load test reporting latency percentiles and throughput.
+
+By default the whole app runs in-process (``httpx.ASGITransport``) with
+its upstream replaced by the fake itranvias app, so the numbers reflect
+this code base and not the network::
+
+    PYTHONPATH=src uv run python -m benchmarks.load --duration 10 --concurrency 50
+    PYTHONPATH=src uv run python -m benchmarks.load --url http://127.0.0.1:8000
+
+The request mix follows the UI: mostly arrivals, then searches, stop
+details, nearby stops and health checks. ``--check`` compares p99,
+throughput and error rate with ``benchmarks/thresholds.json``.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import sys
+from collections import defaultdict
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+
+from app.core.config import Settings
+from app.main import app
+from app.services.transit import TransitService, get_transit_service
+from benchmarks.fake_itranvias import FakeItranvias
+
+SEARCH_QUERIES = ("riazor", "os mallos", "avenida", "rua", "praza", "elviña", "cuatro")
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Scenario:
+    """Weighted request mix; stop ids come from the served catalog."""
+
+    def __init__(self, stop_ids: list[int], seed: int) -> None:
+        self.stop_ids = stop_ids
+        self.rng = random.Random(seed)
+        self.routes = (
+            ("arrivals", 60, lambda: f"/api/stops/{self._stop()}/arrivals"),
+            ("search", 20, lambda: f"/api/stops?q={self.rng.choice(SEARCH_QUERIES)}"),
+            ("stop", 10, lambda: f"/api/stops/{self._stop()}"),
+            ("nearby", 5, lambda: "/api/stops/nearby?lat=43.3623&lon=-8.4115&radius=800"),
+            ("health", 5, lambda: "/health"),
+        )
+        self._weights = [weight for _, weight, _ in self.routes]
+
+    def _stop(self) -> int:
+        return self.rng.choice(self.stop_ids)
+
+    def next(self) -> tuple[str, str]:
+        name, _, build = self.rng.choices(self.routes, weights=self._weights)[0]
+        return name, build()
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    deadline: float,
+    latencies: dict[str, list[float]],
+    errors: dict[str, int],
+) -> None:
+    while perf_counter() < deadline:
+        name, path = scenario.next()
+        started = perf_counter()
+        try:
+            response = await client.get(path)
+            failed = response.status_code >= 500
+        except httpx.HTTPError:
+            failed = True
+        latencies[name].append((perf_counter() - started) * 1000)
+        if failed:
+            errors[name] += 1
+
+
+async def run(
+    duration: float, concurrency: int, url: str | None, latency: float, error_rate: float
+) -> dict[str, object]:
+    service: TransitService | None = None
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=30)
+        stops = (await client.get("/api/stops", params={"limit": 200})).json()["stops"]
+        stop_ids = [stop["id"] for stop in stops]
+    else:
+        upstream = FakeItranvias(
+            latency_seconds=latency, jitter_seconds=latency / 2, error_rate=error_rate
+        )
+        service = TransitService(settings=Settings(), transport=httpx.ASGITransport(app=upstream))
+        app.dependency_overrides[get_transit_service] = lambda: service
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30
+        )
+        stop_ids = [stop.id for stop in (await service._load_stops()).interest_stops]
+
+    scenario = Scenario(stop_ids, seed=1)
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    started = perf_counter()
+    try:
+        await asyncio.gather(
+            *(
+                _worker(client, scenario, started + duration, latencies, errors)
+                for _ in range(concurrency)
+            )
+        )
+    finally:
+        elapsed = perf_counter() - started
+        await client.aclose()
+        if service is not None:
+            app.dependency_overrides.clear()
+            await service.close()
+
+    every = [value for values in latencies.values() for value in values]
+    total = len(every)
+
+    def summary(values: list[float]) -> dict[str, float]:
+        return {
+            "requests": len(values),
+            "p50_ms": round(percentile(values, 0.50), 2),
+            "p95_ms": round(percentile(values, 0.95), 2),
+            "p99_ms": round(percentile(values, 0.99), 2),
+            "mean_ms": round(statistics.fmean(values), 2) if values else 0.0,
+        }
+
+    return {
+        **summary(every),
+        "rps": round(total / elapsed, 1),
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "routes": {name: summary(values) for name, values in sorted(latencies.items())},
+    }
+
+
+def check(results: dict[str, object], limits: dict[str, float], tolerance: float) -> list[str]:
+    failures = []
+    p99 = float(results["p99_ms"])  # type: ignore[arg-type]
+    rps = float(results["rps"])  # type: ignore[arg-type]
+    error_rate = float(results["error_rate"])  # type: ignore[arg-type]
+    if "max_p99_ms" in limits and p99 > limits["max_p99_ms"] * tolerance:
+        failures.append(f"p99 {p99} ms > {limits['max_p99_ms'] * tolerance} ms")
+    if "min_rps" in limits and rps < limits["min_rps"] / tolerance:
+        failures.append(f"throughput {rps} req/s < {limits['min_rps'] / tolerance} req/s")
+    if "max_error_rate" in limits and error_rate > limits["max_error_rate"]:
+        failures.append(f"error rate {error_rate} > {limits['max_error_rate']}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--url", help="servidor ya arrancado en lugar de la app en proceso")
+    parser.add_argument("--upstream-latency", type=float, default=0.03, help="segundos")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", type=Path, help="guardar los resultados en este fichero")
+    parser.add_argument("--check", type=Path, help="thresholds.json con los límites")
+    parser.add_argument("--tolerance", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # Las líneas de log de cada petición distorsionarían la medida.
+    logging.getLogger().setLevel(logging.WARNING)
+    results = asyncio.run(
+        run(
+            args.duration,
+            args.concurrency,
+            args.url,
+            args.upstream_latency,
+            args.upstream_error_rate,
+        )
+    )
+    print(
+        f"{results['requests']} requests in {args.duration:.0f}s, {results['rps']} req/s, "
+        f"errors {results['error_rate']:.2%}"
+    )
+    print(f"  {'route':<10} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, route in [("all", results), *results["routes"].items()]:  # type: ignore[union-attr]
+        print(
+            f"  {name:<10} {route['requests']:>8} {route['p50_ms']:>8} "
+            f"{route['p95_ms']:>8} {route['p99_ms']:>8}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.check:
+        limits = json.loads(args.check.read_text())["load"]
+        failures = check(results, limits, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Cost of a log call on the calling thread (i.e. on the event loop).
+
+Compares a synchronous ``StreamHandler`` with the JSON formatter (the
+previous setup) against the queue handler configured as ``setup_logging``
+does,
+writing either to ``/dev/null`` or to a slow sink that stands in for a
+congested stderr pipe (journald, docker logs), plus a disabled debug call
+with lazy arguments::
+
+    PYTHONPATH=src uv run python -m benchmarks.logging_overhead
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import statistics
+from collections.abc import Callable
+from time import perf_counter, sleep
+
+from app.core.logging import ContextQueueHandler, JsonLogFormatter
+
+
+def _measure(emit: Callable[[int], None], records: int) -> float:
+    rounds = []
+    for _ in range(5):
+        started = perf_counter()
+        for i in range(records):
+            emit(i)
+        rounds.append((perf_counter() - started) / records * 1_000_000)
+    return statistics.median(rounds)
+
+
+class SlowSink:
+    """Stream whose writes block like a full pipe."""
+
+    def __init__(self, delay_seconds: float) -> None:
+        self.delay_seconds = delay_seconds
+
+    def write(self, _: str) -> None:
+        sleep(self.delay_seconds)
+
+    def flush(self) -> None:
+        pass
+
+
+def main(records: int) -> None:
+    devnull = open(os.devnull, "w")
+    logger = logging.getLogger("bench")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    sync = logging.StreamHandler(devnull)
+    sync.setFormatter(JsonLogFormatter())
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queued = ContextQueueHandler(log_queue)
+    writer = logging.handlers.QueueListener(log_queue, sync)
+
+    def info(i: int) -> None:
+        logger.info("Serving stale arrivals for %s", i, extra={"stop_id": i, "age_seconds": 1.5})
+
+    def debug_disabled(i: int) -> None:
+        logger.debug("Parada %s, Línea %s: is_ida=%s", i, 3, True)
+
+    slow = logging.StreamHandler(SlowSink(0.0002))
+    slow.setFormatter(JsonLogFormatter())
+    slow_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    slow_writer = logging.handlers.QueueListener(slow_queue, slow)
+
+    results = {}
+    logger.handlers = [sync]
+    results["sync, /dev/null"] = _measure(info, records)
+    logger.handlers = [slow]
+    results["sync, slow sink"] = _measure(info, records // 20)
+
+    # A partir de aquí, como tras setup_logging().
+    logger.handlers = [queued]
+    writer.start()
+    results["queue, /dev/null"] = _measure(info, records)
+    writer.stop()
+    logger.handlers = [ContextQueueHandler(slow_queue)]
+    slow_writer.start()
+    results["queue, slow sink"] = _measure(info, records // 20)
+    slow_writer.stop()
+    results["debug disabled (lazy)"] = _measure(debug_disabled, records)
+    devnull.close()
+
+    print("microseconds per call on the calling thread (median of 5 rounds)")
+    for name, value in results.items():
+        print(f"  {name:<24} {value:7.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    main(parser.parse_args().records)
@@ -0,0 +1,166 @@
+"""Microbenchmarks of the service hot paths on a realistic catalog.
+
+Times ``_load_stops`` (cold download + parse + indexes, and warm), the
+line catalog build, ``search_stops``, ``get_arrivals`` (cache hit and
+miss), and the arrivals normalization and serialization on their own
+against the fake itranvias app::
+
+    PYTHONPATH=src uv run python -m benchmarks.micro
+    PYTHONPATH=src uv run python -m benchmarks.micro --check benchmarks/thresholds.json
+
+With ``--check`` the run fails when a median exceeds its limit (in
+microseconds per operation) times ``--tolerance``.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+
+from app.core.config import Settings
+from app.services.arrivals import arrivals_json, normalize_arrivals
+from app.services.transit import TransitService
+from benchmarks.fake_itranvias import FakeItranvias, generate_arrivals, generate_catalog
+
+SEARCH_QUERIES = ("riazor", "os mallos", "avda", "a", "linares rivas 1", "emilio gonzalez", "zzz")
+
+
+def _median_us(samples: list[float], operations: int) -> float:
+    return statistics.median(samples) / operations * 1_000_000
+
+
+def bench_sync(fn: Callable[[], object], operations: int, rounds: int) -> float:
+    fn()
+    samples = []
+    for _ in range(rounds):
+        started = perf_counter()
+        for _ in range(operations):
+            fn()
+        samples.append(perf_counter() - started)
+    return _median_us(samples, operations)
+
+
+async def bench_async(fn: Callable[[], Awaitable[object]], operations: int, rounds: int) -> float:
+    await fn()
+    samples = []
+    for _ in range(rounds):
+        started = perf_counter()
+        for _ in range(operations):
+            await fn()
+        samples.append(perf_counter() - started)
+    return _median_us(samples, operations)
+
+
+def _service(upstream: FakeItranvias, **overrides: object) -> TransitService:
+    settings = Settings(**overrides)  # type: ignore[arg-type]
+    return TransitService(settings=settings, transport=httpx.ASGITransport(app=upstream))
+
+
+async def run(stops: int, rounds: int) -> dict[str, float]:
+    catalog = generate_catalog(stops=stops)
+    upstream = FakeItranvias(catalog=catalog)
+    service = _service(upstream)
+    uncached = _service(upstream, ARRIVALS_CACHE_TTL_SECONDS=0, ARRIVALS_STALE_MAX_AGE_SECONDS=0)
+    results: dict[str, float] = {}
+    try:
+
+        async def cold_load() -> None:
+            fresh = _service(upstream)
+            await fresh._load_stops()
+            await fresh.close()
+
+        results["load_stops_cold"] = await bench_async(cold_load, 1, rounds)
+        index = await service._load_stops()
+        await uncached._load_stops()
+        results["load_stops_warm"] = await bench_async(service._load_stops, 1000, rounds)
+
+        lines_raw = catalog["iTranvias"]["actualizacion"]["lineas"]
+        results["build_line_catalog"] = bench_sync(
+            lambda: service._build_line_catalog(service._parse_line_entries(lines_raw)), 10, rounds
+        )
+
+        async def search_all() -> None:
+            for query in SEARCH_QUERIES:
+                await service.search_stops(query, 50)
+
+        results["search_stops"] = await bench_async(search_all, 50, rounds) / len(SEARCH_QUERIES)
+
+        stop_ids = [stop.id for stop in index.interest_stops][:50]
+
+        async def arrivals(target: TransitService) -> None:
+            for stop_id in stop_ids:
+                await target.get_arrivals(stop_id)
+
+        results["get_arrivals_hit"] = await bench_async(
+            lambda: arrivals(service), 10, rounds
+        ) / len(stop_ids)
+        results["get_arrivals_miss"] = await bench_async(
+            lambda: arrivals(uncached), 1, rounds
+        ) / len(stop_ids)
+
+        # Payloads func=0 realistas: las líneas de cada parada, 3 buses y ~10 % sin ETA.
+        rng = random.Random(3)
+        payloads = [
+            (stop.id, generate_arrivals(list(stop.lines), rng)["buses"]["lineas"])
+            for stop in index.interest_stops[:50]
+        ]
+        responses = [normalize_arrivals(stop_id, raw, index.lines) for stop_id, raw in payloads]
+
+        def normalize() -> None:
+            for stop_id, raw in payloads:
+                normalize_arrivals(stop_id, raw, index.lines)
+
+        def serialize() -> None:
+            for response in responses:
+                arrivals_json(response)
+
+        results["normalize_arrivals"] = bench_sync(normalize, 10, rounds) / len(payloads)
+        results["serialize_arrivals"] = bench_sync(serialize, 10, rounds) / len(responses)
+    finally:
+        await service.close()
+        await uncached.close()
+    return results
+
+
+def check(results: dict[str, float], limits: dict[str, float], tolerance: float) -> list[str]:
+    failures = []
+    for name, limit in limits.items():
+        value = results.get(name)
+        if value is not None and value > limit * tolerance:
+            failures.append(f"{name}: {value:.1f} us > {limit * tolerance:.1f} us")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stops", type=int, default=600)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--json", type=Path, help="guardar los resultados en este fichero")
+    parser.add_argument("--check", type=Path, help="thresholds.json con los límites")
+    parser.add_argument("--tolerance", type=float, default=1.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.stops, args.rounds))
+    print(f"microseconds per operation ({args.stops} stops, median of {args.rounds} rounds)")
+    for name, value in results.items():
+        print(f"  {name:<24} {value:12.2f}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.check:
+        limits = json.loads(args.check.read_text())["micro"]
+        failures = check(results, limits, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
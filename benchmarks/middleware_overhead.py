@@ -0,0 +1,138 @@
+"""Per-request overhead of the request-id middleware.
+
+Compares the app with no request-id middleware, the previous
+``BaseHTTPMiddleware`` implementation and the current pure ASGI one, on
+``/health`` and ``/api/stops/{id}/arrivals`` (served from the arrivals
+cache). Requests are driven straight through the ASGI interface so the
+numbers are not diluted by an HTTP client::
+
+    PYTHONPATH=src uv run python -m benchmarks.middleware_overhead
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import uuid
+from collections.abc import Callable
+from time import perf_counter
+
+import httpx
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message
+
+from app.core.config import get_settings
+from app.core.logging import request_id_ctx
+from app.core.middleware import RequestIdMiddleware
+from app.main import app
+from app.services.transit import TransitService, get_transit_service
+from benchmarks.fake_itranvias import FakeItranvias
+
+STOP_ID = 42
+
+
+class LegacyRequestIdMiddleware(BaseHTTPMiddleware):
+    """The implementation replaced by the pure ASGI middleware (for comparison)."""
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        header_name = get_settings().request_id_header
+        request_id = request.headers.get(header_name, str(uuid.uuid4()))
+        token = request_id_ctx.set(request_id)
+        try:
+            response = await call_next(request)
+        finally:
+            request_id_ctx.reset(token)
+        response.headers[header_name] = request_id
+        return response
+
+
+def _build_stack(base: list[Middleware], request_id_middleware: type | None) -> ASGIApp:
+    # Misma pila que en producción cambiando sólo el middleware de correlación.
+    middleware = [m for m in base if m.cls is not RequestIdMiddleware]
+    if request_id_middleware is not None:
+        middleware.insert(len(middleware) - 1, Middleware(request_id_middleware))
+    app.user_middleware = middleware
+    return app.build_middleware_stack()
+
+
+async def _request(stack: ASGIApp, path: str) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+        "app": app,
+    }
+    sent = False
+
+    async def receive() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}  # pragma: no cover
+
+    async def send(message: Message) -> None:
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"{path} returned {message['status']}")
+
+    await stack(scope, receive, send)
+
+
+async def _measure(stack: ASGIApp, path: str, requests: int) -> list[float]:
+    for _ in range(min(200, requests)):
+        await _request(stack, path)
+    timings = []
+    for _ in range(requests):
+        started = perf_counter()
+        await _request(stack, path)
+        timings.append((perf_counter() - started) * 1_000_000)
+    return timings
+
+
+async def main(requests: int) -> None:
+    service = TransitService(transport=httpx.ASGITransport(app=FakeItranvias()))
+    app.dependency_overrides[get_transit_service] = lambda: service
+    original = list(app.user_middleware)
+    variants: dict[str, Callable[[], ASGIApp]] = {
+        "none": lambda: _build_stack(original, None),
+        "base_http (old)": lambda: _build_stack(original, LegacyRequestIdMiddleware),
+        "pure_asgi (new)": lambda: _build_stack(original, RequestIdMiddleware),
+    }
+    try:
+        for path in ("/health", f"/api/stops/{STOP_ID}/arrivals"):
+            print(f"\n{path}  ({requests} requests, microseconds per request)")
+            baseline = None
+            for name, build in variants.items():
+                timings = await _measure(build(), path, requests)
+                median = statistics.median(timings)
+                baseline = median if baseline is None else baseline
+                print(
+                    f"  {name:<16} median {median:8.1f}  p95 "
+                    f"{statistics.quantiles(timings, n=20)[-1]:8.1f}  "
+                    f"overhead {median - baseline:+8.1f}"
+                )
+    finally:
+        app.user_middleware = original
+        app.dependency_overrides.clear()
+        await service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(main(args.requests))
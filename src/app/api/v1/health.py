@@ -1,14 +1,39 @@
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import Response
 
-from app.models.common import HealthResponse, SumResponse
+from app.core.metrics import CATALOG_AGE, CIRCUIT_OPEN, CONTENT_TYPE, REGISTRY
+from app.models.common import HealthResponse, SumResponse, UpstreamHealth
+from app.services.transit import TransitService, get_transit_service
 
 router = APIRouter(tags=["health"])
 
 
 @router.get("/health", response_model=HealthResponse)
-async def health(request: Request) -> HealthResponse:
+async def health(
+    request: Request,
+    service: TransitService = Depends(get_transit_service),
+) -> HealthResponse:
     version = request.app.version or "0.0.0"
-    return HealthResponse(version=str(version))
+    age = service.catalog_age_seconds
+    upstream = UpstreamHealth(**service.breaker.snapshot())
+    return HealthResponse(
+        status="ok" if upstream.state == "closed" else "degraded",
+        version=str(version),
+        catalog_age_seconds=round(age, 1) if age is not None else None,
+        upstream=upstream,
+    )
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(service: TransitService = Depends(get_transit_service)) -> Response:
+    """Prometheus text exposition of the in-process metrics."""
+    # Los valores derivados del estado se calculan al raspar, no en cada petición.
+    age = service.catalog_age_seconds
+    CATALOG_AGE.set(round(age, 1) if age is not None else -1)
+    CIRCUIT_OPEN.set(0 if service.breaker.state == "closed" else 1)
+    return Response(
+        REGISTRY.render(), media_type=CONTENT_TYPE, headers={"Cache-Control": "no-store"}
+    )
 
 
 @router.get("/sum", response_model=SumResponse)
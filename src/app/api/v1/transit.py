@@ -1,42 +1,188 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import asyncio
+import json
+from collections.abc import AsyncIterator
 
-from app.models.transit import ArrivalsResponse, StopSearchResponse, StopSummary
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+from app.core.app_config import DEFAULT_PROFILE
+from app.core.http_cache import is_not_modified, make_etag, not_modified, rendered_response
+from app.models.transit import (
+    ArrivalsResponse,
+    BatchArrivalsResponse,
+    NearbyStopsResponse,
+    StopSearchResponse,
+    StopSummary,
+)
+from app.services.live import LiveError
 from app.services.transit import TransitService, TransitServiceError, get_transit_service
 
 router = APIRouter(prefix="/api", tags=["transit"])
 
+# El catálogo cambia muy poco: los navegadores y Nginx pueden reutilizarlo unos minutos
+# y después revalidar con If-None-Match.
+CATALOG_CACHE_CONTROL = "public, max-age=300"
+
+
+def get_profile(request: Request, service: TransitService = Depends(get_transit_service)) -> str:
+    """Profile selected by the ``/p/{profile}`` prefix (see ``ProfilePrefixMiddleware``)."""
+    profile = getattr(request.state, "profile", DEFAULT_PROFILE)
+    if not service.has_profile(profile):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="profile_not_found")
+    return profile
+
 
 @router.get("/stops", response_model=StopSearchResponse)
 async def search_stops(
+    request: Request,
+    response: Response,
     q: str | None = Query(None, description="Fragmento del nombre de la parada"),
     limit: int = Query(50, ge=1, le=400),
     service: TransitService = Depends(get_transit_service),
-) -> StopSearchResponse:
-    stops = await service.search_stops(q, limit=limit)
+    profile: str = Depends(get_profile),
+) -> StopSearchResponse | Response:
+    if not q or not q.strip():
+        rendered = await service.get_rendered_catalog(profile)
+        return rendered_response(request, rendered.stop_list(limit), CATALOG_CACHE_CONTROL)
+
+    etag = make_etag(await service.get_catalog_version(profile), q, str(limit))
+    if is_not_modified(request, etag):
+        return not_modified(etag, CATALOG_CACHE_CONTROL)
+    stops = await service.search_stops(q, limit=limit, profile=profile)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CATALOG_CACHE_CONTROL
     return StopSearchResponse(total=len(stops), stops=stops)
 
 
+@router.get("/stops/nearby", response_model=NearbyStopsResponse)
+async def nearby_stops(
+    request: Request,
+    response: Response,
+    lat: float = Query(..., ge=-90, le=90, description="Latitud"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitud"),
+    radius: float = Query(500, gt=0, le=5000, description="Radio en metros"),
+    limit: int = Query(10, ge=1, le=50),
+    service: TransitService = Depends(get_transit_service),
+    profile: str = Depends(get_profile),
+) -> NearbyStopsResponse | Response:
+    etag = make_etag(
+        await service.get_catalog_version(profile), "nearby", f"{lat},{lon},{radius},{limit}"
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag, CATALOG_CACHE_CONTROL)
+    stops = await service.nearby_stops(lat, lon, radius, limit=limit, profile=profile)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CATALOG_CACHE_CONTROL
+    return NearbyStopsResponse(total=len(stops), stops=stops)
+
+
 @router.get("/stops/{stop_id}", response_model=StopSummary)
 async def get_stop_details(
     stop_id: int,
+    request: Request,
     service: TransitService = Depends(get_transit_service),
-) -> StopSummary:
-    stop = await service.get_stop(stop_id)
-    if not stop:
+    profile: str = Depends(get_profile),
+) -> Response:
+    rendered = await service.get_rendered_catalog(profile)
+    body = rendered.stop_detail(stop_id)
+    if body is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="stop_not_found")
-    return stop
+    return rendered_response(request, body, CATALOG_CACHE_CONTROL)
 
 
 @router.get("/stops/{stop_id}/arrivals", response_model=ArrivalsResponse)
 async def get_stop_arrivals(
     stop_id: int,
+    request: Request,
     service: TransitService = Depends(get_transit_service),
-) -> ArrivalsResponse:
-    stop = await service.get_stop(stop_id)
+    profile: str = Depends(get_profile),
+) -> Response:
+    stop = await service.get_stop(stop_id, profile)
     if not stop:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="stop_not_found")
 
     try:
-        return await service.get_arrivals(stop_id)
+        arrivals = await service.get_arrivals(stop_id, profile)
     except TransitServiceError as exc:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
+
+    body = service.arrivals_body(arrivals, profile)
+    etag = make_etag(body)
+    if arrivals.stale:
+        # Datos degradados: que el cliente vuelva a preguntar en cuanto pueda.
+        cache_control = "no-cache"
+    else:
+        # Mismo margen que la caché de llegadas: antes de eso el servidor devolvería lo mismo.
+        cache_control = f"public, max-age={int(service.settings.arrivals_cache_ttl_seconds)}"
+    if is_not_modified(request, etag):
+        return not_modified(etag, cache_control)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+@router.get("/stops/{stop_id}/arrivals/stream", response_class=StreamingResponse)
+async def stream_stop_arrivals(
+    stop_id: int,
+    request: Request,
+    service: TransitService = Depends(get_transit_service),
+    profile: str = Depends(get_profile),
+) -> StreamingResponse:
+    """Server-Sent Events: an ``arrivals`` event each time the shared poller refreshes."""
+    stop = await service.get_stop(stop_id, profile)
+    if not stop:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="stop_not_found")
+
+    heartbeat = service.settings.live_heartbeat_seconds
+
+    async def events() -> AsyncIterator[str]:
+        async with service.live.subscribe(stop_id) as updates:
+            while not await request.is_disconnected():
+                try:
+                    update = await asyncio.wait_for(updates.get(), timeout=heartbeat)
+                except TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if isinstance(update, LiveError):
+                    yield _sse("error", json.dumps({"detail": update.detail}))
+                else:
+                    filtered = service.filter_arrivals(update, profile)
+                    yield _sse("arrivals", service.arrivals_body(filtered, profile).decode())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.get("/arrivals", response_model=BatchArrivalsResponse)
+async def get_batch_arrivals(
+    stops: str = Query(..., description="IDs de parada separados por comas", examples=["42,43"]),
+    service: TransitService = Depends(get_transit_service),
+    profile: str = Depends(get_profile),
+) -> Response:
+    try:
+        stop_ids = list(dict.fromkeys(int(item) for item in stops.split(",") if item.strip()))
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_stop_ids"
+        ) from exc
+    if not stop_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_stop_ids")
+    if len(stop_ids) > service.settings.batch_max_stops:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="too_many_stops")
+
+    results = await service.get_arrivals_batch(stop_ids, profile)
+    # Los modelos ya están validados: se serializan directamente sin pasar por response_model.
+    payload = BatchArrivalsResponse(results=results)
+    return Response(
+        content=BatchArrivalsResponse.__pydantic_serializer__.to_json(payload),
+        media_type="application/json",
+    )
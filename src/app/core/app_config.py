@@ -1,19 +1,43 @@
 from __future__ import annotations
 
 import json
+import re
 from functools import lru_cache
 from pathlib import Path
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 from app.core.config import get_settings
 
+DEFAULT_PROFILE = "default"
+PROFILE_NAME_PATTERN = r"^[a-z0-9][a-z0-9_-]{0,39}$"
 
-class AppConfig(BaseModel):
+
+class ProfileConfig(BaseModel):
     primary_stop_id: int = 42
     interest_lines: list[str] = Field(default_factory=lambda: ["3", "3A", "12", "14"])
 
 
+class AppConfig(ProfileConfig):
+    """Default profile (top-level fields) plus named profiles served under ``/p/{name}``."""
+
+    profiles: dict[str, ProfileConfig] = Field(default_factory=dict)
+
+    @field_validator("profiles")
+    @classmethod
+    def _check_profile_names(cls, profiles: dict[str, ProfileConfig]) -> dict[str, ProfileConfig]:
+        for name in profiles:
+            if name == DEFAULT_PROFILE or not re.match(PROFILE_NAME_PATTERN, name):
+                raise ValueError(f"invalid profile name: {name!r}")
+        return profiles
+
+    def all_profiles(self) -> dict[str, ProfileConfig]:
+        default = ProfileConfig(
+            primary_stop_id=self.primary_stop_id, interest_lines=self.interest_lines
+        )
+        return {DEFAULT_PROFILE: default, **self.profiles}
+
+
 @lru_cache
 def load_app_config() -> AppConfig:
     settings = get_settings()
@@ -7,7 +7,7 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     """Application runtime configuration."""
 
-    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore", populate_by_name=True)
 
     env: str = Field(default="dev", validation_alias="ENV")
     api_title: str = Field(default="BusCorunaMayores", validation_alias="API_TITLE")
@@ -21,9 +21,68 @@ class Settings(BaseSettings):
         validation_alias="ARRIVALS_URL_TEMPLATE",
     )
     cache_ttl_seconds: int = Field(default=0, validation_alias="CACHE_TTL_SECONDS")
+    catalog_snapshot_path: str = Field(default="", validation_alias="CATALOG_SNAPSHOT_PATH")
+    catalog_retry_base_seconds: float = Field(
+        default=5.0, validation_alias="CATALOG_RETRY_BASE_SECONDS"
+    )
+    catalog_retry_max_seconds: float = Field(
+        default=300.0, validation_alias="CATALOG_RETRY_MAX_SECONDS"
+    )
+    arrivals_cache_ttl_seconds: float = Field(
+        default=15.0, validation_alias="ARRIVALS_CACHE_TTL_SECONDS"
+    )
+    arrivals_cache_max_entries: int = Field(
+        default=512, validation_alias="ARRIVALS_CACHE_MAX_ENTRIES"
+    )
+    batch_max_stops: int = Field(default=20, validation_alias="BATCH_MAX_STOPS")
+    batch_concurrency: int = Field(default=4, validation_alias="BATCH_CONCURRENCY")
+    live_poll_interval_seconds: float = Field(
+        default=20.0, validation_alias="LIVE_POLL_INTERVAL_SECONDS"
+    )
+    live_heartbeat_seconds: float = Field(default=15.0, validation_alias="LIVE_HEARTBEAT_SECONDS")
     http_timeout_seconds: float = Field(default=8.0, validation_alias="HTTP_TIMEOUT_SECONDS")
+    http_max_connections: int = Field(default=20, validation_alias="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(
+        default=10, validation_alias="HTTP_MAX_KEEPALIVE_CONNECTIONS"
+    )
+    http_keepalive_expiry_seconds: float = Field(
+        default=30.0, validation_alias="HTTP_KEEPALIVE_EXPIRY_SECONDS"
+    )
+    http2_enabled: bool = Field(default=False, validation_alias="HTTP2_ENABLED")
+    circuit_failure_threshold: int = Field(default=5, validation_alias="CIRCUIT_FAILURE_THRESHOLD")
+    circuit_failure_rate: float = Field(default=0.5, validation_alias="CIRCUIT_FAILURE_RATE")
+    circuit_window_seconds: float = Field(default=30.0, validation_alias="CIRCUIT_WINDOW_SECONDS")
+    circuit_open_seconds: float = Field(default=15.0, validation_alias="CIRCUIT_OPEN_SECONDS")
+    circuit_slow_call_seconds: float = Field(
+        default=4.0, validation_alias="CIRCUIT_SLOW_CALL_SECONDS"
+    )
+    arrivals_stale_max_age_seconds: float = Field(
+        default=300.0, validation_alias="ARRIVALS_STALE_MAX_AGE_SECONDS"
+    )
+    upstream_rate_limit: float = Field(default=0.0, validation_alias="UPSTREAM_RATE_LIMIT")
+    upstream_rate_burst: int = Field(default=10, validation_alias="UPSTREAM_RATE_BURST")
+    prefetch_max_stops: int = Field(default=0, validation_alias="PREFETCH_MAX_STOPS")
+    prefetch_min_interval_seconds: float = Field(
+        default=15.0, validation_alias="PREFETCH_MIN_INTERVAL_SECONDS"
+    )
+    prefetch_max_interval_seconds: float = Field(
+        default=120.0, validation_alias="PREFETCH_MAX_INTERVAL_SECONDS"
+    )
+    prefetch_demand_half_life_seconds: float = Field(
+        default=300.0, validation_alias="PREFETCH_DEMAND_HALF_LIFE_SECONDS"
+    )
+    eta_history_size: int = Field(default=6, validation_alias="ETA_HISTORY_SIZE")
+    eta_history_max_age_seconds: float = Field(
+        default=900.0, validation_alias="ETA_HISTORY_MAX_AGE_SECONDS"
+    )
     cors_origins: str = Field(default="*", validation_alias="CORS_ORIGINS")
     request_id_header: str = Field(default="X-Request-ID")
+    shared_cache_path: str = Field(default="", validation_alias="SHARED_CACHE_PATH")
+    log_level: str = Field(default="INFO", validation_alias="LOG_LEVEL")
+    access_log_sample_rate: float = Field(
+        default=1.0, ge=0.0, le=1.0, validation_alias="ACCESS_LOG_SAMPLE_RATE"
+    )
+    request_timing_enabled: bool = Field(default=False, validation_alias="REQUEST_TIMING_ENABLED")
     app_config_path: str = Field(
         default="config/app_config.json", validation_alias="APP_CONFIG_PATH"
     )
@@ -0,0 +1,115 @@
+"""Helpers for ETag / conditional GET handling and pre-rendered bodies."""
+
+import gzip
+import hashlib
+from dataclasses import dataclass
+
+from fastapi import Request, Response, status
+
+try:  # pragma: no cover - optional dependency
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Por debajo de este tamaño comprimir no compensa la cabecera extra.
+MIN_COMPRESS_BYTES = 1024
+# Codificaciones precomprimidas; cada una lleva su propio ETag fuerte.
+CODINGS = ("br", "gzip")
+
+
+def make_etag(*parts: str | bytes) -> str:
+    """Strong ETag from the given parts (catalog version, query, payload...)."""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(part.encode() if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    etag = _identity_etag(etag)
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or _identity_etag(candidate.removeprefix("W/")) == etag:
+            return True
+    return False
+
+
+def coded_etag(etag: str, encoding: str | None) -> str:
+    """ETag of the ``encoding`` variant of a body (the same one for identity)."""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def _identity_etag(etag: str) -> str:
+    # Cualquier variante guardada por el cliente sigue valiendo si el cuerpo no cambió.
+    for coding in CODINGS:
+        suffix = f'-{coding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"},
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class RenderedBody:
+    """A response body serialized once, with precompressed variants."""
+
+    content: bytes
+    etag: str
+    media_type: str = "application/json"
+    gzip_content: bytes | None = None
+    br_content: bytes | None = None
+
+    @classmethod
+    def render(
+        cls, content: bytes, etag: str, media_type: str = "application/json"
+    ) -> "RenderedBody":
+        if len(content) < MIN_COMPRESS_BYTES:
+            return cls(content=content, etag=etag, media_type=media_type)
+        return cls(
+            content=content,
+            etag=etag,
+            media_type=media_type,
+            gzip_content=gzip.compress(content, compresslevel=6, mtime=0),
+            br_content=brotli.compress(content) if brotli is not None else None,
+        )
+
+    def encoded(self, accept_encoding: str) -> tuple[bytes, str | None]:
+        """Best variant for an ``Accept-Encoding`` header: br, then gzip, then identity."""
+        accepted = _accepted_encodings(accept_encoding)
+        if self.br_content is not None and "br" in accepted:
+            return self.br_content, "br"
+        if self.gzip_content is not None and "gzip" in accepted:
+            return self.gzip_content, "gzip"
+        return self.content, None
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted: set[str] = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.lower())
+    return accepted
+
+
+def rendered_response(request: Request, body: RenderedBody, cache_control: str) -> Response:
+    content, encoding = body.encoded(request.headers.get("accept-encoding", ""))
+    etag = coded_etag(body.etag, encoding)
+    if is_not_modified(request, etag):
+        return not_modified(etag, cache_control)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type=body.media_type, headers=headers)
@@ -1,28 +1,83 @@
+import atexit
 import json
 import logging
+import queue
+import random
+import re
+import sys
 from contextvars import ContextVar
-from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from time import gmtime, perf_counter, strftime
 from typing import Any
 
+try:  # pragma: no cover - depende de los extras instalados
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
 request_id_ctx: ContextVar[str | None] = ContextVar("request_id", default=None)
+# perf_counter() al empezar la petición; sólo se fija con REQUEST_TIMING_ENABLED.
+request_started_ctx: ContextVar[float | None] = ContextVar("request_started", default=None)
+
+# Extras (`extra={...}`) que forman parte del esquema; el resto de atributos se ignora.
+_EXTRA_FIELDS = ("path", "method", "status_code", "stop_id", "age_seconds", "url", "reason")
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+
+def _escape_non_ascii(match: re.Match[str]) -> str:
+    code = ord(match.group())
+    if code > 0xFFFF:
+        # Fuera del plano básico: par sustituto, como hace json.dumps.
+        code -= 0x10000
+        return f"\\u{0xD800 | (code >> 10):04x}\\u{0xDC00 | (code & 0x3FF):04x}"
+    return f"\\u{code:04x}"
+
+
+def _dumps(payload: dict[str, Any]) -> str:
+    if orjson is not None:
+        text = orjson.dumps(payload, default=str).decode()
+        # orjson no escapa: se iguala a ensure_ascii=True para que la salida no dependa del extra.
+        return text if text.isascii() else _NON_ASCII.sub(_escape_non_ascii, text)
+    return json.dumps(payload, ensure_ascii=True, default=str)
 
 
 class JsonLogFormatter(logging.Formatter):
     """Render logs as JSON strings with a minimal schema."""
 
+    def __init__(self) -> None:
+        super().__init__()
+        self._second: int | None = None
+        self._second_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        # El prefijo hasta el segundo se reutiliza entre registros del mismo segundo.
+        second = int(created)
+        if second != self._second:
+            self._second = second
+            self._second_prefix = strftime("%Y-%m-%dT%H:%M:%S", gmtime(second))
+        return f"{self._second_prefix}.{int((created - second) * 1_000_000):06d}+00:00"
+
     def format(self, record: logging.LogRecord) -> str:  # noqa: D401
         base: dict[str, Any] = {
-            "ts": datetime.now(UTC).isoformat(),
+            "ts": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "event": record.getMessage(),
         }
 
-        request_id = request_id_ctx.get()
-        if request_id:
-            base["request_id"] = request_id
+        # Si el registro pasó por la cola el contexto ya viene capturado en él.
+        context = getattr(record, "request_id", None) or request_id_ctx.get()
+        if context:
+            base["request_id"] = context
+        elapsed = getattr(record, "elapsed_ms", None)
+        if elapsed is None:
+            started = request_started_ctx.get()
+            if started is not None:
+                elapsed = round((perf_counter() - started) * 1000, 2)
+        if elapsed is not None:
+            base["elapsed_ms"] = elapsed
 
-        for attr in ("path", "method", "status_code"):
+        for attr in _EXTRA_FIELDS:
             value = getattr(record, attr, None)
             if value is not None:
                 base[attr] = value
@@ -30,21 +85,81 @@ class JsonLogFormatter(logging.Formatter):
         if record.exc_info:
             base["exc_info"] = self.formatException(record.exc_info)
 
-        return json.dumps(base, ensure_ascii=True)
+        return _dumps(base)
+
+
+class ContextQueueHandler(QueueHandler):
+    """Enqueue records without formatting them on the event loop.
+
+    Only the request context (contextvars are not visible from the writer
+    thread) is captured here; the message is interpolated and serialized
+    by the :class:`QueueListener` thread. Arguments are therefore formatted
+    a little later than the call, so log values rather than mutable
+    objects that may change meanwhile.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_ctx.get()
+        started = request_started_ctx.get()
+        if started is not None:
+            record.elapsed_ms = round((perf_counter() - started) * 1000, 2)
+        return record
 
 
-def setup_logging() -> None:
-    handler = logging.StreamHandler()
-    handler.setFormatter(JsonLogFormatter())
+class AccessLogSampler(logging.Filter):
+    """Keep a fraction of successful access-log lines; errors are always kept."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1:
+            return True
+        # uvicorn.access: (cliente, método, ruta, versión http, estado)
+        args = record.args
+        status = args[4] if isinstance(args, tuple) and len(args) == 5 else None
+        if isinstance(status, int) and status >= 400:
+            return True
+        return random.random() < self.rate
+
+
+_listener: QueueListener | None = None
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(level: int | str = logging.INFO, access_sample_rate: float = 1.0) -> None:
+    """Route all records through a queue drained and written by a background thread."""
+    global _listener
+    _stop_listener()
+
+    # sys.stderr se resuelve al arrancar el listener (pytest lo sustituye al capturar).
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonLogFormatter())
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, stream)
+    _listener.start()
 
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
+    root_logger.setLevel(level)
     root_logger.handlers = [handler]
 
     uvicorn_access = logging.getLogger("uvicorn.access")
     uvicorn_access.handlers = [handler]
     uvicorn_access.propagate = False
+    uvicorn_access.filters = [AccessLogSampler(access_sample_rate)]
 
     uvicorn_error = logging.getLogger("uvicorn.error")
     uvicorn_error.handlers = [handler]
     uvicorn_error.propagate = False
+
+
+# Vacía la cola antes de salir para no perder los últimos registros.
+atexit.register(_stop_listener)
@@ -0,0 +1,207 @@
+"""Minimal Prometheus-compatible metrics.
+
+Metrics are only updated from the event loop. Each update is one or two
+dict operations with no locks or per-call allocations beyond the label
+tuple, so instrumenting hot paths costs almost nothing. ``render()``
+produces the Prometheus text exposition format (0.0.4).
+"""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Iterable
+from typing import TypeVar
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    @abstractmethod
+    def _samples(self) -> list[str]: ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteo por bucket (no acumulado) + overflow, suma]
+        self._values: dict[Labels, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> list[str]:
+        lines: list[str] = []
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts, strict=True):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+def _registered(metric: M) -> M:  # noqa: UP047
+    REGISTRY.register(metric)
+    return metric
+
+
+HTTP_REQUEST_DURATION = _registered(
+    Histogram(
+        "http_request_duration_seconds",
+        "Latencia de las peticiones HTTP por ruta.",
+        ("method", "route", "status"),
+    )
+)
+HTTP_REQUESTS_IN_FLIGHT = _registered(Gauge("http_requests_in_flight", "Peticiones HTTP en curso."))
+HTTP_STREAMS_OPEN = _registered(
+    Gauge("http_streams_open", "Conexiones de streaming (SSE) abiertas por ruta.", ("route",))
+)
+UPSTREAM_REQUEST_DURATION = _registered(
+    Histogram(
+        "upstream_request_duration_seconds",
+        "Latencia de las llamadas a itranvias.",
+        ("endpoint",),
+    )
+)
+UPSTREAM_ERRORS = _registered(
+    Counter("upstream_errors_total", "Llamadas fallidas a itranvias.", ("endpoint", "reason"))
+)
+CACHE_REQUESTS = _registered(
+    Counter(
+        "cache_requests_total",
+        "Consultas a cachés internas (hit, miss, coalesced, stale).",
+        ("cache", "result"),
+    )
+)
+CATALOG_REFRESH_DURATION = _registered(
+    Histogram(
+        "catalog_refresh_duration_seconds",
+        "Duración de cada refresco del catálogo (descarga e índices).",
+        ("result",),
+    )
+)
+CATALOG_STOPS = _registered(Gauge("catalog_stops", "Paradas en el catálogo servido."))
+CATALOG_LINES = _registered(Gauge("catalog_lines", "Líneas en el catálogo servido."))
+CATALOG_AGE = _registered(
+    Gauge("catalog_age_seconds", "Antigüedad del catálogo servido (-1 si es provisional).")
+)
+ARRIVALS_PREFETCHES = _registered(
+    Counter(
+        "arrivals_prefetch_total",
+        "Refrescos anticipados de llegadas (ok, error, budget = aplazado por el presupuesto).",
+        ("result",),
+    )
+)
+PREFETCH_STOPS = _registered(
+    Gauge("arrivals_prefetch_stops", "Paradas cuyas llegadas se refrescan por anticipado.")
+)
+UPSTREAM_BUDGET_WAIT = _registered(
+    Counter(
+        "upstream_budget_wait_seconds_total",
+        "Tiempo esperado por el límite de peticiones a itranvias.",
+    )
+)
+CIRCUIT_OPEN = _registered(
+    Gauge("upstream_circuit_open", "1 si el circuito hacia itranvias no está cerrado.")
+)
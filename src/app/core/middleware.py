@@ -1,32 +1,177 @@
-import uuid
+import itertools
+import secrets
+from collections.abc import Callable
+from time import perf_counter
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.responses import Response
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.config import get_settings
-from app.core.logging import request_id_ctx
+from app.core.logging import request_id_ctx, request_started_ctx
+from app.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, HTTP_STREAMS_OPEN
 
 
-class RequestIdMiddleware(BaseHTTPMiddleware):
-    """Attach and propagate a correlation ID via headers and contextvars."""
+def _request_id_factory() -> Callable[[], str]:
+    # Prefijo aleatorio por proceso + contador: único sin llamar a uuid4 en cada petición.
+    prefix = secrets.token_hex(6)
+    counter = itertools.count(1)
+    return lambda: f"{prefix}-{next(counter):x}"
 
-    def __init__(self, app) -> None:  # type: ignore[override]
-        super().__init__(app)
+
+new_request_id = _request_id_factory()
+
+
+class RequestIdMiddleware:
+    """Attach and propagate a correlation ID via headers and contextvars.
+
+    Plain ASGI: the response is passed through untouched (streaming keeps
+    working) and only the ``http.response.start`` message is rewritten.
+    With ``REQUEST_TIMING_ENABLED`` the request start time is also put in
+    the logging context and returned as a ``Server-Timing`` header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
         self.settings = get_settings()
+        self.header_name = self.settings.request_id_header
+        self._header_key = self.header_name.lower().encode("latin-1")
 
-    async def dispatch(  # type: ignore[override]
-        self, request: Request, call_next: RequestResponseEndpoint
-    ) -> Response:
-        header_name = self.settings.request_id_header
-        request_id = request.headers.get(header_name, str(uuid.uuid4()))
-        token = request_id_ctx.set(request_id)
-        request.state.request_id = request_id
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope["headers"]:
+            if key == self._header_key:
+                request_id = value.decode("latin-1")
+                break
+        if not request_id:
+            request_id = new_request_id()
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        timing = self.settings.request_timing_enabled
+        started = perf_counter() if timing else None
 
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers[self.header_name] = request_id
+                if started is not None:
+                    headers["Server-Timing"] = f"app;dur={(perf_counter() - started) * 1000:.2f}"
+            await send(message)
+
+        token = request_id_ctx.set(request_id)
+        started_token = request_started_ctx.set(started) if timing else None
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         finally:
+            if started_token is not None:
+                request_started_ctx.reset(started_token)
             request_id_ctx.reset(token)
 
-        response.headers[header_name] = request_id
-        return response
+
+PROFILE_PREFIX = "/p/"
+
+
+class ProfilePrefixMiddleware:
+    """Serve ``/p/{profile}/...`` as ``/...`` with the profile in the request state.
+
+    The prefix is moved into ``root_path``, so routes, ``url_for`` and the
+    frontend base path work unchanged under it. Only the path selects the
+    profile (no header) so public caches never mix profiles. Unknown names
+    get a 404 ``profile_not_found`` here, before any route or static mount
+    sees the request.
+    """
+
+    def __init__(self, app: ASGIApp, has_profile: Callable[[str], bool]) -> None:
+        self.app = app
+        self.has_profile = has_profile
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in ("http", "websocket"):
+            base = scope.get("root_path", "")
+            route_path = scope["path"]
+            if base and route_path.startswith(base):
+                route_path = route_path[len(base) :]
+            if route_path.startswith(PROFILE_PREFIX):
+                name, _, rest = route_path[len(PROFILE_PREFIX) :].partition("/")
+                if name and not self.has_profile(name):
+                    if scope["type"] == "http":
+                        response = JSONResponse(
+                            {"detail": "profile_not_found", "code": 404}, status_code=404
+                        )
+                        await response(scope, receive, send)
+                    else:
+                        await send({"type": "websocket.close", "code": 1008})
+                    return
+                if name:
+                    root_path = f"{base}{PROFILE_PREFIX}{name}"
+                    # Se modifica el scope en sitio: MetricsMiddleware lee la ruta de él.
+                    scope["root_path"] = scope["app_root_path"] = root_path
+                    scope["path"] = f"{root_path}/{rest}"
+                    scope.setdefault("state", {})["profile"] = name
+        await self.app(scope, receive, send)
+
+
+def _route_label(scope: Scope) -> str:
+    """Route template (``/api/stops/{stop_id}``) so labels stay bounded."""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    if scope.get("endpoint") is not None:
+        # Mount (p. ej. /static): se agrupa bajo su prefijo.
+        mount = scope.get("root_path", "")[len(scope.get("app_root_path", "")) :]
+        return f"{mount}/{{path}}"
+    return "unmatched"
+
+
+def _is_event_stream(message: Message) -> bool:
+    return any(
+        name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+        for name, value in message.get("headers", [])
+    )
+
+
+class MetricsMiddleware:
+    """Record per-route latency and in-flight requests (plain ASGI, no buffering).
+
+    Server-Sent Events responses leave both once their headers are sent and
+    are counted in ``http_streams_open`` instead, so long-lived connections
+    do not skew the latency histogram.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        streaming = False
+        started = perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if _is_event_stream(message):
+                    streaming = True
+                    HTTP_REQUESTS_IN_FLIGHT.dec()
+                    HTTP_STREAMS_OPEN.inc(_route_label(scope))
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if streaming:
+                HTTP_STREAMS_OPEN.dec(_route_label(scope))
+            else:
+                HTTP_REQUESTS_IN_FLIGHT.dec()
+                HTTP_REQUEST_DURATION.observe(
+                    perf_counter() - started, scope["method"], _route_label(scope), str(status)
+                )
@@ -29,6 +29,7 @@ let allStops = [];
 let filteredStops = [];
 let nextShownMap = new Map();
 let lastArrivalsSnapshot = null;
+let liveSource = null;
 
 bootstrapStops();
 
@@ -306,13 +307,57 @@ async function loadArrivals(stopId, options = {}) {
     arrivalsEl.innerHTML = "<div class=\"empty-state\">No hay datos disponibles en este momento.</div>";
     setStatus("No se pudo actualizar. Intenta de nuevo en unos segundos.");
   } finally {
-    // Consultar API cada 3 minutos (180000 ms) para evitar saturación
-    apiRefreshTimer = setTimeout(() => loadArrivals(currentStopId), 180000);
+    // Con streaming (SSE) el servidor empuja los datos; si no, consultar API cada 3 minutos
+    if (!watchArrivals(stopId)) {
+      apiRefreshTimer = setTimeout(() => loadArrivals(currentStopId), 180000);
+    }
     // Iniciar/restablecer el timer de actualización visual cada minuto
     startUIRefreshTimer();
   }
 }
 
+// Suscripción a las llegadas en vivo: un único sondeo en el servidor por parada
+// reparte cada actualización a todos los dispositivos conectados.
+function watchArrivals(stopId) {
+  if (!("EventSource" in window)) {
+    return false;
+  }
+  if (liveSource && liveSource.stopId === stopId) {
+    return true;
+  }
+  stopWatchingArrivals();
+
+  const source = new EventSource(buildUrl(`/api/stops/${stopId}/arrivals/stream`));
+  source.stopId = stopId;
+  source.addEventListener("arrivals", (event) => {
+    if (stopId !== currentStopId || !lastArrivalsSnapshot) {
+      return;
+    }
+    lastArrivalsSnapshot = {
+      ...lastArrivalsSnapshot,
+      arrivals: JSON.parse(event.data),
+      updatedAt: new Date(),
+    };
+    updateUIFromSnapshot();
+  });
+  source.addEventListener("error", () => {
+    // El navegador reintenta solo; si cierra la conexión volvemos al sondeo periódico.
+    if (source.readyState === EventSource.CLOSED && liveSource === source) {
+      liveSource = null;
+      apiRefreshTimer = setTimeout(() => loadArrivals(currentStopId), 180000);
+    }
+  });
+  liveSource = source;
+  return true;
+}
+
+function stopWatchingArrivals() {
+  if (liveSource) {
+    liveSource.close();
+    liveSource = null;
+  }
+}
+
 function startUIRefreshTimer() {
   if (uiRefreshTimer) {
     clearTimeout(uiRefreshTimer);
@@ -340,6 +385,14 @@ function updateUIFromSnapshot() {
       ...line,
       is_ida: line.is_ida, // Preservar el campo is_ida
       buses: line.buses.map((bus) => {
+        // La hora estimada del servidor ya viene suavizada: basta con contar hacia ella.
+        const expectedAt = bus.expected_at ? Date.parse(bus.expected_at) : NaN;
+        if (!Number.isNaN(expectedAt)) {
+          return {
+            ...bus,
+            eta_minutes: Math.max(0, Math.round((expectedAt - now) / 60000))
+          };
+        }
         if (typeof bus.eta_minutes === "number") {
           return {
             ...bus,
@@ -356,7 +409,10 @@ function updateUIFromSnapshot() {
   
   // Actualizar estado mostrando cuándo se actualizó el API
   const apiUpdateTime = lastArrivalsSnapshot.updatedAt.toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" });
-  setStatus(`Datos del API: ${apiUpdateTime} | Actualizado: ${now.toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" })}`);
+  const staleNote = lastArrivalsSnapshot.arrivals.stale
+    ? " | Tiempos aproximados: el servicio de buses no responde"
+    : "";
+  setStatus(`Datos del API: ${apiUpdateTime} | Actualizado: ${now.toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" })}${staleNote}`);
 }
 
 function renderNextArrivals(arrivals) {
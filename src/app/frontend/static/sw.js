@@ -1,4 +1,4 @@
-const CACHE_NAME = "buses-pwa-v2";
+const CACHE_NAME = "buses-pwa-v4";
 const RELATIVE_ASSETS = [
   "",
   "static/styles.css",
@@ -35,6 +35,26 @@ self.addEventListener("fetch", (event) => {
   if (event.request.method !== "GET") {
     return;
   }
+  // Los flujos en vivo (SSE) no se cachean: dejarlos pasar directamente a la red.
+  if ((event.request.headers.get("accept") || "").includes("text/event-stream")) {
+    return;
+  }
+  // API: primero la red (el navegador revalida con ETag y recibe 304 si nada cambió);
+  // la copia cacheada solo se usa sin conexión.
+  if (new URL(event.request.url).pathname.includes("/api/")) {
+    event.respondWith(
+      fetch(event.request)
+        .then((response) => {
+          if (response && response.status === 200 && response.type === "basic") {
+            const responseClone = response.clone();
+            caches.open(CACHE_NAME).then((cache) => cache.put(event.request, responseClone));
+          }
+          return response;
+        })
+        .catch(() => caches.match(event.request))
+    );
+    return;
+  }
   event.respondWith(
     caches.match(event.request).then((cached) => {
       const fetchPromise = fetch(event.request)
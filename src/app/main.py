@@ -1,33 +1,59 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from importlib import metadata
 from pathlib import Path
 
 from fastapi import Depends, FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.api.v1 import health, transit
 from app.core import errors
-from app.core.app_config import load_app_config
 from app.core.config import get_settings
+from app.core.http_cache import rendered_response
 from app.core.logging import setup_logging
-from app.core.middleware import RequestIdMiddleware
+from app.core.middleware import MetricsMiddleware, ProfilePrefixMiddleware, RequestIdMiddleware
 from app.services.transit import TransitService, get_transit_service
 
-setup_logging()
 settings = get_settings()
-app_config = load_app_config()
+setup_logging(settings.log_level, settings.access_log_sample_rate)
 
 try:
     app_version = metadata.version("busesyparadas")
 except metadata.PackageNotFoundError:
     app_version = "0.1.0"
 
-app = FastAPI(title=settings.api_title, version=app_version, root_path=settings.root_path)
 
+def _transit_service() -> TransitService:
+    # Respeta dependency_overrides también fuera de las rutas (lifespan y middleware).
+    provider = app.dependency_overrides.get(get_transit_service, get_transit_service)
+    return provider()
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI) -> AsyncIterator[None]:
+    service = _transit_service()
+    await service.start()
+    try:
+        yield
+    finally:
+        await service.close()
+
+
+app = FastAPI(
+    title=settings.api_title,
+    version=app_version,
+    root_path=settings.root_path,
+    lifespan=lifespan,
+)
+
+app.add_middleware(
+    ProfilePrefixMiddleware, has_profile=lambda name: _transit_service().has_profile(name)
+)
 app.add_middleware(RequestIdMiddleware)
 app.add_middleware(
     CORSMiddleware,
@@ -36,6 +62,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Último en añadirse = más externo: mide también el resto de middlewares.
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(health.router)
 app.include_router(transit.router)
@@ -56,17 +84,25 @@ if STATIC_DIR.exists():
 async def index(
     request: Request,
     service: TransitService = Depends(get_transit_service),
-) -> HTMLResponse:
-    primary_stop_id = app_config.primary_stop_id
-    default_stop = await service.get_stop(primary_stop_id)
+    profile: str = Depends(transit.get_profile),
+) -> Response:
+    primary_stop_id = service.profiles[profile].primary_stop_id
+    rendered = await service.get_rendered_catalog(profile)
     base_path = request.scope.get("root_path", "") or ""
-    context = {
-        "request": request,
-        "default_stop": default_stop,
-        "primary_stop_id": primary_stop_id,
-        "base_path": base_path,
-    }
-    return templates.TemplateResponse("index.html", context)
+
+    def render() -> str:
+        context = {
+            "request": request,
+            "default_stop": rendered.catalog.get_stop(primary_stop_id),
+            "primary_stop_id": primary_stop_id,
+            "base_path": base_path,
+        }
+        return templates.get_template("index.html").render(context)
+
+    # La página sólo depende del catálogo, de la parada principal y de la URL base
+    # (url_for genera URLs absolutas).
+    body = rendered.page((str(request.base_url), base_path, primary_stop_id), render)
+    return rendered_response(request, body, "no-cache")
 
 
 @app.get("/favicon.ico", include_in_schema=False)
@@ -1,9 +1,21 @@
 from pydantic import BaseModel, Field
 
 
+class UpstreamHealth(BaseModel):
+    state: str = Field(description="Estado del circuit breaker: closed, open o half_open")
+    calls: int
+    failures: int
+    error_rate: float
+    avg_latency_ms: float
+
+
 class HealthResponse(BaseModel):
     status: str = Field(default="ok", description="Estado del servicio")
     version: str
+    catalog_age_seconds: float | None = Field(
+        default=None, description="Antigüedad del catálogo de paradas servido"
+    )
+    upstream: UpstreamHealth | None = None
 
 
 class SumResponse(BaseModel):
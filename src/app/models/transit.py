@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel, Field
 
 
@@ -14,12 +16,27 @@ class StopSearchResponse(BaseModel):
     stops: list[StopSummary]
 
 
+class NearbyStop(StopSummary):
+    distance_meters: float = Field(description="Distancia en línea recta al punto consultado")
+
+
+class NearbyStopsResponse(BaseModel):
+    total: int
+    stops: list[NearbyStop]
+
+
 class ArrivalBus(BaseModel):
     bus_id: int
     eta_minutes: int | None = None
     distance_meters: int | None = None
     status: int | None = None
     last_stop_id: int | None = None
+    smoothed_eta_minutes: float | None = Field(
+        default=None, description="ETA suavizada con las últimas consultas a itranvias"
+    )
+    expected_at: datetime | None = Field(
+        default=None, description="Hora estimada de llegada (UTC) según la ETA suavizada"
+    )
 
 
 class LineArrivals(BaseModel):
@@ -27,9 +44,29 @@ class LineArrivals(BaseModel):
     line_name: str | None = None
     color_hex: str | None = None
     buses: list[ArrivalBus]
-    is_ida: bool = Field(default=False, description="True si la parada es de ida (se aleja de casa), False si es vuelta")
+    is_ida: bool = Field(
+        default=False,
+        description="True si la parada es de ida (se aleja de casa), False si es vuelta",
+    )
 
 
 class ArrivalsResponse(BaseModel):
     stop_id: int
     lines: list[LineArrivals]
+    stale: bool = Field(
+        default=False,
+        description="True si son los últimos datos conocidos porque itranvias no responde",
+    )
+    age_seconds: float | None = Field(
+        default=None, description="Antigüedad de los datos cuando stale es True"
+    )
+
+
+class StopArrivalsResult(BaseModel):
+    stop_id: int
+    arrivals: ArrivalsResponse | None = None
+    error: str | None = Field(default=None, description="Motivo del fallo para esta parada")
+
+
+class BatchArrivalsResponse(BaseModel):
+    results: list[StopArrivalsResult]
@@ -0,0 +1,107 @@
+"""Fast normalization of itranvias ``func=0`` arrivals payloads."""
+
+from collections.abc import Mapping
+from operator import itemgetter
+from typing import Any
+
+from app.models.transit import ArrivalsResponse
+from app.services.catalog import LineCatalog
+
+_serializer = ArrivalsResponse.__pydantic_serializer__
+_first = itemgetter(0)
+# Campos de ArrivalBus que no se usan para ordenar: (campo, clave en itranvias)
+_PASSTHROUGH_FIELDS = (
+    ("distance_meters", "distancia"),
+    ("status", "estado"),
+    ("last_stop_id", "ult_parada"),
+)
+
+
+def parse_int(value: Any) -> int | None:
+    """``int(value)`` or None, without raising for the usual upstream values.
+
+    itranvias sends digit strings (sometimes ints) and placeholders such as
+    ``"----"`` for unknown ETAs; strings are checked before converting and
+    only other types go through ``int()``.
+    """
+    if type(value) is str:
+        if value.isdecimal():
+            return int(value)
+        text = value.strip()
+        if text.isdecimal() or (text[1:].isdecimal() and text[0] in "+-"):
+            return int(text)
+        return None
+    if type(value) is int:
+        return value
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_arrivals(
+    stop_id: int, lines_raw: Any, lines_catalog: LineCatalog
+) -> ArrivalsResponse:
+    """Map ``buses.lineas`` to an :class:`ArrivalsResponse` in a single validation pass.
+
+    Buses are ordered by ETA and lines by their first ETA; entries without
+    an ETA go last, in upstream order. The plain dicts are validated once
+    by pydantic's core instead of building one model per bus.
+    """
+    info = lines_catalog.info
+    positions = lines_catalog.stop_positions
+    timed_lines: list[tuple[int, dict]] = []
+    untimed_lines: list[dict] = []
+
+    for line_item in lines_raw if isinstance(lines_raw, list) else ():
+        if not isinstance(line_item, Mapping):
+            continue
+        line_id = parse_int(line_item.get("linea"))
+        if line_id is None:
+            continue
+        timed: list[tuple[int, dict]] = []
+        untimed: list[dict] = []
+        for bus in line_item.get("buses") or ():
+            if not isinstance(bus, Mapping):
+                continue
+            bus_id = parse_int(bus.get("bus"))
+            if bus_id is None:
+                continue
+            eta = parse_int(bus.get("tiempo"))
+            entry = {"bus_id": bus_id, "eta_minutes": eta}
+            for field, key in _PASSTHROUGH_FIELDS:
+                entry[field] = parse_int(bus.get(key))
+            if eta is None:
+                untimed.append(entry)
+            else:
+                timed.append((eta, entry))
+        # sort estable: a igual ETA se conserva el orden de itranvias
+        timed.sort(key=_first)
+        buses = [entry for _, entry in timed]
+        buses.extend(untimed)
+
+        meta = info.get(line_id)
+        position = positions.get((line_id, stop_id))
+        line = {
+            "line_id": line_id,
+            "line_name": meta["name"] if meta else None,
+            "color_hex": meta["color"] if meta else None,
+            "buses": buses,
+            "is_ida": position is not None and position[0],
+        }
+        if timed:
+            timed_lines.append((timed[0][0], line))
+        else:
+            untimed_lines.append(line)
+
+    timed_lines.sort(key=_first)
+    lines = [line for _, line in timed_lines]
+    lines.extend(untimed_lines)
+    return ArrivalsResponse.model_validate({"stop_id": stop_id, "lines": lines})
+
+
+def arrivals_json(response: ArrivalsResponse) -> bytes:
+    """JSON body of ``response``, serialized straight to bytes."""
+    return _serializer.to_json(response)
@@ -0,0 +1,140 @@
+"""In-process caches shared by the service layer."""
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from time import monotonic
+from typing import Generic, TypeVar
+
+from app.core.metrics import CACHE_REQUESTS
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):  # noqa: UP046
+    """LRU cache with per-entry expiry and coalescing of concurrent loads.
+
+    A ``ttl_seconds`` of zero disables storage but keeps coalescing, so
+    simultaneous misses for the same key still share one load. With
+    ``stale_seconds`` expired entries are kept that much longer and can be
+    read through :meth:`get_stale` as a fallback when reloading fails.
+    When ``name`` is given, :meth:`get_or_load` outcomes are counted in the
+    ``cache_requests_total`` metric.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_entries: int,
+        stale_seconds: float = 0.0,
+        name: str | None = None,
+    ) -> None:
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.stale_seconds = stale_seconds
+        # clave -> (guardado en, caduca en, valor)
+        self._entries: OrderedDict[K, tuple[float, float, V]] = OrderedDict()
+        self._inflight: dict[K, asyncio.Future[V]] = {}
+        # TTL propio de la entrada que guardará la carga en curso, si se pidió uno.
+        self._inflight_ttl: dict[K, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = monotonic()
+        _, expires_at, value = entry
+        if now >= expires_at:
+            if now >= expires_at + self.stale_seconds:
+                del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get_stale(self, key: K) -> tuple[V, float] | None:
+        """Last stored value and its age in seconds, fresh or within the stale window."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = monotonic()
+        stored_at, expires_at, value = entry
+        if now >= expires_at + self.stale_seconds:
+            del self._entries[key]
+            return None
+        return value, now - stored_at
+
+    def set(self, key: K, value: V, age: float = 0.0, ttl_seconds: float | None = None) -> None:
+        """Store ``value``; ``age`` backdates it when it was produced elsewhere earlier.
+
+        ``ttl_seconds`` overrides the cache TTL for this entry (e.g. for values
+        that something else keeps refreshing).
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0 and self.stale_seconds <= 0:
+            return
+        stored_at = monotonic() - age
+        self._entries[key] = (stored_at, stored_at + max(ttl, 0.0), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_load(self, key: K, loader: Callable[[], Awaitable[V]]) -> V:
+        value = self.get(key)
+        if value is not None:
+            self._count("hit")
+            return value
+
+        future = self._inflight.get(key)
+        if future is None:
+            self._count("miss")
+            future = self._start_load(key, loader)
+        else:
+            self._count("coalesced")
+        # shield: cancelar una petición no debe abortar la carga compartida.
+        return await asyncio.shield(future)
+
+    async def refresh(
+        self, key: K, loader: Callable[[], Awaitable[V]], ttl_seconds: float | None = None
+    ) -> V:
+        """Reload ``key`` even if it is fresh, sharing a load already in flight.
+
+        ``ttl_seconds`` also applies when the shared load was started by
+        someone else: the entry it stores gets the latest override.
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._start_load(key, loader)
+        if ttl_seconds is not None:
+            self._inflight_ttl[key] = ttl_seconds
+        return await asyncio.shield(future)
+
+    def _start_load(self, key: K, loader: Callable[[], Awaitable[V]]) -> asyncio.Future[V]:
+        future = asyncio.ensure_future(self._load(key, loader))
+        # Evita avisos de "exception never retrieved" si todos los clientes cancelan.
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = future
+        return future
+
+    def _count(self, result: str) -> None:
+        if self.name is not None:
+            CACHE_REQUESTS.inc(self.name, result)
+
+    async def _load(self, key: K, loader: Callable[[], Awaitable[V]]) -> V:
+        before = self._entries.get(key)
+        try:
+            value = await loader()
+            # Respeta la entrada si el propio loader ya la guardó (p. ej. con su antigüedad).
+            if self._entries.get(key) is before:
+                self.set(key, value, ttl_seconds=self._inflight_ttl.get(key))
+            return value
+        finally:
+            self._inflight.pop(key, None)
+            self._inflight_ttl.pop(key, None)
@@ -0,0 +1,202 @@
+"""Immutable lookup structures built once per stop catalog refresh."""
+
+import hashlib
+from collections.abc import Iterable, Mapping, Set
+from dataclasses import dataclass, field, replace
+from operator import attrgetter
+from time import monotonic
+from types import MappingProxyType
+
+from app.models.transit import StopSummary
+from app.services.geo import StopGeoIndex
+from app.services.records import StopRecord
+from app.services.search import StopSearchIndex
+
+LineInfo = dict[str, str | None]
+Route = tuple[int, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class LineCatalog:
+    """Line metadata, integer routes and the precomputed direction table."""
+
+    info: Mapping[int, LineInfo]
+    routes: Mapping[int, tuple[Route, ...]]
+    origins: Mapping[int, int | None]
+    interest_line_ids: frozenset[int]
+    # (línea, parada) -> (es_ida, posición en la ruta)
+    stop_positions: Mapping[tuple[int, int], tuple[bool, int]]
+
+
+EMPTY_LINES = LineCatalog(
+    info=MappingProxyType({}),
+    routes=MappingProxyType({}),
+    origins=MappingProxyType({}),
+    interest_line_ids=frozenset(),
+    stop_positions=MappingProxyType({}),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogIndex:
+    """Read-only snapshot of the catalog so requests never filter or sort.
+
+    The service swaps the whole object on refresh, so a request always
+    sees stops and lines from the same download. Stops are compact
+    :class:`StopRecord` objects shared by every profile view of the
+    download; a view adds its interest mask and the indexes over its
+    stops. Pydantic models are only built on the way out (:meth:`summary`).
+    """
+
+    stops_by_id: Mapping[int, StopRecord]
+    interest_stops: tuple[StopRecord, ...]
+    search: StopSearchIndex
+    geo: StopGeoIndex
+    version: str = ""
+    lines: LineCatalog = EMPTY_LINES
+    placeholder: bool = False
+    built_at: float = field(default_factory=monotonic)
+    interest_mask: int = 0
+
+    def __len__(self) -> int:
+        return len(self.stops_by_id)
+
+    @property
+    def age_seconds(self) -> float:
+        return monotonic() - self.built_at
+
+    def stop_lines(self, stop: StopRecord) -> list[int]:
+        """Lines of ``stop`` shown in this view (every line when there is no filter)."""
+        return _shown_lines(stop, self.lines.interest_line_ids)
+
+    def summary(self, stop: StopRecord) -> StopSummary:
+        # El constructor valida en pydantic-core: más rápido que model_construct.
+        return StopSummary(
+            id=stop.id,
+            name=stop.name,
+            latitude=stop.latitude,
+            longitude=stop.longitude,
+            lines=self.stop_lines(stop),
+        )
+
+    def get_stop(self, stop_id: int) -> StopSummary | None:
+        stop = self.stops_by_id.get(stop_id)
+        return self.summary(stop) if stop is not None else None
+
+
+def _shown_lines(stop: StopRecord, line_ids: Set[int]) -> list[int]:
+    if not line_ids:
+        return list(stop.lines)
+    return [line_id for line_id in stop.lines if line_id in line_ids]
+
+
+def line_bits(lines: LineCatalog) -> dict[int, int]:
+    """Bit of each line in ``StopRecord.line_mask`` (by position in ``lines.info``)."""
+    return {line_id: 1 << position for position, line_id in enumerate(lines.info)}
+
+
+def interest_line_ids(info: Mapping[int, LineInfo], names: Set[str]) -> frozenset[int]:
+    """Ids of the lines whose name or id (lowercase) is in ``names``."""
+    return frozenset(
+        line_id
+        for line_id, meta in info.items()
+        if meta["name_lower"] in names or str(line_id) in names
+    )
+
+
+def build_stop_positions(
+    routes_by_line: Mapping[int, tuple[Route, ...]],
+    origins: Mapping[int, int | None],
+) -> Mapping[tuple[int, int], tuple[bool, int]]:
+    """
+    Precalcula el sentido y la posición de cada parada en cada línea.
+    Una parada es de ida si está en una ruta que empieza con el origen de la línea;
+    si aparece en ambos sentidos prevalece la ida.
+    """
+    positions: dict[tuple[int, int], tuple[bool, int]] = {}
+    for line_id, routes in routes_by_line.items():
+        origin = origins.get(line_id)
+        ida_routes = [route for route in routes if route and route[0] == origin]
+        other_routes = [route for route in routes if route and route[0] != origin]
+        for is_ida, group in ((True, ida_routes), (False, other_routes)):
+            for route in group:
+                for position, stop_id in enumerate(route):
+                    positions.setdefault((line_id, stop_id), (is_ida, position))
+    return MappingProxyType(positions)
+
+
+def catalog_version(
+    stops: Iterable[StopRecord], lines: LineCatalog, line_ids: Set[int] = frozenset()
+) -> str:
+    """Content hash of what the API exposes, stable across identical refreshes."""
+    digest = hashlib.blake2b(digest_size=8)
+    for stop in stops:
+        shown = _shown_lines(stop, line_ids)
+        digest.update(f"{stop.id}|{stop.name}|{stop.latitude}|{stop.longitude}|{shown}\n".encode())
+    for line_id in sorted(lines.info):
+        meta = lines.info[line_id]
+        digest.update(f"{line_id}|{meta['name']}|{meta['color']}\n".encode())
+    return digest.hexdigest()
+
+
+def build_catalog_index(
+    stops: Iterable[StopRecord | StopSummary],
+    lines: LineCatalog = EMPTY_LINES,
+    placeholder: bool = False,
+    built_at: float | None = None,
+) -> CatalogIndex:
+    """Index a download: one masked record per stop, then the default view over them."""
+    bits = line_bits(lines)
+    records: dict[int, StopRecord] = {}
+    for stop in stops:
+        stop_lines = tuple(stop.lines)
+        mask = 0
+        for line_id in stop_lines:
+            mask |= bits.get(line_id, 0)
+        records[stop.id] = StopRecord(
+            stop.id, stop.name, stop.latitude, stop.longitude, stop_lines, mask
+        )
+    return _build_view(
+        MappingProxyType(records),
+        lines,
+        placeholder,
+        monotonic() if built_at is None else built_at,
+    )
+
+
+def build_profile_view(catalog: CatalogIndex, line_ids: frozenset[int]) -> CatalogIndex:
+    """The same download restricted to ``line_ids``; records and line mappings are shared."""
+    if line_ids == catalog.lines.interest_line_ids:
+        return catalog
+    return _build_view(
+        catalog.stops_by_id,
+        replace(catalog.lines, interest_line_ids=line_ids),
+        catalog.placeholder,
+        catalog.built_at,
+    )
+
+
+def _build_view(
+    stops_by_id: Mapping[int, StopRecord], lines: LineCatalog, placeholder: bool, built_at: float
+) -> CatalogIndex:
+    line_ids = lines.interest_line_ids
+    bits = line_bits(lines)
+    mask = 0
+    for line_id in line_ids:
+        mask |= bits.get(line_id, 0)
+    if line_ids:
+        interest = [stop for stop in stops_by_id.values() if stop.line_mask & mask]
+    else:
+        interest = list(stops_by_id.values())
+    interest.sort(key=attrgetter("name"))
+    return CatalogIndex(
+        stops_by_id=stops_by_id,
+        interest_stops=tuple(interest),
+        search=StopSearchIndex(interest),
+        geo=StopGeoIndex(interest),
+        version=catalog_version(stops_by_id.values(), lines, line_ids),
+        lines=lines,
+        placeholder=placeholder,
+        built_at=built_at,
+        interest_mask=mask,
+    )
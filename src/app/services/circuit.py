@@ -0,0 +1,125 @@
+"""Circuit breaker guarding calls to the upstream transit API."""
+
+from collections import deque
+from enum import StrEnum
+from time import monotonic
+from typing import TypedDict
+
+
+class CircuitState(StrEnum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class BreakerSnapshot(TypedDict):
+    state: str
+    calls: int
+    failures: int
+    error_rate: float
+    avg_latency_ms: float
+
+
+class CircuitBreaker:
+    """Rolling-window breaker: open on repeated failures, probe after a cool-down.
+
+    The circuit opens when the last ``window_seconds`` hold at least
+    ``failure_threshold`` failures and a failure ratio of at least
+    ``failure_rate``. Calls slower than ``slow_call_seconds`` count as
+    failures even when they succeed. Once ``open_seconds`` have passed, a
+    single probe is let through (half-open). Its result closes or re-opens
+    the circuit.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        failure_rate: float = 0.5,
+        window_seconds: float = 30.0,
+        open_seconds: float = 15.0,
+        slow_call_seconds: float | None = None,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.failure_rate = failure_rate
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self._calls: deque[tuple[float, bool, float]] = deque()
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and monotonic() - self._opened_at >= self.open_seconds:
+            return CircuitState.HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.HALF_OPEN and not self._probe_in_flight:
+            self._state = CircuitState.HALF_OPEN
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self, latency: float) -> None:
+        if self.slow_call_seconds is not None and latency >= self.slow_call_seconds:
+            self.record_failure(latency)
+            return
+        if self._state is CircuitState.HALF_OPEN:
+            self._close()
+            return
+        self._record(ok=True, latency=latency)
+
+    def record_failure(self, latency: float) -> None:
+        if self._state is CircuitState.HALF_OPEN:
+            self._open()
+            return
+        self._record(ok=False, latency=latency)
+        failures = sum(1 for _, ok, _ in self._calls if not ok)
+        if (
+            self._state is CircuitState.CLOSED
+            and failures >= self.failure_threshold
+            and failures / len(self._calls) >= self.failure_rate
+        ):
+            self._open()
+
+    def release_probe(self) -> None:
+        """Forget an in-flight probe that ended without a result (e.g. cancelled)."""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> BreakerSnapshot:
+        self._trim(monotonic())
+        calls = len(self._calls)
+        failures = sum(1 for _, ok, _ in self._calls if not ok)
+        latency = sum(item[2] for item in self._calls) / calls if calls else 0.0
+        return {
+            "state": self.state.value,
+            "calls": calls,
+            "failures": failures,
+            "error_rate": round(failures / calls, 3) if calls else 0.0,
+            "avg_latency_ms": round(latency * 1000, 1),
+        }
+
+    def _record(self, ok: bool, latency: float) -> None:
+        now = monotonic()
+        self._calls.append((now, ok, latency))
+        self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        horizon = now - self.window_seconds
+        while self._calls and self._calls[0][0] < horizon:
+            self._calls.popleft()
+
+    def _open(self) -> None:
+        self._state = CircuitState.OPEN
+        self._opened_at = monotonic()
+        self._probe_in_flight = False
+
+    def _close(self) -> None:
+        self._state = CircuitState.CLOSED
+        self._calls.clear()
+        self._probe_in_flight = False
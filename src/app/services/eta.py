@@ -0,0 +1,132 @@
+"""Arrival-time smoothing from the recent upstream history of each bus."""
+
+from collections import deque
+from datetime import UTC, datetime
+from time import time
+from typing import NamedTuple
+
+from app.models.transit import ArrivalsResponse
+
+# Una observación más antigua pesa la mitad que la siguiente.
+DECAY = 0.5
+# Si la llegada implícita se aleja tanto de la prevista se asume otro viaje del bus.
+RESET_SECONDS = 300.0
+# Idem si el bus se aleja de la parada más de esta distancia entre consultas.
+RESET_METERS = 300
+
+
+class Observation(NamedTuple):
+    observed_at: float
+    eta_minutes: int
+    distance_meters: int | None
+    last_stop_id: int | None
+
+    @property
+    def arrival(self) -> float:
+        return self.observed_at + self.eta_minutes * 60
+
+
+class _StopHistory:
+    __slots__ = ("updated_at", "buses")
+
+    def __init__(self) -> None:
+        self.updated_at = 0.0
+        self.buses: dict[tuple[int, int], deque[Observation]] = {}
+
+
+class EtaTracker:
+    """Ring buffer of recent ETA observations per stop and bus.
+
+    Every upstream poll of a stop is recorded; each observation implies an
+    arrival instant (``observed_at + eta``) and the smoothed arrival is
+    their average, halving the weight of each older one. ``expected_at``
+    anchors it to the wall clock so clients can count down locally instead
+    of polling. The history of a bus restarts when it jumps by more than
+    ``RESET_SECONDS`` or moves away from the stop (a new trip), and buses
+    missing from the latest poll, observations older than
+    ``max_age_seconds`` and stops not polled for that long are dropped.
+    """
+
+    def __init__(self, history_size: int = 6, max_age_seconds: float = 900.0) -> None:
+        self.history_size = history_size
+        self.max_age_seconds = max_age_seconds
+        self._stops: dict[int, _StopHistory] = {}
+        self._pruned_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.history_size > 0
+
+    def __len__(self) -> int:
+        return len(self._stops)
+
+    def observe(self, response: ArrivalsResponse, now: float | None = None) -> None:
+        """Record a fresh upstream response and fill its smoothed fields in place.
+
+        Only call it with a response nobody else holds yet (straight from
+        the normalizer): the bus models are updated without copying.
+        """
+        if not self.enabled:
+            return
+        now = time() if now is None else now
+        self._prune(now)
+        stop = self._stops.get(response.stop_id)
+        if stop is None:
+            stop = self._stops[response.stop_id] = _StopHistory()
+        previous = stop.buses
+        current: dict[tuple[int, int], deque[Observation]] = {}
+        oldest = now - self.max_age_seconds
+
+        for line in response.lines:
+            for bus in line.buses:
+                if bus.eta_minutes is None:
+                    continue
+                key = (line.line_id, bus.bus_id)
+                history = previous.get(key)
+                if history is None:
+                    history = deque(maxlen=self.history_size)
+                observation = Observation(
+                    now, bus.eta_minutes, bus.distance_meters, bus.last_stop_id
+                )
+                if history and self._is_new_trip(history, observation):
+                    history.clear()
+                while history and history[0].observed_at < oldest:
+                    history.popleft()
+                history.append(observation)
+                current[key] = history
+
+                arrival = max(now, self._smoothed_arrival(history))
+                bus.smoothed_eta_minutes = round((arrival - now) / 60, 1)
+                bus.expected_at = datetime.fromtimestamp(round(arrival), UTC)
+
+        stop.buses = current
+        stop.updated_at = now
+
+    def _is_new_trip(self, history: deque[Observation], observation: Observation) -> bool:
+        last = history[-1]
+        if (
+            observation.distance_meters is not None
+            and last.distance_meters is not None
+            and observation.distance_meters > last.distance_meters + RESET_METERS
+        ):
+            return True
+        return abs(observation.arrival - self._smoothed_arrival(history)) > RESET_SECONDS
+
+    @staticmethod
+    def _smoothed_arrival(history: deque[Observation]) -> float:
+        total = weights = 0.0
+        weight = 1.0
+        for observation in reversed(history):
+            total += observation.arrival * weight
+            weights += weight
+            weight *= DECAY
+        return total / weights
+
+    def _prune(self, now: float) -> None:
+        # Barrido completo como mucho una vez por ventana: coste amortizado O(1).
+        if now - self._pruned_at < self.max_age_seconds:
+            return
+        self._pruned_at = now
+        oldest = now - self.max_age_seconds
+        for stop_id in [key for key, stop in self._stops.items() if stop.updated_at < oldest]:
+            del self._stops[stop_id]
@@ -0,0 +1,71 @@
+"""Spatial lookup of stops around a point, built once per catalog refresh."""
+
+import math
+from collections.abc import Sequence
+
+from app.services.records import StopRecord
+
+EARTH_RADIUS_METERS = 6_371_000.0
+METERS_PER_DEGREE_LAT = 111_320.0
+DEFAULT_CELL_METERS = 250.0
+
+
+def haversine_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(min(1.0, a)))
+
+
+class StopGeoIndex:
+    """Uniform lat/lon grid of stops.
+
+    Each cell is about ``cell_meters`` wide, so a query only measures the
+    stops in the cells overlapping the search circle. Stops without
+    coordinates (0, 0) are left out.
+    """
+
+    __slots__ = ("_stops", "_coords", "_cells", "_lat_step", "_lon_step")
+
+    def __init__(
+        self, stops: Sequence[StopRecord], cell_meters: float = DEFAULT_CELL_METERS
+    ) -> None:
+        located = [stop for stop in stops if stop.latitude or stop.longitude]
+        self._stops = tuple(located)
+        self._coords = tuple((stop.latitude, stop.longitude) for stop in located)
+        mean_lat = sum(lat for lat, _ in self._coords) / len(located) if located else 0.0
+        self._lat_step = cell_meters / METERS_PER_DEGREE_LAT
+        self._lon_step = self._lat_step / max(math.cos(math.radians(mean_lat)), 0.01)
+        cells: dict[tuple[int, int], list[int]] = {}
+        for position, (lat, lon) in enumerate(self._coords):
+            cells.setdefault(self._cell(lat, lon), []).append(position)
+        self._cells = {key: tuple(positions) for key, positions in cells.items()}
+
+    def __len__(self) -> int:
+        return len(self._stops)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self._lat_step), math.floor(lon / self._lon_step)
+
+    def nearby(
+        self, lat: float, lon: float, radius_meters: float, limit: int
+    ) -> list[tuple[StopRecord, float]]:
+        """Stops within ``radius_meters`` of (lat, lon), nearest first."""
+        if not self._stops:
+            return []
+        radius_lat = radius_meters / METERS_PER_DEGREE_LAT
+        radius_lon = radius_lat / max(math.cos(math.radians(lat)), 0.01)
+        min_row, min_col = self._cell(lat - radius_lat, lon - radius_lon)
+        max_row, max_col = self._cell(lat + radius_lat, lon + radius_lon)
+
+        found: list[tuple[float, int]] = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for position in self._cells.get((row, col), ()):
+                    stop_lat, stop_lon = self._coords[position]
+                    distance = haversine_meters(lat, lon, stop_lat, stop_lon)
+                    if distance <= radius_meters:
+                        found.append((distance, position))
+        found.sort()
+        return [(self._stops[position], distance) for distance, position in found[:limit]]
@@ -0,0 +1,166 @@
+"""Incremental JSON reading for large upstream documents."""
+
+import codecs
+import json
+import re
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+_NON_WHITESPACE = re.compile(r"[^ \t\n\r]")
+# Primer carácter que no puede formar parte de un número o de true/false/null.
+_SCALAR_END = re.compile(r"[^-+.0-9A-Za-z]")
+
+# Estados de un contenedor abierto.
+_KEY_OR_END = 0  # tras "{"
+_KEY = 1  # tras "," en un objeto
+_COLON = 2
+_VALUE_OR_END = 3  # tras "["
+_VALUE = 4  # tras ":" o tras "," en un array
+_COMMA_OR_END = 5
+
+Path = tuple[str, ...]
+
+
+@dataclass(slots=True)
+class _Frame:
+    path: Path
+    is_array: bool
+    state: int
+    key: str = ""
+
+
+class JsonArrayStream:
+    """Push parser that hands over the items of selected arrays one at a time.
+
+    ``handlers`` maps the key path of an array (e.g. ``("a", "items")`` for
+    ``{"a": {"items": [...]}}``) to a callback that receives each decoded
+    item. Only the objects leading to those arrays are tracked; each item is
+    decoded by the C ``json`` scanner as soon as its last byte arrives and
+    everything else is skipped, so memory stays around one chunk plus one
+    item instead of the whole document tree.
+    """
+
+    def __init__(self, handlers: Mapping[Path, Callable[[Any], object]]) -> None:
+        self._handlers = dict(handlers)
+        self._containers = {path[:depth] for path in handlers for depth in range(len(path))}
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._scanner = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[_Frame] = []
+        self._started = False
+
+    def feed(self, chunk: bytes) -> None:
+        # Se descarta lo ya consumido: el búfer nunca guarda más de un elemento pendiente.
+        self._buffer = self._buffer[self._pos :] + self._text.decode(chunk)
+        self._pos = 0
+        self._consume(final=False)
+
+    def close(self) -> None:
+        """Process what is left; raises ``ValueError`` if the document is incomplete."""
+        self._buffer = self._buffer[self._pos :] + self._text.decode(b"", final=True)
+        self._pos = 0
+        self._consume(final=True)
+        if self._stack or not self._started:
+            raise ValueError("Incomplete JSON document")
+
+    def _consume(self, final: bool) -> None:
+        buffer = self._buffer
+        while True:
+            match = _NON_WHITESPACE.search(buffer, self._pos)
+            if match is None:
+                self._pos = len(buffer)
+                return
+            pos = self._pos = match.start()
+            char = buffer[pos]
+            if not self._stack:
+                if self._started:
+                    raise ValueError(f"Extra data at position {pos}")
+                self._started = True
+                if not self._value((), char, final):
+                    self._started = False
+                    return
+                continue
+
+            frame = self._stack[-1]
+            state = frame.state
+            if state == _COMMA_OR_END:
+                if char == ",":
+                    frame.state = _VALUE if frame.is_array else _KEY
+                    self._pos += 1
+                elif char == ("]" if frame.is_array else "}"):
+                    self._close_container()
+                else:
+                    raise ValueError(f"Expected ',' or end of container at position {pos}")
+            elif state == _COLON:
+                if char != ":":
+                    raise ValueError(f"Expected ':' at position {pos}")
+                frame.state = _VALUE
+                self._pos += 1
+            elif state in (_KEY_OR_END, _KEY):
+                if char == "}" and state == _KEY_OR_END:
+                    self._close_container()
+                    continue
+                if char != '"':
+                    raise ValueError(f"Expected object key at position {pos}")
+                complete, key = self._decode(final)
+                if not complete:
+                    return
+                frame.key = key
+                frame.state = _COLON
+            elif frame.is_array:
+                if char == "]" and state == _VALUE_OR_END:
+                    self._close_container()
+                    continue
+                if not self._value(frame.path, char, final, item=True):
+                    return
+            else:
+                if not self._value((*frame.path, frame.key), char, final):
+                    return
+
+    def _value(self, path: Path, char: str, final: bool, item: bool = False) -> bool:
+        """Enter, hand over or skip the value at ``path``; False if more data is needed."""
+        if not item and char == "[" and path in self._handlers:
+            self._open(path, is_array=True)
+            return True
+        if not item and char == "{" and path in self._containers:
+            self._open(path, is_array=False)
+            return True
+        complete, value = self._decode(final)
+        if not complete:
+            return False
+        if item:
+            self._handlers[path](value)
+        if self._stack:
+            self._stack[-1].state = _COMMA_OR_END
+        return True
+
+    def _decode(self, final: bool) -> tuple[bool, Any]:
+        """Decode one value at the cursor; ``(False, None)`` if it is cut short."""
+        # Un escalar que llega al final del búfer puede continuar en el siguiente
+        # fragmento ("2." de "2.5", "1e" de "1e3"): se espera a ver dónde acaba.
+        if (
+            not final
+            and self._buffer[self._pos] not in '"[{'
+            and _SCALAR_END.search(self._buffer, self._pos) is None
+        ):
+            return False, None
+        try:
+            value, end = self._scanner.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _open(self, path: Path, is_array: bool) -> None:
+        self._stack.append(_Frame(path, is_array, _VALUE_OR_END if is_array else _KEY_OR_END))
+        self._pos += 1
+
+    def _close_container(self) -> None:
+        self._stack.pop()
+        self._pos += 1
+        if self._stack:
+            self._stack[-1].state = _COMMA_OR_END
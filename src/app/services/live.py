@@ -0,0 +1,108 @@
+"""Fan-out of live arrivals: one upstream poller per watched stop."""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+
+from app.models.transit import ArrivalsResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class LiveError:
+    """Published to subscribers when a poll fails; the poller keeps going."""
+
+    detail: str
+
+
+LiveUpdate = ArrivalsResponse | LiveError
+
+
+@dataclass(slots=True)
+class _Channel:
+    subscribers: set[asyncio.Queue[LiveUpdate]] = field(default_factory=set)
+    latest: LiveUpdate | None = None
+    task: asyncio.Task[None] | None = None
+
+
+class ArrivalsBroadcaster:
+    """Poll each watched stop once per interval and push results to every subscriber.
+
+    Upstream load grows with the number of distinct watched stops rather
+    than with connected devices. The poller for a stop starts with its
+    first subscriber and stops when the last one leaves. Subscriber
+    queues hold a single item, so a slow client only ever gets the most
+    recent update.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[int], Awaitable[ArrivalsResponse]],
+        interval_seconds: float,
+        error_type: type[Exception] = Exception,
+    ) -> None:
+        self._fetch = fetch
+        self.interval_seconds = interval_seconds
+        self._error_type = error_type
+        self._channels: dict[int, _Channel] = {}
+
+    @property
+    def watched_stops(self) -> int:
+        return len(self._channels)
+
+    def subscriber_count(self, stop_id: int) -> int:
+        channel = self._channels.get(stop_id)
+        return len(channel.subscribers) if channel else 0
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, stop_id: int) -> AsyncIterator[asyncio.Queue[LiveUpdate]]:
+        channel = self._channels.get(stop_id)
+        if channel is None:
+            channel = self._channels[stop_id] = _Channel()
+        queue: asyncio.Queue[LiveUpdate] = asyncio.Queue(maxsize=1)
+        if channel.latest is not None:
+            queue.put_nowait(channel.latest)
+        channel.subscribers.add(queue)
+        if channel.task is None:
+            # Contexto limpio: el sondeo sobrevive a la petición que lo arranca.
+            channel.task = asyncio.create_task(
+                self._poll(stop_id, channel), context=contextvars.Context()
+            )
+        try:
+            yield queue
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers:
+                self._channels.pop(stop_id, None)
+                if channel.task is not None:
+                    channel.task.cancel()
+
+    async def close(self) -> None:
+        tasks = [channel.task for channel in self._channels.values() if channel.task]
+        self._channels.clear()
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _poll(self, stop_id: int, channel: _Channel) -> None:
+        while True:
+            update: LiveUpdate
+            try:
+                update = await self._fetch(stop_id)
+            except self._error_type as exc:
+                update = LiveError(detail=str(exc))
+            except Exception:
+                logger.exception("Live arrivals poll failed", extra={"stop_id": stop_id})
+                update = LiveError(detail="internal_error")
+            channel.latest = update
+            for queue in channel.subscribers:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(update)
+            await asyncio.sleep(self.interval_seconds)
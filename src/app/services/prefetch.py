@@ -0,0 +1,222 @@
+"""Demand-driven prefetching of arrivals under a global upstream budget."""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import math
+from collections.abc import Awaitable, Callable
+from time import monotonic
+
+from app.core.metrics import ARRIVALS_PREFETCHES, PREFETCH_STOPS, UPSTREAM_BUDGET_WAIT
+from app.models.transit import ArrivalsResponse
+
+logger = logging.getLogger(__name__)
+
+# Frecuencia con la que el planificador revisa qué paradas tocan.
+TICK_SECONDS = 1.0
+# Puntuación mínima para considerar una parada "caliente" (~2 peticiones por semivida).
+HOT_SCORE = 1.0
+# Por debajo de esto se olvida la demanda de la parada.
+FORGET_SCORE = 0.05
+
+
+class TokenBucket:
+    """Rate limiter shared by every upstream call of the process.
+
+    ``rate`` tokens per second accumulate up to ``burst``. :meth:`acquire`
+    reserves a token and, if the bucket is in debt, waits its turn, so the
+    long-run rate never exceeds ``rate``. A ``rate`` of zero or less
+    disables the limit.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated_at = monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def available(self) -> float:
+        """Tokens in the bucket now (``inf`` without a limit); negative while in debt."""
+        if not self.enabled:
+            return math.inf
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        return self._tokens
+
+    async def acquire(self) -> None:
+        if not self.enabled:
+            return
+        self._tokens = self.available() - 1
+        if self._tokens < 0:
+            wait = -self._tokens / self.rate
+            UPSTREAM_BUDGET_WAIT.inc(amount=wait)
+            await asyncio.sleep(wait)
+
+
+class PrefetchScheduler:
+    """Keep the arrivals of the most requested stops warm before clients ask.
+
+    Each request adds one to its stop's demand score, which halves every
+    ``half_life_seconds``. The ``max_stops`` hottest stops (always including
+    ``primary_stop_id``) are refreshed every ``max_interval_seconds``
+    divided by their score, and at least twice before the nearest bus is
+    due, within ``[min_interval_seconds, max_interval_seconds]``. Other
+    stops stay on demand. A prefetch only runs while the upstream budget
+    keeps half of its burst for on-demand requests.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[int, float], Awaitable[object]],
+        cached: Callable[[int], tuple[ArrivalsResponse, float] | None],
+        budget: TokenBucket,
+        primary_stop_id: int,
+        max_stops: int,
+        min_interval_seconds: float,
+        max_interval_seconds: float,
+        half_life_seconds: float,
+        ttl_slack_seconds: float,
+        error_type: type[Exception] = Exception,
+    ) -> None:
+        self._refresh = refresh
+        self._cached = cached
+        self.budget = budget
+        self.primary_stop_id = primary_stop_id
+        self.max_stops = max_stops
+        self.min_interval_seconds = min_interval_seconds
+        self.max_interval_seconds = max(min_interval_seconds, max_interval_seconds)
+        self.half_life_seconds = half_life_seconds
+        self.ttl_slack_seconds = ttl_slack_seconds
+        self._error_type = error_type
+        # parada -> (puntuación, instante de la última actualización)
+        self._demand: dict[int, tuple[float, float]] = {}
+        self._attempted_at: dict[int, float] = {}
+        self._inflight: dict[int, asyncio.Task[None]] = {}
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_stops > 0
+
+    def record(self, stop_id: int, now: float | None = None) -> None:
+        """Count one client request for ``stop_id``."""
+        if not self.enabled:
+            return
+        now = monotonic() if now is None else now
+        self._demand[stop_id] = (self.score(stop_id, now) + 1.0, now)
+
+    def score(self, stop_id: int, now: float) -> float:
+        entry = self._demand.get(stop_id)
+        if entry is None:
+            return 0.0
+        score, updated_at = entry
+        return score * 0.5 ** ((now - updated_at) / self.half_life_seconds)
+
+    def hot_stops(self, now: float) -> list[tuple[int, float]]:
+        """``(stop_id, score)`` of the stops to keep warm, hottest first."""
+        scores: dict[int, float] = {}
+        for stop_id in list(self._demand):
+            score = self.score(stop_id, now)
+            if score < FORGET_SCORE:
+                del self._demand[stop_id]
+                self._attempted_at.pop(stop_id, None)
+            elif score >= HOT_SCORE:
+                scores[stop_id] = score
+        # La parada principal se mantiene caliente aunque nadie la pida.
+        scores[self.primary_stop_id] = max(HOT_SCORE, scores.get(self.primary_stop_id, 0.0))
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        hot = ranked[: self.max_stops]
+        if self.primary_stop_id not in dict(hot):
+            hot[-1] = (self.primary_stop_id, scores[self.primary_stop_id])
+        return hot
+
+    def interval(self, score: float, cached: tuple[ArrivalsResponse, float] | None) -> float:
+        """Seconds between refreshes for a stop with ``score`` and its cached arrivals."""
+        interval = self.max_interval_seconds / max(1.0, score)
+        nearest = _nearest_eta_seconds(cached)
+        if nearest is not None:
+            interval = min(interval, nearest / 2)
+        return min(self.max_interval_seconds, max(self.min_interval_seconds, interval))
+
+    def due(self, now: float) -> list[tuple[int, float]]:
+        """``(stop_id, interval)`` of the hot stops whose arrivals should be refreshed now."""
+        hot = self.hot_stops(now)
+        PREFETCH_STOPS.set(len(hot))
+        due = []
+        for stop_id, score in hot:
+            if stop_id in self._inflight:
+                continue
+            cached = self._cached(stop_id)
+            interval = self.interval(score, cached)
+            # Los fallos también esperan el intervalo mínimo antes de reintentarse.
+            if now - self._attempted_at.get(stop_id, -math.inf) < self.min_interval_seconds:
+                continue
+            if cached is None or cached[1] >= interval:
+                due.append((stop_id, interval))
+        return due
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            # Contexto limpio: el planificador no pertenece a la petición que lo arranque.
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def close(self) -> None:
+        tasks = [task for task in (self._task, *self._inflight.values()) if task is not None]
+        self._task = None
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _run(self) -> None:
+        while True:
+            now = monotonic()
+            spare = self.budget.available() - self.budget.burst / 2
+            for stop_id, interval in self.due(now):
+                if spare < 1:
+                    ARRIVALS_PREFETCHES.inc("budget")
+                    break
+                spare -= 1
+                self._attempted_at[stop_id] = now
+                self._inflight[stop_id] = asyncio.create_task(
+                    self._prefetch(stop_id, interval), context=contextvars.Context()
+                )
+            await asyncio.sleep(TICK_SECONDS)
+
+    async def _prefetch(self, stop_id: int, interval: float) -> None:
+        try:
+            # La entrada dura hasta el siguiente refresco, con margen para su latencia.
+            await self._refresh(stop_id, interval + self.ttl_slack_seconds)
+        except self._error_type as exc:
+            ARRIVALS_PREFETCHES.inc("error")
+            logger.debug("Arrivals prefetch failed", extra={"stop_id": stop_id, "reason": str(exc)})
+        except Exception:
+            ARRIVALS_PREFETCHES.inc("error")
+            logger.exception("Arrivals prefetch failed", extra={"stop_id": stop_id})
+        else:
+            ARRIVALS_PREFETCHES.inc("ok")
+        finally:
+            self._inflight.pop(stop_id, None)
+
+
+def _nearest_eta_seconds(cached: tuple[ArrivalsResponse, float] | None) -> float | None:
+    """Seconds until the nearest bus in ``cached`` (response, age), if any bus has an ETA."""
+    if cached is None:
+        return None
+    response, age = cached
+    nearest: float | None = None
+    for line in response.lines:
+        for bus in line.buses:
+            eta = bus.smoothed_eta_minutes
+            if eta is None:
+                eta = bus.eta_minutes
+            if eta is not None and (nearest is None or eta < nearest):
+                nearest = eta
+    return None if nearest is None else max(0.0, nearest * 60 - age)
@@ -0,0 +1,45 @@
+"""Compact internal catalog records; pydantic models are only built for responses."""
+
+
+class StopRecord:
+    """A stop as kept in memory: plain slots, integer line ids and a line bitmask.
+
+    ``line_mask`` has one bit per line of the catalog it belongs to (see
+    ``build_catalog_index``), so checking a stop against a profile's
+    interest lines is a single ``&``. Records are shared by every profile
+    view of a catalog and never modified once it is published.
+    """
+
+    __slots__ = ("id", "name", "latitude", "longitude", "lines", "line_mask")
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        latitude: float,
+        longitude: float,
+        lines: tuple[int, ...] = (),
+        line_mask: int = 0,
+    ) -> None:
+        self.id = id
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.lines = lines
+        self.line_mask = line_mask
+
+    def __repr__(self) -> str:
+        return f"StopRecord(id={self.id}, name={self.name!r}, lines={self.lines})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, StopRecord):
+            return NotImplemented
+        return (self.id, self.name, self.latitude, self.longitude, self.lines) == (
+            other.id,
+            other.name,
+            other.latitude,
+            other.longitude,
+            other.lines,
+        )
+
+    __hash__ = None  # type: ignore[assignment]
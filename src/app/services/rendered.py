@@ -0,0 +1,75 @@
+"""API bodies rendered once per catalog snapshot."""
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from app.core.http_cache import RenderedBody, make_etag
+from app.models.transit import StopSearchResponse
+from app.services.catalog import CatalogIndex
+
+# Páginas HTML distintas (host/base_path) que se guardan por catálogo.
+MAX_PAGES = 16
+
+
+class RenderedCatalog:
+    """Serialized (and precompressed) responses derived from one catalog.
+
+    The full stop list is rendered eagerly when the catalog is swapped in;
+    stop details, other list limits and HTML pages are rendered on first
+    use and kept until the next catalog.
+    """
+
+    __slots__ = ("catalog", "_stop_lists", "_stop_details", "_pages")
+
+    def __init__(self, catalog: CatalogIndex) -> None:
+        self.catalog = catalog
+        self._stop_lists: dict[int, RenderedBody] = {}
+        self._stop_details: dict[int, RenderedBody] = {}
+        self._pages: OrderedDict[Hashable, RenderedBody] = OrderedDict()
+        self.stop_list(len(catalog.interest_stops))
+
+    @property
+    def version(self) -> str:
+        return self.catalog.version
+
+    def stop_list(self, limit: int) -> RenderedBody:
+        """Body of ``/api/stops`` without query for the given ``limit``."""
+        limit = min(limit, len(self.catalog.interest_stops))
+        body = self._stop_lists.get(limit)
+        if body is None:
+            stops = [self.catalog.summary(stop) for stop in self.catalog.interest_stops[:limit]]
+            payload = StopSearchResponse(total=len(stops), stops=stops)
+            body = RenderedBody.render(
+                payload.model_dump_json().encode(),
+                make_etag(self.catalog.version, "stops", str(limit)),
+            )
+            self._stop_lists[limit] = body
+        return body
+
+    def stop_detail(self, stop_id: int) -> RenderedBody | None:
+        body = self._stop_details.get(stop_id)
+        if body is None:
+            stop = self.catalog.stops_by_id.get(stop_id)
+            if stop is None:
+                return None
+            body = RenderedBody.render(
+                self.catalog.summary(stop).model_dump_json().encode(),
+                make_etag(self.catalog.version, "stop", str(stop_id)),
+            )
+            self._stop_details[stop_id] = body
+        return body
+
+    def page(self, key: Hashable, render: Callable[[], str]) -> RenderedBody:
+        """Memoize an HTML page that only depends on the catalog and ``key``."""
+        body = self._pages.get(key)
+        if body is None:
+            content = render().encode()
+            body = RenderedBody.render(
+                content,
+                make_etag(self.catalog.version, content),
+                media_type="text/html; charset=utf-8",
+            )
+            self._pages[key] = body
+            while len(self._pages) > MAX_PAGES:
+                self._pages.popitem(last=False)
+        return body
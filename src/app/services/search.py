@@ -0,0 +1,104 @@
+"""Accent-insensitive stop name search built once per catalog refresh."""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from collections.abc import Sequence
+
+from app.services.records import StopRecord
+
+_TOKEN_RE = re.compile(r"\w+")
+_NGRAM = 3
+
+RANK_PREFIX = 0
+RANK_TOKEN = 1
+RANK_SUBSTRING = 2
+
+
+def fold(text: str) -> str:
+    """Lowercase ``text`` and strip accents ("Plaza España" -> "plaza espana")."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(fold(text))
+
+
+def _ngrams(text: str) -> set[str]:
+    return {text[i : i + _NGRAM] for i in range(len(text) - _NGRAM + 1)}
+
+
+class StopSearchIndex:
+    """Ranked lookup over stop names.
+
+    Results are ordered by rank and then by the order of ``stops``:
+    names starting with the query first, then names where every query
+    token prefixes a name token, then plain substring matches. Token
+    prefixes are resolved by bisecting a sorted token array and substrings
+    through a trigram index; only fragments shorter than a trigram fall
+    back to scanning every name.
+    """
+
+    __slots__ = ("_stops", "_names", "_tokens", "_token_positions", "_ngrams")
+
+    def __init__(self, stops: Sequence[StopRecord]) -> None:
+        self._stops = tuple(stops)
+        self._names: tuple[str, ...] = tuple(" ".join(tokenize(stop.name)) for stop in self._stops)
+
+        pairs: set[tuple[str, int]] = set()
+        ngrams: dict[str, set[int]] = {}
+        for position, (stop, name) in enumerate(zip(self._stops, self._names, strict=True)):
+            pairs.update((token, position) for token in name.split())
+            pairs.add((str(stop.id), position))
+            for gram in _ngrams(name):
+                ngrams.setdefault(gram, set()).add(position)
+
+        ordered = sorted(pairs)
+        self._tokens = [token for token, _ in ordered]
+        self._token_positions = [position for _, position in ordered]
+        self._ngrams = {gram: frozenset(positions) for gram, positions in ngrams.items()}
+
+    def __len__(self) -> int:
+        return len(self._stops)
+
+    def search(self, query: str | None, limit: int) -> list[StopRecord]:
+        tokens = tokenize(query or "")
+        if not tokens:
+            return list(self._stops[:limit])
+
+        normalized = " ".join(tokens)
+        ranked: list[tuple[int, int]] = []
+
+        candidates = self._prefix_positions(tokens[0])
+        for token in tokens[1:]:
+            if not candidates:
+                break
+            candidates &= self._prefix_positions(token)
+        for position in candidates:
+            rank = RANK_PREFIX if self._names[position].startswith(normalized) else RANK_TOKEN
+            ranked.append((rank, position))
+
+        if len(ranked) < limit:
+            for position in self._substring_positions(normalized) - candidates:
+                ranked.append((RANK_SUBSTRING, position))
+
+        ranked.sort()
+        return [self._stops[position] for _, position in ranked[:limit]]
+
+    def _prefix_positions(self, prefix: str) -> set[int]:
+        start = bisect_left(self._tokens, prefix)
+        end = bisect_left(self._tokens, prefix + "\U0010ffff", lo=start)
+        return set(self._token_positions[start:end])
+
+    def _substring_positions(self, fragment: str) -> set[int]:
+        if len(fragment) < _NGRAM:
+            # Sin trigramas que cruzar: recorrido lineal, como antes del índice.
+            return {position for position, name in enumerate(self._names) if fragment in name}
+        grams = sorted(_ngrams(fragment), key=lambda gram: len(self._ngrams.get(gram, ())))
+        candidates = set(self._ngrams.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates &= self._ngrams.get(gram, frozenset())
+        return {position for position in candidates if fragment in self._names[position]}
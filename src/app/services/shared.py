@@ -0,0 +1,130 @@
+"""State shared by the uvicorn workers of one host (multi-worker mode).
+
+Backed by a SQLite database in WAL mode, ideally on a tmpfs such as
+``/run`` so it behaves like a shared-memory segment that survives worker
+restarts. It holds the latest catalog, the last arrivals of every stop
+and short leases that elect which worker talks to upstream. All methods
+are blocking; the service calls them through ``asyncio.to_thread``.
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+from pathlib import Path
+from time import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS catalog (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    content BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS arrivals (
+    stop_id INTEGER PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    content BLOB NOT NULL
+);
+"""
+
+
+class SharedStore:
+    """Catalog, arrivals and upstream leases shared between worker processes.
+
+    Timestamps are wall-clock (``time()``) because monotonic clocks are not
+    comparable across processes. A lease is held by at most one worker
+    until released or until it expires, so a crashed holder never blocks
+    the others for longer than the lease duration.
+    """
+
+    def __init__(self, path: str | Path, busy_timeout_seconds: float = 2.0) -> None:
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        self.owner = f"{os.getpid()}-{secrets.token_hex(4)}"
+        # Una conexión por worker; el cerrojo la protege de los hilos de to_thread.
+        self._conn = sqlite3.connect(
+            target, timeout=busy_timeout_seconds, isolation_level=None, check_same_thread=False
+        )
+        self._mutex = threading.Lock()
+        with self._mutex:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._mutex:
+            self._conn.close()
+
+    def acquire(self, name: str, ttl_seconds: float) -> bool:
+        """Take (or extend) the lease ``name``; False if another worker holds it."""
+        now = time()
+        with self._mutex:
+            cursor = self._conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, "
+                "expires_at = excluded.expires_at "
+                "WHERE leases.expires_at <= ? OR leases.owner = excluded.owner",
+                (name, self.owner, now + ttl_seconds, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, name: str, hold_seconds: float = 0.0) -> None:
+        """Give the lease back, or keep it ``hold_seconds`` longer (e.g. to back off)."""
+        with self._mutex:
+            if hold_seconds > 0:
+                self._conn.execute(
+                    "UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ?",
+                    (time() + hold_seconds, name, self.owner),
+                )
+            else:
+                self._conn.execute(
+                    "DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner)
+                )
+
+    def catalog_info(self) -> tuple[str, float] | None:
+        """Version and age in seconds of the stored catalog, without reading it."""
+        with self._mutex:
+            row = self._conn.execute("SELECT version, saved_at FROM catalog").fetchone()
+        return (row[0], max(0.0, time() - row[1])) if row else None
+
+    def load_catalog(self) -> tuple[bytes, float] | None:
+        """Stored catalog content and its age in seconds."""
+        with self._mutex:
+            row = self._conn.execute("SELECT content, saved_at FROM catalog").fetchone()
+        return (row[0], max(0.0, time() - row[1])) if row else None
+
+    def save_catalog(self, version: str, content: bytes) -> None:
+        with self._mutex:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO catalog (id, version, saved_at, content) "
+                "VALUES (1, ?, ?, ?)",
+                (version, time(), content),
+            )
+
+    def get_arrivals(self, stop_id: int, max_age_seconds: float) -> tuple[bytes, float] | None:
+        """Arrivals content stored at most ``max_age_seconds`` ago, with its age."""
+        now = time()
+        with self._mutex:
+            row = self._conn.execute(
+                "SELECT content, stored_at FROM arrivals WHERE stop_id = ? AND stored_at > ?",
+                (stop_id, now - max_age_seconds),
+            ).fetchone()
+        return (row[0], max(0.0, now - row[1])) if row else None
+
+    def put_arrivals(self, stop_id: int, content: bytes, release: str | None = None) -> None:
+        """Store arrivals for ``stop_id`` and optionally release a lease in the same call."""
+        with self._mutex:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO arrivals (stop_id, stored_at, content) VALUES (?, ?, ?)",
+                (stop_id, time(), content),
+            )
+            if release is not None:
+                self._conn.execute(
+                    "DELETE FROM leases WHERE name = ? AND owner = ?", (release, self.owner)
+                )
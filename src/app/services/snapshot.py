@@ -0,0 +1,114 @@
+"""On-disk copy of the parsed stop catalog for fast, offline-tolerant startup."""
+
+import json
+import logging
+import os
+import tempfile
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from time import time
+from typing import NamedTuple
+
+from app.services.records import StopRecord
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+
+class LineEntry(NamedTuple):
+    id: int
+    name: str
+    color: str | None
+    routes: tuple[tuple[int, ...], ...]
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogData:
+    """Parsed catalog as stored on disk: enough to rebuild every index."""
+
+    stops: list[StopRecord]
+    lines: list[LineEntry]
+    saved_at: float
+
+
+def encode_snapshot(stops: Sequence[StopRecord], lines: list[LineEntry]) -> bytes:
+    """Serialize the parsed catalog (also used by the shared multi-worker store)."""
+    document = {
+        "format": SNAPSHOT_FORMAT,
+        "saved_at": time(),
+        "stops": [
+            [stop.id, stop.name, stop.latitude, stop.longitude, list(stop.lines)] for stop in stops
+        ],
+        "lines": [[line.id, line.name, line.color, line.routes] for line in lines],
+    }
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def save_snapshot(path: str | Path, stops: Sequence[StopRecord], lines: list[LineEntry]) -> None:
+    """Write the snapshot atomically (temp file + rename in the same directory)."""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    content = encode_snapshot(stops, lines)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{target.name}.", dir=target.parent)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(content)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_name, target)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def load_snapshot(path: str | Path) -> CatalogData | None:
+    """Read a snapshot written by :func:`save_snapshot`; None if missing or unusable."""
+    try:
+        content = Path(path).read_bytes()
+    except FileNotFoundError:
+        return None
+    except OSError as exc:
+        logger.warning("Ignoring unreadable catalog snapshot", exc_info=exc)
+        return None
+    return decode_snapshot(content)
+
+
+def decode_snapshot(content: bytes) -> CatalogData | None:
+    """Parse :func:`encode_snapshot` output; None if it is not a usable snapshot."""
+    try:
+        document = json.loads(content)
+    except ValueError as exc:
+        logger.warning("Ignoring unreadable catalog snapshot", exc_info=exc)
+        return None
+
+    if not isinstance(document, dict) or document.get("format") != SNAPSHOT_FORMAT:
+        logger.warning("Ignoring catalog snapshot with unknown format")
+        return None
+
+    try:
+        stops = [
+            StopRecord(
+                id=int(item[0]),
+                name=str(item[1]),
+                latitude=float(item[2]),
+                longitude=float(item[3]),
+                lines=tuple(int(line_id) for line_id in item[4]),
+            )
+            for item in document["stops"]
+        ]
+        lines = [
+            LineEntry(
+                id=int(item[0]),
+                name=str(item[1]),
+                color=item[2],
+                routes=tuple(tuple(int(stop_id) for stop_id in route) for route in item[3]),
+            )
+            for item in document["lines"]
+        ]
+        saved_at = float(document["saved_at"])
+    except (KeyError, IndexError, TypeError, ValueError) as exc:
+        logger.warning("Ignoring corrupt catalog snapshot", exc_info=exc)
+        return None
+    return CatalogData(stops=stops, lines=lines, saved_at=saved_at)
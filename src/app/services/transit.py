@@ -1,112 +1,605 @@
 import asyncio
+import contextlib
+import contextvars
+import importlib.util
 import logging
+import random
+import sqlite3
+from collections.abc import Awaitable, Callable, Mapping
 from functools import lru_cache
-from time import monotonic
-from typing import Any
+from time import monotonic, time
+from types import MappingProxyType
+from typing import Any, TypeVar
 
 import httpx
 
-from app.core.app_config import AppConfig, load_app_config
+from app.core.app_config import DEFAULT_PROFILE, AppConfig, ProfileConfig, load_app_config
 from app.core.config import Settings, get_settings
-from app.models.transit import ArrivalBus, ArrivalsResponse, LineArrivals, StopSummary
+from app.core.metrics import (
+    CACHE_REQUESTS,
+    CATALOG_LINES,
+    CATALOG_REFRESH_DURATION,
+    CATALOG_STOPS,
+    UPSTREAM_ERRORS,
+    UPSTREAM_REQUEST_DURATION,
+)
+from app.models.transit import (
+    ArrivalBus,
+    ArrivalsResponse,
+    NearbyStop,
+    StopArrivalsResult,
+    StopSummary,
+)
+from app.services.arrivals import arrivals_json, normalize_arrivals, parse_int
+from app.services.cache import TTLCache
+from app.services.catalog import (
+    EMPTY_LINES,
+    CatalogIndex,
+    LineCatalog,
+    LineInfo,
+    Route,
+    build_catalog_index,
+    build_profile_view,
+    build_stop_positions,
+    interest_line_ids,
+)
+from app.services.circuit import CircuitBreaker
+from app.services.eta import EtaTracker
+from app.services.jsonstream import JsonArrayStream
+from app.services.live import ArrivalsBroadcaster
+from app.services.prefetch import PrefetchScheduler, TokenBucket
+from app.services.records import StopRecord
+from app.services.rendered import RenderedCatalog
+from app.services.shared import SharedStore
+from app.services.snapshot import (
+    LineEntry,
+    decode_snapshot,
+    encode_snapshot,
+    load_snapshot,
+    save_snapshot,
+)
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Modo multi-worker (SHARED_CACHE_PATH).
+CATALOG_LEASE = "catalog"
+# Antigüedad máxima del catálogo compartido que se adopta si CACHE_TTL_SECONDS=0.
+SHARED_CATALOG_MAX_AGE_SECONDS = 300.0
+SHARED_CATALOG_POLL_SECONDS = 0.25
+SHARED_ARRIVALS_POLL_SECONDS = 0.05
+
+# Tamaño de los fragmentos del catálogo que se entregan al parser incremental.
+CATALOG_CHUNK_BYTES = 64 * 1024
+CATALOG_STOPS_PATH = ("iTranvias", "actualizacion", "paradas")
+CATALOG_LINES_PATH = ("iTranvias", "actualizacion", "lineas")
+
 
 class TransitServiceError(Exception):
     """Raised when the remote transit API cannot be reached or parsed."""
 
 
+class TransitCircuitOpenError(TransitServiceError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class UnknownProfileError(LookupError):
+    """Raised for a profile name that is not in the app config."""
+
+
 class TransitService:
     def __init__(
-        self, settings: Settings | None = None, app_config: AppConfig | None = None
+        self,
+        settings: Settings | None = None,
+        app_config: AppConfig | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
     ) -> None:
         self.settings = settings or get_settings()
         self.app_config = app_config or load_app_config()
-        self._stops_cache: list[StopSummary] | None = None
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._shared: SharedStore | None = None
+        self._catalog: CatalogIndex | None = None
+        # Vista del catálogo por perfil, sustituida junto con _catalog.
+        self._views: Mapping[str, CatalogIndex] = MappingProxyType({})
+        # Cuerpos renderizados por versión de vista (perfiles iguales comparten).
+        self._rendered: dict[str, RenderedCatalog] = {}
+        # (parada, líneas de interés) -> (respuesta completa, respuesta filtrada)
+        self._filtered: dict[
+            tuple[int, frozenset[str]], tuple[ArrivalsResponse, ArrivalsResponse]
+        ] = {}
+        # (parada, líneas de interés) -> (respuesta servida, su JSON)
+        self._bodies: dict[tuple[int, frozenset[str]], tuple[ArrivalsResponse, bytes]] = {}
         self._cache_expires_at: float = 0.0
         self._lock = asyncio.Lock()
-        self._lines_info: dict[int, dict[str, str | None]] = {}
-        self._lines_routes: dict[int, list[dict]] = {}  # Rutas de cada línea
-        self._lines_origin: dict[int, int | None] = {}  # ID de la primera parada (origen) de cada línea
-        self._interest_line_ids: set[int] = set()
-        self._interest_line_names = {
-            line.strip().lower() for line in self.app_config.interest_lines
+        self._refresh_failures = 0
+        self._refresh_task: asyncio.Task[bool] | None = None
+        self._refresher: asyncio.Task[None] | None = None
+        self._arrivals_cache: TTLCache[int, ArrivalsResponse] = TTLCache(
+            ttl_seconds=self.settings.arrivals_cache_ttl_seconds,
+            max_entries=self.settings.arrivals_cache_max_entries,
+            stale_seconds=self.settings.arrivals_stale_max_age_seconds,
+            name="arrivals",
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=self.settings.circuit_failure_threshold,
+            failure_rate=self.settings.circuit_failure_rate,
+            window_seconds=self.settings.circuit_window_seconds,
+            open_seconds=self.settings.circuit_open_seconds,
+            slow_call_seconds=self.settings.circuit_slow_call_seconds,
+        )
+        self.eta = EtaTracker(
+            history_size=self.settings.eta_history_size,
+            max_age_seconds=self.settings.eta_history_max_age_seconds,
+        )
+        self.live = ArrivalsBroadcaster(
+            self._get_arrivals,
+            interval_seconds=self.settings.live_poll_interval_seconds,
+            error_type=TransitServiceError,
+        )
+        self.profiles: Mapping[str, ProfileConfig] = MappingProxyType(
+            self.app_config.all_profiles()
+        )
+        self._profile_line_names = {
+            name: frozenset(line.strip().lower() for line in profile.interest_lines)
+            for name, profile in self.profiles.items()
         }
+        self._interest_line_names = self._profile_line_names[DEFAULT_PROFILE]
         self.primary_stop_id = self.app_config.primary_stop_id
+        self.budget = TokenBucket(
+            rate=self.settings.upstream_rate_limit, burst=self.settings.upstream_rate_burst
+        )
+        self.prefetch = PrefetchScheduler(
+            self._prefetch_arrivals,
+            self._arrivals_cache.get_stale,
+            self.budget,
+            primary_stop_id=self.primary_stop_id,
+            max_stops=self.settings.prefetch_max_stops,
+            min_interval_seconds=self.settings.prefetch_min_interval_seconds,
+            max_interval_seconds=self.settings.prefetch_max_interval_seconds,
+            half_life_seconds=self.settings.prefetch_demand_half_life_seconds,
+            ttl_slack_seconds=self.settings.http_timeout_seconds,
+            error_type=TransitServiceError,
+        )
+
+    async def start(self) -> None:
+        """Open the shared HTTP client and start the background catalog refresher.
+
+        The catalog shared by other workers, or else the snapshot on disk,
+        is loaded first so requests are served immediately; the refresher
+        then revalidates it against upstream.
+        """
+        self._get_client()
+        if self._catalog is None:
+            async with self._lock:
+                if self._catalog is None and (
+                    await self._restore_shared() or await self._restore_snapshot()
+                ):
+                    self._cache_expires_at = 0.0
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+        self.prefetch.start()
+
+    async def close(self) -> None:
+        for task in (self._refresher, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._refresher = None
+        self._refresh_task = None
+        await self.prefetch.close()
+        await self.live.close()
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+        shared, self._shared = self._shared, None
+        if shared is not None:
+            shared.close()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    def _get_shared(self) -> SharedStore | None:
+        if self._shared is None and self.settings.shared_cache_path:
+            self._shared = SharedStore(self.settings.shared_cache_path)
+        return self._shared
+
+    async def _shared_call(self, method: Callable[..., T], *args: object, default: T) -> T:
+        """Run a blocking store call off the loop; on SQLite errors act as if unshared."""
+        try:
+            return await asyncio.to_thread(method, *args)
+        except sqlite3.Error as exc:
+            logger.warning("Shared cache unavailable", exc_info=exc)
+            return default
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.settings.http_max_connections,
+            max_keepalive_connections=self.settings.http_max_keepalive_connections,
+            keepalive_expiry=self.settings.http_keepalive_expiry_seconds,
+        )
+        http2 = self.settings.http2_enabled
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the 'h2' package is missing; using HTTP/1.1")
+            http2 = False
+        return httpx.AsyncClient(
+            timeout=self.settings.http_timeout_seconds,
+            limits=limits,
+            http2=http2,
+            transport=self._transport,
+        )
 
     async def _fetch_json(self, url: str | Any) -> dict:
+        return await self._fetch(url, self._read_json, "arrivals")
+
+    async def _fetch_catalog(self) -> tuple[list[StopRecord], list[LineEntry]]:
+        """Download func=7 and parse it incrementally, off the event loop."""
+        return await self._fetch(self.settings.stops_source_url, self._read_catalog, "catalog")
+
+    @staticmethod
+    async def _read_json(response: httpx.Response) -> dict:
+        await response.aread()
+        return response.json()
+
+    async def _read_catalog(
+        self, response: httpx.Response
+    ) -> tuple[list[StopRecord], list[LineEntry]]:
+        """Map stops and lines as their bytes arrive, never holding the whole document.
+
+        Each chunk is parsed in a worker thread, so the loop keeps serving
+        requests while a large catalog downloads.
+        """
+        stops: list[StopRecord] = []
+        lines: list[LineEntry] = []
+        parser = JsonArrayStream(
+            {
+                CATALOG_STOPS_PATH: lambda item: stops.append(self._map_stop(item)),
+                CATALOG_LINES_PATH: lambda item: lines.extend(self._parse_line_entries([item])),
+            }
+        )
+        async for chunk in response.aiter_bytes(CATALOG_CHUNK_BYTES):
+            await asyncio.to_thread(parser.feed, chunk)
+        parser.close()
+        return stops, lines
+
+    async def _fetch(
+        self, url: str | Any, read: Callable[[httpx.Response], Awaitable[T]], endpoint: str
+    ) -> T:
+        """GET ``url`` through the circuit breaker; ``endpoint`` labels its metrics."""
         target_url = str(url)
+        if not self.breaker.allow_request():
+            UPSTREAM_ERRORS.inc(endpoint, "circuit_open")
+            raise TransitCircuitOpenError("transit_api_circuit_open")
+        try:
+            await self.budget.acquire()
+        except asyncio.CancelledError:
+            # Cancelada mientras esperaba turno: la sonda semiabierta no llegó a salir.
+            self.breaker.release_probe()
+            raise
+        started = monotonic()
         try:
-            async with httpx.AsyncClient(timeout=self.settings.http_timeout_seconds) as client:
-                response = await client.get(target_url)
+            async with self._get_client().stream("GET", target_url) as response:
                 response.raise_for_status()
-                return response.json()
+                payload = await read(response)
         except httpx.HTTPError as exc:  # pragma: no cover - network failure path
+            elapsed = monotonic() - started
+            self.breaker.record_failure(elapsed)
+            UPSTREAM_REQUEST_DURATION.observe(elapsed, endpoint)
+            UPSTREAM_ERRORS.inc(endpoint, "http_error")
             logger.error("Transit API request failed", exc_info=exc, extra={"url": target_url})
             raise TransitServiceError("transit_api_unavailable") from exc
+        except ValueError as exc:
+            elapsed = monotonic() - started
+            self.breaker.record_failure(elapsed)
+            UPSTREAM_REQUEST_DURATION.observe(elapsed, endpoint)
+            UPSTREAM_ERRORS.inc(endpoint, "invalid_response")
+            logger.error("Transit API returned invalid JSON", extra={"url": target_url})
+            raise TransitServiceError("transit_api_invalid_response") from exc
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except Exception as exc:
+            # Un elemento con forma inesperada (p. ej. "posy": null) también cuenta como
+            # fallo: si no, una sonda semiabierta no se liberaría nunca.
+            elapsed = monotonic() - started
+            self.breaker.record_failure(elapsed)
+            UPSTREAM_REQUEST_DURATION.observe(elapsed, endpoint)
+            UPSTREAM_ERRORS.inc(endpoint, "invalid_response")
+            logger.error(
+                "Transit API returned an unexpected payload",
+                exc_info=exc,
+                extra={"url": target_url},
+            )
+            raise TransitServiceError("transit_api_invalid_response") from exc
+        elapsed = monotonic() - started
+        self.breaker.record_success(elapsed)
+        UPSTREAM_REQUEST_DURATION.observe(elapsed, endpoint)
+        return payload
+
+    @property
+    def catalog_age_seconds(self) -> float | None:
+        """Seconds since the current catalog was downloaded (None for the placeholder)."""
+        catalog = self._catalog
+        if catalog is None or catalog.placeholder:
+            return None
+        return catalog.age_seconds
+
+    async def get_catalog_version(self, profile: str | None = None) -> str:
+        catalog = await self._load_view(profile)
+        return catalog.version
+
+    def has_profile(self, name: str) -> bool:
+        return name in self.profiles
 
-    async def _load_stops(self, force: bool = False) -> list[StopSummary]:
-        now = monotonic()
-        if not force and self._stops_cache and now < self._cache_expires_at:
-            return self._stops_cache
+    async def _load_view(self, profile: str | None) -> CatalogIndex:
+        """The current catalog as seen by ``profile`` (the default one when None)."""
+        catalog = await self._load_stops()
+        if profile is None or profile == DEFAULT_PROFILE:
+            return catalog
+        view = self._views.get(profile)
+        if view is None:
+            raise UnknownProfileError(profile)
+        return view
 
+    async def _load_stops(self) -> CatalogIndex:
+        """Return the current catalog without ever waiting on a refresh.
+
+        Only the very first call waits, because there is nothing to serve
+        yet. After that an expired catalog is served as is while a refresh
+        runs in the background (stale-while-revalidate).
+        """
+        catalog = self._catalog
+        if catalog is None:
+            async with self._lock:
+                if self._catalog is None:
+                    await self._refresh_catalog_locked()
+            assert self._catalog is not None
+            return self._catalog
+
+        if monotonic() >= self._cache_expires_at:
+            self._schedule_refresh()
+        return catalog
+
+    async def refresh_catalog(self, force: bool = False) -> bool:
+        """Download and swap in a new catalog. Returns False if upstream failed."""
         async with self._lock:
-            if self._stops_cache and now < self._cache_expires_at and not force:
-                return self._stops_cache
+            if not force and self._catalog is not None and monotonic() < self._cache_expires_at:
+                return True
+            return await self._refresh_catalog_locked()
+
+    async def _refresh_catalog_locked(self) -> bool:
+        shared = self._get_shared()
+        if shared is not None and await self._sync_shared_catalog(shared):
+            return True
+
+        started = monotonic()
+        try:
+            stops, line_entries = await self._fetch_catalog()
+        except TransitServiceError:
+            CATALOG_REFRESH_DURATION.observe(monotonic() - started, "error")
+            self._refresh_failures += 1
+            delay = self._retry_delay()
+            self._cache_expires_at = monotonic() + delay
+            if shared is not None:
+                # Se conserva el turno durante la espera: nadie reintenta antes.
+                await self._shared_call(shared.release, CATALOG_LEASE, delay, default=None)
+            await self._fallback_catalog()
+            return False
+
+        await self._swap_catalog(
+            lambda: build_catalog_index(stops, self._build_line_catalog(line_entries))
+        )
+        CATALOG_REFRESH_DURATION.observe(monotonic() - started, "ok")
+        self._refresh_failures = 0
+        self._set_cache_expiry()
+        await self._persist_snapshot(stops, line_entries)
+        if shared is not None:
+            await self._publish_shared_catalog(shared, stops, line_entries)
+        return True
+
+    async def _fallback_catalog(self) -> None:
+        """Serve something when there is no catalog yet and upstream is unavailable."""
+        if self._catalog is not None:
+            return
+        if not await self._restore_shared() and not await self._restore_snapshot():
+            logger.warning("Falling back to placeholder stop catalog")
+            placeholder = self._placeholder_stop()
+            await self._swap_catalog(lambda: build_catalog_index([placeholder], placeholder=True))
+
+    async def _sync_shared_catalog(self, shared: SharedStore) -> bool:
+        """Adopt another worker's catalog or wait for it; False if this worker must download.
+
+        Only the worker holding the catalog lease downloads. The others
+        adopt the catalog it publishes (they poll briefly on first load,
+        when they have nothing to serve yet).
+        """
+        ttl = self.settings.cache_ttl_seconds
+        max_age = ttl if ttl > 0 else SHARED_CATALOG_MAX_AGE_SECONDS
+        lease_seconds = self.settings.http_timeout_seconds + 5
+        deadline = monotonic() + lease_seconds
+        leader = False
+        while True:
+            info = await self._shared_call(shared.catalog_info, default=None)
+            if info is not None and info[1] < max_age:
+                version, age = info
+                current = self._catalog
+                if (
+                    current is not None and not current.placeholder and current.version == version
+                ) or await self._restore_shared():
+                    if leader:
+                        await self._shared_call(shared.release, CATALOG_LEASE, default=None)
+                    self._set_cache_expiry(age)
+                    return True
+            if leader:
+                return False
+            leader = await self._shared_call(
+                shared.acquire, CATALOG_LEASE, lease_seconds, default=True
+            )
+            if leader:
+                # Se mira una vez más: otro worker pudo publicar justo antes.
+                continue
+            if self._catalog is not None:
+                # Otro worker está descargando: se vuelve a mirar en un momento.
+                self._cache_expires_at = monotonic() + SHARED_CATALOG_POLL_SECONDS * 4
+                return True
+            if monotonic() >= deadline:
+                # El turno sigue ocupado (p. ej. esperando para reintentar tras un fallo).
+                await self._fallback_catalog()
+                self._cache_expires_at = monotonic() + self._retry_delay()
+                return True
+            await asyncio.sleep(SHARED_CATALOG_POLL_SECONDS)
+
+    async def _restore_shared(self) -> bool:
+        """Load the catalog published by another worker, whatever its age."""
+        shared = self._get_shared()
+        if shared is None:
+            return False
+        stored = await self._shared_call(shared.load_catalog, default=None)
+        if stored is None:
+            return False
+        content, age = stored
+        data = await asyncio.to_thread(decode_snapshot, content)
+        if data is None:
+            return False
+        built_at = monotonic() - age
+        await self._swap_catalog(
+            lambda: build_catalog_index(
+                data.stops, self._build_line_catalog(data.lines), built_at=built_at
+            )
+        )
+        return True
 
+    async def _publish_shared_catalog(
+        self, shared: SharedStore, stops: list[StopRecord], lines: list[LineEntry]
+    ) -> None:
+        assert self._catalog is not None
+        content = await asyncio.to_thread(encode_snapshot, stops, lines)
+        await self._shared_call(shared.save_catalog, self._catalog.version, content, default=None)
+        await self._shared_call(shared.release, CATALOG_LEASE, default=None)
+
+    async def _swap_catalog(self, build: Callable[[], CatalogIndex]) -> None:
+        """Build a catalog, its profile views and its rendered bodies off the loop, then swap."""
+        catalog, views, rendered = await asyncio.to_thread(self._prepare_catalog, build)
+        # Sustitución atómica: las peticiones en curso conservan la instantánea anterior.
+        self._catalog = catalog
+        self._views = views
+        self._rendered = {catalog.version: rendered}
+        self._filtered = {}
+        self._bodies = {}
+        CATALOG_STOPS.set(len(catalog.stops_by_id))
+        CATALOG_LINES.set(len(catalog.lines.info))
+
+    def _prepare_catalog(
+        self, build: Callable[[], CatalogIndex]
+    ) -> tuple[CatalogIndex, Mapping[str, CatalogIndex], RenderedCatalog]:
+        catalog = build()
+        # Se renderiza antes de publicar para que ninguna petición pague la serialización;
+        # los demás perfiles se renderizan en su primera petición.
+        return catalog, self._build_views(catalog), RenderedCatalog(catalog)
+
+    def _build_views(self, catalog: CatalogIndex) -> Mapping[str, CatalogIndex]:
+        """One view per profile; profiles with the same interest lines share it."""
+        by_lines = {catalog.lines.interest_line_ids: catalog}
+        views = {DEFAULT_PROFILE: catalog}
+        for name, names in self._profile_line_names.items():
+            if name == DEFAULT_PROFILE:
+                continue
+            line_ids = interest_line_ids(catalog.lines.info, names)
+            view = by_lines.get(line_ids)
+            if view is None:
+                view = by_lines[line_ids] = build_profile_view(catalog, line_ids)
+            views[name] = view
+        return MappingProxyType(views)
+
+    async def get_rendered_catalog(self, profile: str | None = None) -> RenderedCatalog:
+        """Pre-serialized bodies for the catalog currently being served to ``profile``."""
+        catalog = await self._load_view(profile)
+        rendered = self._rendered.get(catalog.version)
+        if rendered is None or rendered.catalog is not catalog:
+            rendered = await asyncio.to_thread(RenderedCatalog, catalog)
+            self._rendered[catalog.version] = rendered
+        return rendered
+
+    async def _restore_snapshot(self) -> bool:
+        """Load the on-disk catalog copy, if configured and readable."""
+        path = self.settings.catalog_snapshot_path
+        if not path:
+            return False
+        data = await asyncio.to_thread(load_snapshot, path)
+        if data is None:
+            return False
+        built_at = monotonic() - max(0.0, time() - data.saved_at)
+        await self._swap_catalog(
+            lambda: build_catalog_index(
+                data.stops, self._build_line_catalog(data.lines), built_at=built_at
+            )
+        )
+        logger.info("Catalog restored from snapshot", extra={"path": path})
+        return True
+
+    async def _persist_snapshot(self, stops: list[StopRecord], lines: list[LineEntry]) -> None:
+        path = self.settings.catalog_snapshot_path
+        if not path:
+            return
+        try:
+            await asyncio.to_thread(save_snapshot, path, stops, lines)
+        except OSError as exc:
+            logger.warning("Could not write catalog snapshot", exc_info=exc, extra={"path": path})
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            # Contexto limpio: el refresco no pertenece a la petición que lo dispara.
+            self._refresh_task = asyncio.create_task(
+                self.refresh_catalog(), context=contextvars.Context()
+            )
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            if self._catalog is not None:
+                delay = self._cache_expires_at - monotonic()
+                if delay == float("inf"):
+                    return
+                await asyncio.sleep(max(0.0, delay))
             try:
-                payload = await self._fetch_json(self.settings.stops_source_url)
-            except TransitServiceError:
-                if self._stops_cache:
-                    return self._stops_cache
-                logger.warning("Falling back to placeholder stop catalog")
-                self._stops_cache = [self._placeholder_stop()]
-                self._lines_info = {}
-                self._lines_routes = {}
-                self._lines_origin = {}
-                self._interest_line_ids = set()
-                self._set_cache_expiry()
-                return self._stops_cache
-
-            actualizacion = payload.get("iTranvias", {}).get("actualizacion", {})
-            stops_raw = actualizacion.get("paradas", [])
-            stops = [self._map_stop(item) for item in stops_raw]
-            lines_raw = actualizacion.get("lineas", [])
-            self._lines_info = self._parse_line_info(lines_raw)
-            self._stops_cache = stops
-            self._set_cache_expiry()
-            return stops
+                await self.refresh_catalog()
+            except Exception:  # pragma: no cover - keep refreshing on parse bugs
+                logger.exception("Catalog refresh failed")
+                self._refresh_failures += 1
+                self._cache_expires_at = monotonic() + self._retry_delay()
+
+    def _retry_delay(self) -> float:
+        """Exponential backoff with jitter so workers do not retry in lockstep."""
+        base = self.settings.catalog_retry_base_seconds
+        ceiling = self.settings.catalog_retry_max_seconds
+        delay = min(ceiling, base * 2 ** max(0, self._refresh_failures - 1))
+        return delay * random.uniform(0.5, 1.0)
 
     @staticmethod
-    def _map_stop(raw: dict) -> StopSummary:
+    def _map_stop(raw: dict) -> StopRecord:
         lines: list[int] = []
         for line in raw.get("enlaces", []):
             try:
                 lines.append(int(line))
             except (TypeError, ValueError):
                 continue
-        return StopSummary(
+        return StopRecord(
             id=int(raw["id"]),
             name=str(raw.get("nombre", f"Parada {raw['id']}")),
             latitude=float(raw.get("posy", 0.0)),
             longitude=float(raw.get("posx", 0.0)),
-            lines=lines,
+            lines=tuple(lines),
         )
 
-    def _placeholder_stop(self) -> StopSummary:
+    def _placeholder_stop(self) -> StopRecord:
         stop_id = self.primary_stop_id
-        return StopSummary(
-            id=stop_id,
-            name=f"Parada {stop_id}",
-            latitude=0.0,
-            longitude=0.0,
-            lines=[],
-        )
+        return StopRecord(id=stop_id, name=f"Parada {stop_id}", latitude=0.0, longitude=0.0)
 
-    def _parse_line_info(self, lines_raw: list[dict]) -> dict[int, dict[str, str | None]]:
-        info: dict[int, dict[str, str | None]] = {}
-        interest_ids: set[int] = set()
+    def _parse_line_entries(self, lines_raw: list[dict]) -> list[LineEntry]:
+        entries: list[LineEntry] = []
         for item in lines_raw:
             try:
                 line_id = int(item["id"])
@@ -116,194 +609,294 @@ class TransitService:
             color = item.get("color")
             if color:
                 color = color if color.startswith("#") else f"#{color.zfill(6)}"
+            # Guardar rutas de la línea con las paradas ya convertidas a int
+            routes = tuple(self._parse_route(route) for route in item.get("rutas", []))
+            entries.append(LineEntry(id=line_id, name=name, color=color, routes=routes))
+        return entries
+
+    def _build_line_catalog(self, entries: list[LineEntry]) -> LineCatalog:
+        info: dict[int, LineInfo] = {}
+        lines_routes: dict[int, tuple[Route, ...]] = {}
+        lines_origin: dict[int, int | None] = {}
+        for entry in entries:
+            line_id, name, routes = entry.id, entry.name, entry.routes
             normalized = name.lower()
-            info[line_id] = {"name": name, "name_lower": normalized, "color": color}
-            
-            # Guardar rutas de la línea
-            routes = item.get("rutas", [])
-            self._lines_routes[line_id] = routes
-            
+            info[line_id] = {"name": name, "name_lower": normalized, "color": entry.color}
+            lines_routes[line_id] = routes
+
             # Determinar origen: primera parada de la primera ruta
-            origin_stop_id = None
-            if routes and len(routes) > 0:
-                first_route = routes[0]
-                paradas = first_route.get("paradas", [])
-                if paradas and len(paradas) > 0:
-                    origin_stop_id = self._safe_int(paradas[0])
-            self._lines_origin[line_id] = origin_stop_id
+            origin_stop_id = routes[0][0] if routes and routes[0] else None
+            lines_origin[line_id] = origin_stop_id
             if origin_stop_id:
-                logger.debug(f"Línea {line_id} ({name}): origen={origin_stop_id}, rutas={len(routes)}")
-            
-            if (
-                normalized in self._interest_line_names
-                or str(line_id).lower() in self._interest_line_names
-            ):
-                interest_ids.add(line_id)
-        self._interest_line_ids = interest_ids
-        return info
-
-    def _set_cache_expiry(self) -> None:
+                logger.debug(
+                    "Línea %s (%s): origen=%s, rutas=%d", line_id, name, origin_stop_id, len(routes)
+                )
+
+        return LineCatalog(
+            info=MappingProxyType(info),
+            routes=MappingProxyType(lines_routes),
+            origins=MappingProxyType(lines_origin),
+            interest_line_ids=interest_line_ids(info, self._interest_line_names),
+            stop_positions=build_stop_positions(lines_routes, lines_origin),
+        )
+
+    def _parse_route(self, route: dict) -> Route:
+        stops = (parse_int(parada) for parada in route.get("paradas", []))
+        return tuple(stop_id for stop_id in stops if stop_id is not None)
+
+    def _set_cache_expiry(self, age: float = 0.0) -> None:
         ttl = self.settings.cache_ttl_seconds
         if ttl and ttl > 0:
-            self._cache_expires_at = monotonic() + ttl
+            self._cache_expires_at = monotonic() + max(0.0, ttl - age)
         else:
             self._cache_expires_at = float("inf")
 
-    async def search_stops(self, query: str | None, limit: int = 50) -> list[StopSummary]:
-        stops = await self._load_stops()
-        stops = self._filter_interest_stops(stops)
-        if not query:
-            return stops[:limit]
-
-        normalized = query.strip().lower()
-        if not normalized:
-            return stops[:limit]
-
-        results = [stop for stop in stops if normalized in stop.name.lower()]
-        return results[:limit]
-
-    def _filter_interest_stops(self, stops: list[StopSummary]) -> list[StopSummary]:
-        if not self._interest_line_ids:
-            return sorted(stops, key=lambda stop: stop.name)
-        filtered: list[StopSummary] = []
-        for stop in stops:
-            filtered_stop = self._apply_interest_to_stop(stop)
-            if filtered_stop.lines:
-                filtered.append(filtered_stop)
-        return sorted(filtered, key=lambda stop: stop.name)
-
-    async def get_stop(self, stop_id: int) -> StopSummary | None:
-        stops = await self._load_stops()
-        stop = next((stop for stop in stops if stop.id == stop_id), None)
-        if stop:
-            return self._apply_interest_to_stop(stop)
-        return None
-
-    async def get_arrivals(self, stop_id: int) -> ArrivalsResponse:
-        if not self._lines_info:
-            await self._load_stops()
-        url = self.settings.arrivals_url_template.format(stop_id=stop_id)
-        payload = await self._fetch_json(url)
-        lines_raw = payload.get("buses", {}).get("lineas", [])
-        lines: list[LineArrivals] = []
+    async def search_stops(
+        self, query: str | None, limit: int = 50, profile: str | None = None
+    ) -> list[StopSummary]:
+        catalog = await self._load_view(profile)
+        return [catalog.summary(stop) for stop in catalog.search.search(query, limit)]
 
-        for line_item in lines_raw:
-            line_id = self._safe_int(line_item.get("linea"))
-            if line_id is None:
-                continue
-            line_meta = self._lines_info.get(line_id)
-            # skip lines not in interest list
-            if not self._is_interest_line(line_id, line_meta):
-                continue
+    async def nearby_stops(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_meters: float,
+        limit: int = 10,
+        profile: str | None = None,
+    ) -> list[NearbyStop]:
+        catalog = await self._load_view(profile)
+        return [
+            NearbyStop(
+                id=stop.id,
+                name=stop.name,
+                latitude=stop.latitude,
+                longitude=stop.longitude,
+                lines=catalog.stop_lines(stop),
+                distance_meters=round(distance, 1),
+            )
+            for stop, distance in catalog.geo.nearby(latitude, longitude, radius_meters, limit)
+        ]
 
-            buses_data = []
-            for bus in line_item.get("buses", []):
-                bus_id = self._safe_int(bus.get("bus"))
-                if bus_id is None:
-                    continue
-                buses_data.append(
-                    ArrivalBus(
-                        bus_id=bus_id,
-                        eta_minutes=self._safe_int(bus.get("tiempo")),
-                        distance_meters=self._safe_int(bus.get("distancia")),
-                        status=self._safe_int(bus.get("estado")),
-                        last_stop_id=self._safe_int(bus.get("ult_parada")),
-                    )
-                )
-            buses_data.sort(
-                key=lambda item: item.eta_minutes if item.eta_minutes is not None else 10**9
+    async def get_stop(self, stop_id: int, profile: str | None = None) -> StopSummary | None:
+        catalog = await self._load_view(profile)
+        return catalog.get_stop(stop_id)
+
+    async def get_arrivals(self, stop_id: int, profile: str | None = None) -> ArrivalsResponse:
+        """Arrivals of the profile's interest lines (every profile shares one cache)."""
+        self.prefetch.record(stop_id)
+        return self.filter_arrivals(await self._get_arrivals(stop_id), profile)
+
+    async def _prefetch_arrivals(self, stop_id: int, ttl_seconds: float) -> ArrivalsResponse:
+        """Refresh a hot stop ahead of demand; the entry lasts until its next refresh."""
+        return await self._arrivals_cache.refresh(
+            stop_id, lambda: self._load_arrivals(stop_id), ttl_seconds=ttl_seconds
+        )
+
+    async def _get_arrivals(self, stop_id: int) -> ArrivalsResponse:
+        """Arrivals of every line serving the stop, as cached and broadcast."""
+        try:
+            return await self._arrivals_cache.get_or_load(
+                stop_id, lambda: self._load_arrivals(stop_id)
             )
-            
-            # Determinar si la parada es de ida o vuelta para esta línea
-            is_ida = self._is_stop_direction_ida(stop_id, line_id)
-            logger.debug(
-                f"Parada {stop_id}, Línea {line_id}: is_ida={is_ida}, "
-                f"origen={self._lines_origin.get(line_id)}"
+        except TransitServiceError as exc:
+            # Si itranvias falla se sirve el último dato conocido en vez de un error.
+            cached = self._arrivals_cache.get_stale(stop_id) or await self._shared_arrivals(
+                stop_id,
+                self.settings.arrivals_cache_ttl_seconds
+                + self.settings.arrivals_stale_max_age_seconds,
             )
-            
-            lines.append(
-                LineArrivals(
-                    line_id=line_id,
-                    line_name=line_meta["name"] if line_meta else None,
-                    color_hex=line_meta["color"] if line_meta else None,
-                    buses=buses_data,
-                    is_ida=is_ida,
-                )
+            if cached is None:
+                raise
+            response, age = cached
+            CACHE_REQUESTS.inc("arrivals", "stale")
+            logger.warning(
+                "Serving stale arrivals",
+                extra={"stop_id": stop_id, "age_seconds": round(age, 1), "reason": str(exc)},
             )
+            return self._age_arrivals(response, age)
+
+    async def _load_arrivals(self, stop_id: int) -> ArrivalsResponse:
+        """Fetch arrivals, reusing what another worker fetched within the TTL.
+
+        In multi-worker mode a per-stop lease makes only one worker ask
+        upstream; the rest poll the shared store until its answer lands
+        (or the lease expires) instead of fetching the same stop again.
+        """
+        shared = self._get_shared()
+        ttl = self.settings.arrivals_cache_ttl_seconds
+        if shared is None or ttl <= 0:
+            return await self._fetch_arrivals(stop_id)
 
-        lines.sort(
-            key=lambda item: (
-                item.buses[0].eta_minutes
-                if item.buses and item.buses[0].eta_minutes is not None
-                else 10**9
+        lease = f"arrivals:{stop_id}"
+        lease_seconds = self.settings.http_timeout_seconds + 1
+        deadline = monotonic() + lease_seconds
+        leader = False
+        while True:
+            found = await self._shared_arrivals(stop_id, ttl)
+            if found is not None:
+                if leader:
+                    await self._shared_call(shared.release, lease, default=None)
+                response, age = found
+                CACHE_REQUESTS.inc("shared_arrivals", "hit")
+                self._arrivals_cache.set(stop_id, response, age=age)
+                return response
+            # Tras conseguir el turno se mira una vez más: otro worker pudo publicar
+            # y soltarlo entre la consulta anterior y la adquisición.
+            if leader or monotonic() >= deadline:
+                break
+            leader = await self._shared_call(shared.acquire, lease, lease_seconds, default=True)
+            if not leader:
+                await asyncio.sleep(SHARED_ARRIVALS_POLL_SECONDS)
+
+        CACHE_REQUESTS.inc("shared_arrivals", "miss")
+        try:
+            response = await self._fetch_arrivals(stop_id)
+        except Exception:
+            await self._shared_call(shared.release, lease, default=None)
+            raise
+        content = arrivals_json(response)
+        await self._shared_call(shared.put_arrivals, stop_id, content, lease, default=None)
+        return response
+
+    async def _shared_arrivals(
+        self, stop_id: int, max_age: float
+    ) -> tuple[ArrivalsResponse, float] | None:
+        shared = self._get_shared()
+        if shared is None:
+            return None
+        found = await self._shared_call(shared.get_arrivals, stop_id, max_age, default=None)
+        if found is None:
+            return None
+        content, age = found
+        return ArrivalsResponse.model_validate_json(content), age
+
+    @staticmethod
+    def _age_arrivals(response: ArrivalsResponse, age_seconds: float) -> ArrivalsResponse:
+        """Copy of ``response`` flagged stale, with ETAs reduced by the elapsed minutes."""
+        elapsed = int(age_seconds // 60)
+        lines = [
+            line.model_copy(
+                update={
+                    "buses": [
+                        TransitService._aged_bus(bus, age_seconds, elapsed) for bus in line.buses
+                    ]
+                }
             )
+            for line in response.lines
+        ]
+        return response.model_copy(
+            update={"lines": lines, "stale": True, "age_seconds": round(age_seconds, 1)}
         )
-        return ArrivalsResponse(stop_id=stop_id, lines=lines)
 
-    def _is_interest_line(self, line_id: int, line_meta: dict[str, str | None] | None) -> bool:
-        if not self._interest_line_names:
-            return True
-        if line_id in self._interest_line_ids:
-            return True
-        if str(line_id).lower() in self._interest_line_names:
-            return True
-        if line_meta and line_meta.get("name_lower") in self._interest_line_names:
-            return True
-        return False
+    @staticmethod
+    def _aged_bus(bus: ArrivalBus, age_seconds: float, elapsed: int) -> ArrivalBus:
+        if bus.eta_minutes is None:
+            return bus
+        update: dict[str, Any] = {"eta_minutes": max(0, bus.eta_minutes - elapsed)}
+        if bus.smoothed_eta_minutes is not None:
+            # expected_at es una hora absoluta y sigue siendo válida.
+            smoothed = bus.smoothed_eta_minutes - age_seconds / 60
+            update["smoothed_eta_minutes"] = round(max(0.0, smoothed), 1)
+        return bus.model_copy(update=update)
 
-    def _apply_interest_to_stop(self, stop: StopSummary) -> StopSummary:
-        if not self._interest_line_ids:
-            return stop
-        stop.lines = [line_id for line_id in stop.lines if line_id in self._interest_line_ids]
-        return stop
+    async def get_arrivals_batch(
+        self, stop_ids: list[int], profile: str | None = None
+    ) -> list[StopArrivalsResult]:
+        """Fetch several stops concurrently; failures are reported per stop."""
+        semaphore = asyncio.Semaphore(max(1, self.settings.batch_concurrency))
 
-    def _is_stop_direction_ida(self, stop_id: int, line_id: int) -> bool:
+        async def fetch_one(stop_id: int) -> StopArrivalsResult:
+            async with semaphore:
+                if await self.get_stop(stop_id, profile) is None:
+                    return StopArrivalsResult(stop_id=stop_id, error="stop_not_found")
+                try:
+                    arrivals = await self.get_arrivals(stop_id, profile)
+                except TransitServiceError as exc:
+                    return StopArrivalsResult(stop_id=stop_id, error=str(exc))
+                return StopArrivalsResult(stop_id=stop_id, arrivals=arrivals)
+
+        unique_ids = list(dict.fromkeys(stop_ids))
+        return list(await asyncio.gather(*(fetch_one(stop_id) for stop_id in unique_ids)))
+
+    async def _fetch_arrivals(self, stop_id: int) -> ArrivalsResponse:
+        catalog = await self._load_stops()
+        url = self.settings.arrivals_url_template.format(stop_id=stop_id)
+        payload = await self._fetch_json(url)
+        lines_raw = payload.get("buses", {}).get("lineas", [])
+        response = normalize_arrivals(stop_id, lines_raw, catalog.lines)
+        self.eta.observe(response)
+        return response
+
+    def filter_arrivals(
+        self, response: ArrivalsResponse, profile: str | None = None
+    ) -> ArrivalsResponse:
+        """``response`` restricted to the profile's interest lines.
+
+        The result is memoized per stop and line set, so repeated reads of
+        the same cached response return the same object.
         """
-        Determina si una parada es de ida (se aleja de casa) para una línea.
-        Una parada es de ida si está en una ruta que empieza con el origen de la línea.
+        names = self._profile_line_names.get(profile or DEFAULT_PROFILE)
+        if names is None:
+            raise UnknownProfileError(profile)
+        if not names:
+            return response
+        key = (response.stop_id, names)
+        memo = self._filtered.get(key)
+        if memo is not None and memo[0] is response:
+            return memo[1]
+
+        view = self._views.get(profile or DEFAULT_PROFILE)
+        lines_catalog = view.lines if view is not None else EMPTY_LINES
+        # skip lines not in interest list
+        lines = [
+            line
+            for line in response.lines
+            if self._is_interest_line(
+                line.line_id, lines_catalog.info.get(line.line_id), lines_catalog, names
+            )
+        ]
+        filtered = (
+            response
+            if len(lines) == len(response.lines)
+            else response.model_copy(update={"lines": lines})
+        )
+        self._filtered[key] = (response, filtered)
+        return filtered
+
+    def arrivals_body(self, response: ArrivalsResponse, profile: str | None = None) -> bytes:
+        """JSON of ``response`` as served to ``profile``, serialized once per response.
+
+        Every request and live subscriber reading the same cached (and
+        filtered) response shares the bytes.
         """
-        if line_id not in self._lines_origin:
-            return False
-        
-        origin_stop_id = self._lines_origin[line_id]
-        if origin_stop_id is None:
-            return False
-        
-        routes = self._lines_routes.get(line_id, [])
-        if not routes:
-            return False
-        
-        # Normalizar stop_id a int para comparación
-        stop_id_int = int(stop_id)
-        origin_int = int(origin_stop_id)
-        
-        for route in routes:
-            paradas = route.get("paradas", [])
-            if not paradas:
-                continue
-            
-            # Convertir primera parada a int
-            first_stop = self._safe_int(paradas[0])
-            if first_stop is None:
-                continue
-            
-            # Si la ruta empieza con el origen y contiene la parada, es ida
-            if first_stop == origin_int:
-                # Verificar si la parada está en la lista
-                # Convertir todas las paradas a int y verificar
-                for parada in paradas:
-                    parada_int = self._safe_int(parada)
-                    if parada_int is not None and parada_int == stop_id_int:
-                        return True
-        
-        return False
+        names = self._profile_line_names.get(profile or DEFAULT_PROFILE, frozenset())
+        key = (response.stop_id, names)
+        memo = self._bodies.get(key)
+        if memo is not None and memo[0] is response:
+            return memo[1]
+        body = arrivals_json(response)
+        self._bodies[key] = (response, body)
+        return body
 
-    @staticmethod
-    def _safe_int(value: Any) -> int | None:
-        try:
-            return int(value)
-        except (TypeError, ValueError):
-            return None
+    def _is_interest_line(
+        self,
+        line_id: int,
+        line_meta: LineInfo | None,
+        lines_catalog: LineCatalog,
+        names: frozenset[str] | None = None,
+    ) -> bool:
+        if names is None:
+            names = self._interest_line_names
+        if not names:
+            return True
+        if line_id in lines_catalog.interest_line_ids:
+            return True
+        if str(line_id).lower() in names:
+            return True
+        if line_meta and line_meta.get("name_lower") in names:
+            return True
+        return False
 
 
 @lru_cache
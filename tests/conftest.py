@@ -1,15 +1,115 @@
+import asyncio
 from collections.abc import Generator
+from typing import Any
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 
+from app.core.config import Settings
 from app.main import app
 from app.models.transit import ArrivalBus, ArrivalsResponse, LineArrivals, StopSummary
-from app.services.transit import TransitService, get_transit_service
+from app.services.catalog import build_catalog_index
+from app.services.transit import TransitService, TransitServiceError, get_transit_service
+
+STOPS_PAYLOAD = {
+    "iTranvias": {
+        "actualizacion": {
+            "paradas": [
+                {
+                    "id": 42,
+                    "nombre": "Demo Stop",
+                    "posx": -8.4,
+                    "posy": 43.37,
+                    "enlaces": [3, "12", 1],
+                },
+                {
+                    "id": 7,
+                    "nombre": "Other",
+                    "posx": -8.3,
+                    "posy": 43.3,
+                    "enlaces": [99, 1],
+                },
+            ],
+            "lineas": [
+                {"id": 14, "lin_comer": "14", "color": "982135"},
+                {"id": 3, "lin_comer": "3", "color": "C0910F"},
+                # Fuera de las líneas de interés por defecto; la usan los perfiles.
+                {"id": 1, "lin_comer": "1", "color": "E3000F"},
+            ],
+        }
+    }
+}
+
+ARRIVALS_PAYLOAD = {
+    "buses": {
+        "lineas": [
+            {
+                "linea": "14",
+                "buses": [
+                    {
+                        "bus": "1002",
+                        "tiempo": "12",
+                        "distancia": "500",
+                        "estado": "0",
+                        "ult_parada": "12",
+                    },
+                    {
+                        "bus": "1001",
+                        "tiempo": "3",
+                        "distancia": "120",
+                        "estado": "0",
+                        "ult_parada": "13",
+                    },
+                ],
+            },
+            {
+                "linea": "3",
+                "buses": [
+                    {
+                        "bus": "2001",
+                        "tiempo": "----",
+                        "distancia": "3000",
+                        "estado": "1",
+                        "ult_parada": "90",
+                    }
+                ],
+            },
+            {"linea": "1", "buses": [{"bus": "3001", "tiempo": "5"}]},
+        ]
+    }
+}
+
+
+class FakeUpstream:
+    """Canned itranvias responses that count calls per endpoint.
+
+    ``delay`` slows every call so concurrent callers overlap; with
+    ``available`` set to False arrivals requests fail like an outage.
+    """
+
+    def __init__(self) -> None:
+        self.stops: dict[str, Any] = STOPS_PAYLOAD
+        self.arrivals: dict[str, Any] = ARRIVALS_PAYLOAD
+        self.delay = 0.0
+        self.available = True
+        self.calls = {"stops": 0, "arrivals": 0}
+
+    async def fetch(self, service: TransitService, url: Any) -> dict[str, Any]:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if str(url) == str(service.settings.stops_source_url):
+            self.calls["stops"] += 1
+            return self.stops
+        self.calls["arrivals"] += 1
+        if not self.available:
+            raise TransitServiceError("transit_api_unavailable")
+        return self.arrivals
 
 
 class FakeTransitService(TransitService):
     def __init__(self) -> None:  # pragma: no cover - simple data wiring
+        super().__init__()
         self.stop = StopSummary(
             id=42,
             name="Emilio Gonzalez Lopez",
@@ -17,6 +117,7 @@ class FakeTransitService(TransitService):
             longitude=-8.432,
             lines=[3, 12, 14],
         )
+        self.catalog = build_catalog_index([self.stop])
         self.arrivals = ArrivalsResponse(
             stop_id=42,
             lines=[
@@ -32,15 +133,24 @@ class FakeTransitService(TransitService):
             ],
         )
 
-    async def search_stops(self, query: str | None, limit: int = 8):
+    async def start(self) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+    async def _load_stops(self):
+        return self.catalog
+
+    async def search_stops(self, query: str | None, limit: int = 8, profile=None):
         if query and query.lower() not in self.stop.name.lower():
             return []
         return [self.stop][:limit]
 
-    async def get_stop(self, stop_id: int):
+    async def get_stop(self, stop_id: int, profile=None):
         return self.stop if stop_id == self.stop.id else None
 
-    async def get_arrivals(self, stop_id: int):
+    async def get_arrivals(self, stop_id: int, profile=None):
         return self.arrivals
 
 
@@ -62,6 +172,46 @@ def client(fake_service: FakeTransitService) -> Generator[TestClient, None, None
         yield test_client
 
 
+@pytest.fixture()
+def patch_upstream(monkeypatch):
+    """Replace upstream with ``fake(service, url) -> payload``.
+
+    The catalog payload is still serialized and fed through the streaming
+    parser, so tests exercise the same path as a real download.
+    """
+
+    def patch(fake) -> None:
+        async def fetch_catalog(self):  # type: ignore[override]
+            payload = await fake(self, self.settings.stops_source_url)
+            return await self._read_catalog(httpx.Response(200, json=payload))
+
+        monkeypatch.setattr(TransitService, "_fetch_json", fake)
+        monkeypatch.setattr(TransitService, "_fetch_catalog", fetch_catalog)
+
+    return patch
+
+
+@pytest.fixture()
+def service_settings() -> Settings:
+    return Settings(
+        stops_source_url="https://example.com/stops",
+        arrivals_url_template="https://example.com/arrivals?stop={stop_id}",
+        cache_ttl_seconds=60,
+    )
+
+
+@pytest.fixture()
+def fake_upstream(patch_upstream) -> FakeUpstream:
+    """Serve every TransitService upstream call from a :class:`FakeUpstream`."""
+    upstream = FakeUpstream()
+
+    async def fetch(self, url):  # type: ignore[override]
+        return await upstream.fetch(self, url)
+
+    patch_upstream(fetch)
+    return upstream
+
+
 @pytest.fixture()
 def anyio_backend() -> str:
     return "asyncio"
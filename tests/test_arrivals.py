@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from app.services.arrivals import arrivals_json, normalize_arrivals, parse_int
+from app.services.catalog import EMPTY_LINES
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("12", 12),
+        (7, 7),
+        (" 5 ", 5),
+        ("-3", -3),
+        ("----", None),
+        ("", None),
+        ("4.5", None),
+        (None, None),
+        (4.0, 4),
+        ([], None),
+    ],
+)
+def test_parse_int(value: object, expected: int | None) -> None:
+    assert parse_int(value) == expected
+
+
+def test_buses_and_lines_are_ordered_by_eta() -> None:
+    lines_raw = [
+        {"linea": "1", "buses": [{"bus": "10", "tiempo": "----"}]},
+        {
+            "linea": "2",
+            "buses": [
+                {"bus": "20", "tiempo": "9", "distancia": "900"},
+                {"bus": "21", "tiempo": "----", "estado": "1"},
+                {"bus": "x", "tiempo": "1"},
+                {"bus": "22", "tiempo": "4", "ult_parada": 12},
+            ],
+        },
+        {"linea": "3", "buses": [{"bus": "30", "tiempo": 6}]},
+        {"linea": "----", "buses": [{"bus": "40", "tiempo": "0"}]},
+    ]
+
+    response = normalize_arrivals(42, lines_raw, EMPTY_LINES)
+
+    assert [line.line_id for line in response.lines] == [2, 3, 1]
+    buses = response.lines[0].buses
+    assert [bus.bus_id for bus in buses] == [22, 20, 21]
+    assert [bus.eta_minutes for bus in buses] == [4, 9, None]
+    assert buses[0].last_stop_id == 12
+    assert buses[1].distance_meters == 900
+    assert buses[2].status == 1
+    assert json.loads(arrivals_json(response)) == json.loads(response.model_dump_json())
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.services import cache as cache_module
+from app.services.cache import TTLCache
+
+
+def test_entries_expire_after_ttl(monkeypatch) -> None:
+    now = {"value": 100.0}
+    monkeypatch.setattr(cache_module, "monotonic", lambda: now["value"])
+    cache: TTLCache[int, str] = TTLCache(ttl_seconds=10, max_entries=4)
+
+    cache.set(1, "a")
+    assert cache.get(1) == "a"
+    now["value"] += 10
+    assert cache.get(1) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache: TTLCache[int, str] = TTLCache(ttl_seconds=60, max_entries=2)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    assert cache.get(1) == "a"
+
+    cache.set(3, "c")
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    assert cache.get(3) == "c"
+
+
+@pytest.mark.anyio("asyncio")
+async def test_concurrent_misses_share_one_load() -> None:
+    cache: TTLCache[int, str] = TTLCache(ttl_seconds=60, max_entries=4)
+    calls = {"count": 0}
+
+    async def loader() -> str:
+        calls["count"] += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(cache.get_or_load(42, loader) for _ in range(10)))
+    assert results == ["value"] * 10
+    assert calls["count"] == 1
+
+
+@pytest.mark.anyio("asyncio")
+async def test_refresh_ttl_applies_to_a_load_already_in_flight() -> None:
+    cache: TTLCache[int, str] = TTLCache(ttl_seconds=5, max_entries=4)
+    calls = {"count": 0}
+
+    async def loader() -> str:
+        calls["count"] += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    miss = asyncio.ensure_future(cache.get_or_load(42, loader))
+    await asyncio.sleep(0)
+    assert await cache.refresh(42, loader, ttl_seconds=120) == "value"
+    await miss
+    stored_at, expires_at, _ = cache._entries[42]
+    assert calls["count"] == 1
+    assert expires_at - stored_at == 120
+
+
+@pytest.mark.anyio("asyncio")
+async def test_failed_load_is_not_cached() -> None:
+    cache: TTLCache[int, str] = TTLCache(ttl_seconds=60, max_entries=4)
+
+    async def failing() -> str:
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_load(1, failing)
+
+    async def working() -> str:
+        return "ok"
+
+    assert await cache.get_or_load(1, working) == "ok"
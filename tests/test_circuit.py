@@ -0,0 +1,51 @@
+from app.services import circuit as circuit_module
+from app.services.circuit import CircuitBreaker, CircuitState
+
+
+def _clock(monkeypatch) -> dict[str, float]:
+    now = {"value": 1000.0}
+    monkeypatch.setattr(circuit_module, "monotonic", lambda: now["value"])
+    return now
+
+
+def test_opens_after_repeated_failures_and_recovers(monkeypatch) -> None:
+    now = _clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=3, failure_rate=0.5, open_seconds=10)
+
+    breaker.record_success(0.1)
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure(0.1)
+    assert breaker.state is CircuitState.OPEN
+    assert not breaker.allow_request()
+
+    now["value"] += 10
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # una sola sonda a la vez
+
+    breaker.record_success(0.1)
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.snapshot()["calls"] == 0
+
+
+def test_failed_probe_reopens(monkeypatch) -> None:
+    now = _clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=5)
+    breaker.record_failure(0.1)
+    now["value"] += 5
+    assert breaker.allow_request()
+    breaker.record_failure(0.1)
+    assert breaker.state is CircuitState.OPEN
+
+
+def test_slow_calls_and_window(monkeypatch) -> None:
+    now = _clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=2, window_seconds=30, slow_call_seconds=2.0)
+    breaker.record_success(3.0)
+    now["value"] += 31
+    breaker.record_success(3.0)
+    assert breaker.state is CircuitState.CLOSED
+    breaker.record_success(2.5)
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.snapshot()["state"] == "open"
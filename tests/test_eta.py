@@ -0,0 +1,65 @@
+from datetime import UTC, datetime
+
+from app.models.transit import ArrivalBus, ArrivalsResponse, LineArrivals
+from app.services.eta import EtaTracker
+
+T0 = 1_700_000_000.0
+
+
+def _response(*buses: tuple[int, int | None, int | None]) -> ArrivalsResponse:
+    return ArrivalsResponse(
+        stop_id=42,
+        lines=[
+            LineArrivals(
+                line_id=3,
+                buses=[
+                    ArrivalBus(bus_id=bus_id, eta_minutes=eta, distance_meters=distance)
+                    for bus_id, eta, distance in buses
+                ],
+            )
+        ],
+    )
+
+
+def _observe(tracker: EtaTracker, now: float, *buses) -> ArrivalBus:
+    response = _response(*buses)
+    tracker.observe(response, now=now)
+    return response.lines[0].buses[0]
+
+
+def test_jittery_etas_are_smoothed_and_anchored() -> None:
+    tracker = EtaTracker(history_size=4)
+
+    first = _observe(tracker, T0, (1, 10, 3000))
+    assert first.smoothed_eta_minutes == 10
+    assert first.expected_at == datetime.fromtimestamp(T0 + 600, UTC)
+
+    # Un minuto después itranvias dice 11 (salto hacia arriba): la previsión apenas se mueve.
+    second = _observe(tracker, T0 + 60, (1, 11, 2600))
+    assert second.eta_minutes == 11
+    # Llegadas implícitas T0+600 (peso 0.5) y T0+720 (peso 1): T0+680.
+    assert second.smoothed_eta_minutes == 10.3
+    assert second.expected_at == datetime.fromtimestamp(T0 + 680, UTC)
+
+
+def test_history_restarts_on_new_trip_and_forgets_missing_buses() -> None:
+    tracker = EtaTracker(history_size=4)
+    _observe(tracker, T0, (1, 2, 400))
+    # El bus pasó por la parada y vuelve a estar lejos: otro viaje.
+    bus = _observe(tracker, T0 + 60, (1, 25, 6000))
+    assert bus.smoothed_eta_minutes == 25
+
+    _observe(tracker, T0 + 120, (2, 5, None))
+    assert list(tracker._stops[42].buses) == [(3, 2)]
+    assert _observe(tracker, T0 + 180, (1, None, None)).expected_at is None
+
+
+def test_old_stops_are_dropped_and_tracker_can_be_disabled() -> None:
+    tracker = EtaTracker(history_size=4, max_age_seconds=60)
+    _observe(tracker, T0, (1, 5, None))
+    tracker.observe(ArrivalsResponse(stop_id=7, lines=[]), now=T0 + 120)
+    assert 42 not in tracker._stops
+
+    disabled = EtaTracker(history_size=0)
+    assert _observe(disabled, T0, (1, 5, None)).expected_at is None
+    assert len(disabled) == 0
@@ -0,0 +1,48 @@
+from app.models.transit import StopSummary
+from app.services.geo import StopGeoIndex, haversine_meters
+
+
+def _stop(stop_id: int, lat: float, lon: float) -> StopSummary:
+    return StopSummary(id=stop_id, name=f"Parada {stop_id}", latitude=lat, longitude=lon, lines=[3])
+
+
+STOPS = [
+    _stop(1, 43.3700, -8.4000),
+    _stop(2, 43.3710, -8.4000),  # ~111 m al norte
+    _stop(3, 43.3700, -8.4100),  # ~810 m al oeste
+    _stop(4, 43.3900, -8.4000),  # ~2.2 km al norte
+    _stop(5, 0.0, 0.0),  # sin coordenadas
+]
+
+
+def test_haversine_matches_known_distance() -> None:
+    assert abs(haversine_meters(43.37, -8.40, 43.38, -8.40) - 1112) < 2
+
+
+def test_nearby_orders_by_distance_within_radius() -> None:
+    index = StopGeoIndex(STOPS)
+    assert len(index) == 4
+
+    results = index.nearby(43.3701, -8.4000, radius_meters=1000, limit=10)
+    assert [stop.id for stop, _ in results] == [1, 2, 3]
+    assert results[0][1] < results[1][1] < results[2][1] <= 1000
+
+    assert [stop.id for stop, _ in index.nearby(43.3701, -8.4, 1000, limit=1)] == [1]
+    assert index.nearby(0.0, 0.0, 5000, limit=10) == []
+
+
+def test_nearby_matches_brute_force() -> None:
+    grid = [
+        _stop(i * 100 + j, 43.35 + i * 0.002, -8.42 + j * 0.003)
+        for i in range(20)
+        for j in range(20)
+    ]
+    index = StopGeoIndex(grid)
+    lat, lon, radius = 43.365, -8.39, 900
+    expected = sorted(
+        (haversine_meters(lat, lon, stop.latitude, stop.longitude), stop.id)
+        for stop in grid
+        if haversine_meters(lat, lon, stop.latitude, stop.longitude) <= radius
+    )
+    got = [stop.id for stop, _ in index.nearby(lat, lon, radius, limit=len(grid))]
+    assert got == [stop_id for _, stop_id in expected]
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from app.services.jsonstream import JsonArrayStream
+
+DOCUMENT = {
+    "meta": {"skipped": [1, 2.5, None, 'comillas " y \\u00e9'], "n": -12e3},
+    "data": {
+        "items": [{"id": 1, "name": "Riazor"}, {"id": 2, "name": "Elviña"}, [], None, 17],
+        "other": [{"id": 3}],
+    },
+}
+
+
+def _parse(body: bytes, chunk_size: int) -> list:
+    items: list = []
+    parser = JsonArrayStream({("data", "items"): items.append})
+    for start in range(0, len(body), chunk_size):
+        parser.feed(body[start : start + chunk_size])
+    parser.close()
+    return items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 10_000])
+def test_items_are_handed_over_whatever_the_chunking(chunk_size: int) -> None:
+    for indent in (None, 2):
+        body = json.dumps(DOCUMENT, indent=indent, ensure_ascii=False).encode()
+        assert _parse(body, chunk_size) == DOCUMENT["data"]["items"]
+
+
+@pytest.mark.parametrize(
+    "body", [b"", b'{"data": {"items": [1, 2', b'{"data" 1}', b"{} {}", b'{"data": [1,]}']
+)
+def test_malformed_documents_raise_value_error(body: bytes) -> None:
+    with pytest.raises(ValueError):
+        _parse(body, 4)
+
+
+SCALARS = {"data": {"ver": 2.5, "exp": -1.5e-3, "items": [1.25, 6e2, {"id": 1}, 0.5, True], "n": 3}}
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 40))
+def test_numbers_split_across_chunks_are_deferred(chunk_size: int) -> None:
+    body = json.dumps(SCALARS, separators=(",", ":")).encode()
+    assert _parse(body, chunk_size) == SCALARS["data"]["items"]
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.core.logging import request_id_ctx
+from app.models.transit import ArrivalsResponse
+from app.services.live import ArrivalsBroadcaster, LiveError
+
+
+class UpstreamDown(Exception):
+    pass
+
+
+@pytest.mark.anyio("asyncio")
+async def test_subscribers_share_one_poller() -> None:
+    calls: list[int] = []
+
+    async def fetch(stop_id: int) -> ArrivalsResponse:
+        calls.append(stop_id)
+        return ArrivalsResponse(stop_id=stop_id, lines=[])
+
+    broadcaster = ArrivalsBroadcaster(fetch, interval_seconds=60)
+    async with broadcaster.subscribe(42) as first, broadcaster.subscribe(42) as second:
+        update_a = await asyncio.wait_for(first.get(), timeout=1)
+        update_b = await asyncio.wait_for(second.get(), timeout=1)
+        assert update_a is update_b
+        assert broadcaster.subscriber_count(42) == 2
+
+        async with broadcaster.subscribe(42) as late:
+            # Quien llega tarde recibe el último dato sin provocar otra consulta.
+            assert late.get_nowait() is update_a
+
+    assert calls == [42]
+    assert broadcaster.watched_stops == 0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_poller_publishes_errors_and_stops_without_subscribers() -> None:
+    async def fetch(stop_id: int) -> ArrivalsResponse:
+        raise UpstreamDown("transit_api_unavailable")
+
+    broadcaster = ArrivalsBroadcaster(fetch, interval_seconds=60, error_type=UpstreamDown)
+    async with broadcaster.subscribe(7) as updates:
+        update = await asyncio.wait_for(updates.get(), timeout=1)
+        assert update == LiveError(detail="transit_api_unavailable")
+        task = broadcaster._channels[7].task
+
+    assert task is not None
+    await asyncio.sleep(0)
+    assert task.cancelled()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_poller_does_not_inherit_the_request_id() -> None:
+    request_ids: list[str | None] = []
+
+    async def fetch(stop_id: int) -> ArrivalsResponse:
+        request_ids.append(request_id_ctx.get())
+        return ArrivalsResponse(stop_id=stop_id, lines=[])
+
+    broadcaster = ArrivalsBroadcaster(fetch, interval_seconds=60)
+    token = request_id_ctx.set("req-1")
+    try:
+        async with broadcaster.subscribe(42) as updates:
+            await asyncio.wait_for(updates.get(), timeout=1)
+    finally:
+        request_id_ctx.reset(token)
+
+    assert request_ids == [None]
@@ -0,0 +1,80 @@
+import json
+import logging
+import queue
+import sys
+
+from app.core import logging as logging_module
+from app.core.logging import (
+    AccessLogSampler,
+    ContextQueueHandler,
+    JsonLogFormatter,
+    request_id_ctx,
+)
+
+
+def _record(msg: str, *args, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_queue_handler_captures_context_without_formatting() -> None:
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    token = request_id_ctx.set("req-1")
+    try:
+        handler.emit(_record("Parada %s", 42))
+    finally:
+        request_id_ctx.reset(token)
+
+    queued = log_queue.get_nowait()
+    assert queued.msg == "Parada %s"
+    assert queued.args == (42,)
+    payload = json.loads(JsonLogFormatter().format(queued))
+    assert payload["event"] == "Parada 42"
+    assert payload["request_id"] == "req-1"
+
+
+def test_formatter_emits_extras_and_utc_timestamp() -> None:
+    record = _record("Serving stale arrivals", stop_id=42, age_seconds=12.5)
+    payload = json.loads(JsonLogFormatter().format(record))
+    assert payload["stop_id"] == 42
+    assert payload["age_seconds"] == 12.5
+    assert payload["ts"].endswith("+00:00")
+
+
+def test_access_sampler_keeps_errors() -> None:
+    sampler = AccessLogSampler(0.0)
+    ok = _record('%s - "%s %s HTTP/%s" %d', "1.2.3.4", "GET", "/health", "1.1", 200)
+    failed = _record('%s - "%s %s HTTP/%s" %d', "1.2.3.4", "GET", "/api", "1.1", 502)
+    assert sampler.filter(ok) is False
+    assert sampler.filter(failed) is True
+    assert AccessLogSampler(1.0).filter(ok) is True
+
+
+def test_setup_logging_writes_from_background_thread(capsys, monkeypatch) -> None:
+    # Stream del listener que instaló app.main al importarse (el stderr capturado por pytest).
+    original = logging_module._listener.handlers[0].stream
+    logging_module.setup_logging()
+    try:
+        logging.getLogger("app.test").warning("hola %s", "mundo", extra={"stop_id": 7})
+        logging_module._stop_listener()  # vacía la cola
+        line = capsys.readouterr().err.strip().splitlines()[-1]
+        payload = json.loads(line)
+        assert payload["event"] == "hola mundo"
+        assert payload["stop_id"] == 7
+    finally:
+        # Se vuelve a enlazar con ese stream, no con el de capsys.
+        monkeypatch.setattr(sys, "stderr", original)
+        logging_module.setup_logging()
+
+
+def test_log_lines_are_ascii_with_and_without_orjson(monkeypatch) -> None:
+    payload = {"event": "Parada Praza de Pontevedra, A Coruña 🚌", "stop_id": 42}
+    fast = logging_module._dumps(payload)
+    monkeypatch.setattr(logging_module, "orjson", None)
+    plain = logging_module._dumps(payload)
+
+    assert fast.isascii() and plain.isascii()
+    assert json.loads(fast) == json.loads(plain) == payload
+    assert "Coru\\u00f1a \\ud83d\\ude8c" in fast
@@ -0,0 +1,104 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.types import Message, Receive, Scope, Send
+
+from app.core.metrics import (
+    CACHE_REQUESTS,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    HTTP_STREAMS_OPEN,
+    Counter,
+    Histogram,
+    Registry,
+)
+from app.core.middleware import MetricsMiddleware
+from app.services.cache import TTLCache
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    histogram = Histogram("latency_seconds", "Latencia.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(3.0, "/a")
+    registry = Registry()
+    registry.register(histogram)
+
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+    assert 'latency_seconds_sum{route="/a"} 3.55' in text
+
+
+def test_counter_escapes_label_values() -> None:
+    counter = Counter("errors_total", "Errores.", ("reason",))
+    counter.inc('bad "quote"')
+    registry = Registry()
+    registry.register(counter)
+    assert 'errors_total{reason="bad \\"quote\\""} 1' in registry.render()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_named_cache_counts_hits_and_misses() -> None:
+    cache: TTLCache[int, str] = TTLCache(ttl_seconds=60, max_entries=4, name="test")
+    before_hit = CACHE_REQUESTS.value("test", "hit")
+    before_miss = CACHE_REQUESTS.value("test", "miss")
+
+    async def loader() -> str:
+        return "a"
+
+    await cache.get_or_load(1, loader)
+    await cache.get_or_load(1, loader)
+
+    assert CACHE_REQUESTS.value("test", "miss") == before_miss + 1
+    assert CACHE_REQUESTS.value("test", "hit") == before_hit + 1
+
+
+def test_metrics_endpoint_exposes_route_latency(client: TestClient, fake_service) -> None:
+    client.get(f"/api/stops/{fake_service.stop.id}")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/api/stops/{stop_id}",status="200"}'
+        in text
+    )
+    assert "http_requests_in_flight 1" in text
+    assert "catalog_age_seconds" in text
+
+
+@pytest.mark.anyio("asyncio")
+async def test_event_streams_are_counted_apart_from_requests() -> None:
+    seen: list[tuple[float, float]] = []
+
+    async def stream(scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream; charset=utf-8")],
+            }
+        )
+        seen.append((HTTP_REQUESTS_IN_FLIGHT.value(), HTTP_STREAMS_OPEN.value("/sse/{path}")))
+        await send({"type": "http.response.body", "body": b"data: {}\n\n"})
+
+    async def send(message: Message) -> None:
+        return None
+
+    async def receive() -> Message:
+        return {"type": "http.disconnect"}
+
+    in_flight = HTTP_REQUESTS_IN_FLIGHT.value()
+    count = HTTP_REQUEST_DURATION.count("GET", "/sse/{path}", "200")
+    scope = {"type": "http", "method": "GET", "endpoint": stream, "root_path": "/sse"}
+    await MetricsMiddleware(stream)(scope, receive, send)
+
+    # Mientras el stream está abierto no cuenta como petición en curso.
+    assert seen == [(in_flight, 1)]
+    assert HTTP_REQUESTS_IN_FLIGHT.value() == in_flight
+    assert HTTP_STREAMS_OPEN.value("/sse/{path}") == 0
+    assert HTTP_REQUEST_DURATION.count("GET", "/sse/{path}", "200") == count
@@ -0,0 +1,37 @@
+import logging
+
+from fastapi.testclient import TestClient
+
+from app.core.config import get_settings
+from app.core.logging import JsonLogFormatter, request_started_ctx
+
+
+def test_request_id_is_echoed_from_request(client: TestClient) -> None:
+    response = client.get("/health", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["X-Request-ID"] == "abc-123"
+
+
+def test_request_id_is_generated_and_unique(client: TestClient) -> None:
+    first = client.get("/health").headers["X-Request-ID"]
+    second = client.get("/health").headers["X-Request-ID"]
+    assert first and second and first != second
+    assert first.split("-")[0] == second.split("-")[0]
+
+
+def test_request_timing_adds_server_timing_header(client: TestClient, monkeypatch) -> None:
+    monkeypatch.setattr(get_settings(), "request_timing_enabled", True)
+    response = client.get("/health")
+    assert response.headers["Server-Timing"].startswith("app;dur=")
+
+    monkeypatch.setattr(get_settings(), "request_timing_enabled", False)
+    assert "Server-Timing" not in client.get("/health").headers
+
+
+def test_log_records_include_elapsed_time_when_timing() -> None:
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "hola", None, None)
+    token = request_started_ctx.set(0.0)
+    try:
+        assert '"elapsed_ms"' in JsonLogFormatter().format(record)
+    finally:
+        request_started_ctx.reset(token)
+    assert '"elapsed_ms"' not in JsonLogFormatter().format(record)
@@ -0,0 +1,117 @@
+import asyncio
+from time import monotonic
+
+import pytest
+
+from app.models.transit import ArrivalBus, ArrivalsResponse, LineArrivals
+from app.services.circuit import CircuitState
+from app.services.prefetch import PrefetchScheduler, TokenBucket
+from app.services.transit import TransitService
+
+
+def _scheduler(max_stops: int = 2, **overrides) -> PrefetchScheduler:
+    async def refresh(stop_id: int, ttl: float) -> None:
+        return None
+
+    options = {
+        "primary_stop_id": 42,
+        "max_stops": max_stops,
+        "min_interval_seconds": 15.0,
+        "max_interval_seconds": 120.0,
+        "half_life_seconds": 300.0,
+        "ttl_slack_seconds": 8.0,
+        **overrides,
+    }
+    return PrefetchScheduler(refresh, lambda stop_id: None, TokenBucket(0, 1), **options)
+
+
+def _cached(eta_minutes: int | None, age: float) -> tuple[ArrivalsResponse, float]:
+    bus = ArrivalBus(bus_id=1, eta_minutes=eta_minutes)
+    return ArrivalsResponse(stop_id=7, lines=[LineArrivals(line_id=3, buses=[bus])]), age
+
+
+def test_hottest_stops_are_prefetched_and_primary_is_always_kept() -> None:
+    scheduler = _scheduler(max_stops=2)
+    for _ in range(5):
+        scheduler.record(7, now=0.0)
+    for _ in range(3):
+        scheduler.record(8, now=0.0)
+    scheduler.record(9, now=0.0)
+    scheduler.record(10, now=-600.0)
+    scheduler.record(11, now=-3000.0)
+
+    hot = scheduler.hot_stops(now=0.0)
+    assert [stop_id for stop_id, _ in hot] == [7, 42]
+    # Pedida una vez hace dos semividas ya no está caliente; hace diez, se olvida.
+    assert 10 in scheduler._demand
+    assert 11 not in scheduler._demand
+    assert [stop_id for stop_id, _ in scheduler.hot_stops(now=1200.0)] == [42]
+
+
+def test_interval_follows_popularity_and_nearest_bus() -> None:
+    scheduler = _scheduler()
+    assert scheduler.interval(1.0, None) == 120.0
+    assert scheduler.interval(4.0, None) == 30.0
+    assert scheduler.interval(100.0, None) == 15.0
+    # Bus a 2 minutos hace 20 s: quedan 100 s, se refresca cada 50 s.
+    assert scheduler.interval(1.0, _cached(2, age=20.0)) == 50.0
+    assert scheduler.interval(1.0, _cached(None, age=20.0)) == 120.0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_token_bucket_caps_the_rate() -> None:
+    bucket = TokenBucket(rate=200, burst=2)
+    started = monotonic()
+    for _ in range(6):
+        await bucket.acquire()
+    # Dos del burst y cuatro a 200/s: al menos 20 ms.
+    assert monotonic() - started >= 0.019
+    assert TokenBucket(rate=0, burst=1).available() == float("inf")
+
+
+@pytest.mark.anyio("asyncio")
+async def test_primary_stop_is_warm_before_the_first_request(
+    fake_upstream, service_settings
+) -> None:
+    settings = service_settings.model_copy(
+        update={"arrivals_cache_ttl_seconds": 1, "prefetch_max_stops": 4}
+    )
+    service = TransitService(settings=settings)
+    await service.start()
+    try:
+        for _ in range(100):
+            if 42 in service._arrivals_cache._entries:
+                break
+            await asyncio.sleep(0.01)
+        # La entrada precargada dura hasta el siguiente refresco, no el TTL normal.
+        stored_at, expires_at, _ = service._arrivals_cache._entries[42]
+        assert expires_at - stored_at == 128.0
+        arrivals = await service.get_arrivals(42)
+        assert arrivals.lines[0].buses[0].eta_minutes == 3
+        assert fake_upstream.calls["arrivals"] == 1
+        assert service.prefetch.score(42, monotonic()) > 0.9
+    finally:
+        await service.close()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_cancelled_budget_wait_releases_the_half_open_probe(service_settings) -> None:
+    service = TransitService(settings=service_settings)
+    service.budget = TokenBucket(rate=1, burst=1)
+    await service.budget.acquire()
+    breaker = service.breaker
+    breaker._state = CircuitState.OPEN
+    breaker._opened_at = monotonic() - breaker.open_seconds
+
+    async def read(response):
+        return None
+
+    task = asyncio.create_task(service._fetch("https://example.com/x", read, "arrivals"))
+    await asyncio.sleep(0.01)
+    assert breaker.state is CircuitState.HALF_OPEN
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # Sin liberar la sonda, el circuito quedaría semiabierto y cerrado a todo.
+    assert breaker.allow_request()
+    await service.close()
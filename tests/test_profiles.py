@@ -0,0 +1,100 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.app_config import AppConfig
+from app.core.config import Settings
+from app.main import app
+from app.services.transit import TransitService, UnknownProfileError, get_transit_service
+from tests.conftest import FakeUpstream
+
+APP_CONFIG = AppConfig(
+    primary_stop_id=42,
+    interest_lines=["3"],
+    profiles={
+        "norte": {"primary_stop_id": 7, "interest_lines": ["1"]},
+        "centro": {"primary_stop_id": 42, "interest_lines": ["1"]},
+    },
+)
+
+
+@pytest.fixture()
+def service(fake_upstream: FakeUpstream, service_settings: Settings) -> TransitService:
+    return TransitService(settings=service_settings, app_config=APP_CONFIG)
+
+
+def test_profile_names_are_validated() -> None:
+    with pytest.raises(ValueError):
+        AppConfig(profiles={"default": {}})
+    with pytest.raises(ValueError):
+        AppConfig(profiles={"Con Espacios": {}})
+
+
+@pytest.mark.anyio("asyncio")
+async def test_profiles_share_one_catalog_download(
+    service: TransitService, fake_upstream: FakeUpstream
+) -> None:
+    assert [stop.id for stop in await service.search_stops(None)] == [42]
+    assert [stop.id for stop in await service.search_stops(None, profile="norte")] == [42, 7]
+    assert (await service.get_stop(42, "norte")).lines == [1]  # type: ignore[union-attr]
+    assert (await service.get_stop(42)).lines == [3]  # type: ignore[union-attr]
+    assert await service.get_catalog_version("norte") != await service.get_catalog_version()
+    # Perfiles con las mismas líneas comparten vista y cuerpos renderizados.
+    assert await service._load_view("norte") is await service._load_view("centro")
+    assert await service.get_rendered_catalog("norte") is await service.get_rendered_catalog(
+        "centro"
+    )
+    assert fake_upstream.calls == {"stops": 1, "arrivals": 0}
+    with pytest.raises(UnknownProfileError):
+        await service.get_stop(42, "nope")
+
+
+@pytest.mark.anyio("asyncio")
+async def test_profile_views_share_stop_records(service: TransitService) -> None:
+    default = await service._load_view(None)
+    norte = await service._load_view("norte")
+
+    assert norte.stops_by_id is default.stops_by_id
+    assert norte.interest_stops[0] is default.stops_by_id[42]
+    assert default.interest_mask != norte.interest_mask
+    assert default.stops_by_id[7].line_mask & default.interest_mask == 0
+    assert norte.summary(norte.stops_by_id[42]).model_dump()["lines"] == [1]
+
+
+@pytest.mark.anyio("asyncio")
+async def test_profiles_share_one_arrivals_cache(
+    service: TransitService, fake_upstream: FakeUpstream
+) -> None:
+    default = await service.get_arrivals(42)
+    norte = await service.get_arrivals(42, "norte")
+
+    assert [line.line_id for line in default.lines] == [3]
+    assert [line.line_id for line in norte.lines] == [1]
+    assert await service.get_arrivals(42, "centro") is norte
+    body = service.arrivals_body(norte, "norte")
+    assert service.arrivals_body(norte, "norte") is body
+    assert b'"line_id":1,' in body
+    assert fake_upstream.calls["arrivals"] == 1
+
+
+def test_profile_prefix_routes_requests(service: TransitService) -> None:
+    app.dependency_overrides[get_transit_service] = lambda: service
+    with TestClient(app) as client:
+        default = client.get("/api/stops").json()
+        norte = client.get("/p/norte/api/stops").json()
+        arrivals = client.get("/p/norte/api/stops/42/arrivals").json()
+        page = client.get("/p/norte/")
+        missing = client.get("/p/nope/api/stops")
+        static = client.get("/p/norte/static/app.js")
+        missing_static = client.get("/p/nope/static/app.js")
+
+    assert [stop["id"] for stop in default["stops"]] == [42]
+    assert [stop["id"] for stop in norte["stops"]] == [42, 7]
+    assert [line["line_id"] for line in arrivals["lines"]] == [1]
+    assert page.status_code == 200
+    assert 'data-base-path="/p/norte"' in page.text
+    assert missing.status_code == 404
+    assert missing.json()["detail"] == "profile_not_found"
+    assert static.status_code == 200
+    # El perfil se valida antes de llegar a los ficheros estáticos.
+    assert missing_static.status_code == 404
+    assert missing_static.json() == {"detail": "profile_not_found", "code": 404}
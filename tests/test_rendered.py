@@ -0,0 +1,66 @@
+import gzip
+import json
+
+from starlette.requests import Request
+
+from app.core.http_cache import RenderedBody, rendered_response
+from app.models.transit import StopSummary
+from app.services.catalog import build_catalog_index
+from app.services.rendered import RenderedCatalog
+
+
+def _catalog(size: int):
+    stops = [
+        StopSummary(id=i, name=f"Parada número {i:04d}", latitude=43.3, longitude=-8.4, lines=[3])
+        for i in range(size)
+    ]
+    return build_catalog_index(stops)
+
+
+def test_stop_list_is_rendered_once_per_catalog() -> None:
+    rendered = RenderedCatalog(_catalog(300))
+
+    full = rendered.stop_list(400)
+    assert rendered.stop_list(300) is full
+    assert json.loads(full.content)["total"] == 300
+    assert rendered.stop_list(10) is rendered.stop_list(10)
+    assert rendered.stop_list(10).etag != full.etag
+
+    detail = rendered.stop_detail(7)
+    assert detail is not None
+    assert json.loads(detail.content)["id"] == 7
+    assert rendered.stop_detail(1234) is None
+
+
+def test_large_bodies_get_compressed_variants() -> None:
+    full = RenderedCatalog(_catalog(300)).stop_list(400)
+
+    assert full.gzip_content is not None
+    assert gzip.decompress(full.gzip_content) == full.content
+    assert full.encoded("gzip, deflate") == (full.gzip_content, "gzip")
+    assert full.encoded("gzip;q=0, identity") == (full.content, None)
+
+    small = RenderedBody.render(b"{}", '"x"')
+    assert small.encoded("gzip, br") == (b"{}", None)
+
+
+def _request(**headers: str) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+def test_each_encoding_has_its_own_etag() -> None:
+    full = RenderedCatalog(_catalog(300)).stop_list(400)
+
+    plain = rendered_response(_request(), full, "no-cache")
+    gzipped = rendered_response(_request(accept_encoding="gzip"), full, "no-cache")
+    assert plain.headers["etag"] == full.etag
+    assert gzipped.headers["etag"] == full.etag[:-1] + '-gzip"'
+
+    # Una variante ya guardada sigue valiendo aunque ahora se pida otra codificación.
+    cached = rendered_response(
+        _request(accept_encoding="gzip", if_none_match=full.etag), full, "no-cache"
+    )
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == gzipped.headers["etag"]
+    assert cached.headers["vary"] == "Accept-Encoding"
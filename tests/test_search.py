@@ -0,0 +1,52 @@
+from app.models.transit import StopSummary
+from app.services.search import StopSearchIndex, fold
+
+
+def _stop(stop_id: int, name: str) -> StopSummary:
+    return StopSummary(id=stop_id, name=name, latitude=0.0, longitude=0.0, lines=[])
+
+
+STOPS = sorted(
+    [
+        _stop(1, "Avda. de Oza, 12"),
+        _stop(2, "Plaza de España"),
+        _stop(3, "Pza. España"),
+        _stop(4, "Rúa San Andrés"),
+        _stop(5, "Avenida do Exército"),
+        _stop(42, "Emilio González López"),
+    ],
+    key=lambda stop: stop.name,
+)
+
+
+def _ids(results: list[StopSummary]) -> list[int]:
+    return [stop.id for stop in results]
+
+
+def test_fold_strips_accents_and_case() -> None:
+    assert fold("Plaza de ESPAÑA") == "plaza de espana"
+
+
+def test_accent_insensitive_token_match() -> None:
+    index = StopSearchIndex(STOPS)
+    assert _ids(index.search("espana", limit=10)) == [2, 3]
+    assert _ids(index.search("andres", limit=10)) == [4]
+
+
+def test_prefix_matches_rank_before_token_and_substring() -> None:
+    index = StopSearchIndex(STOPS)
+    assert _ids(index.search("avda", limit=10)) == [1]
+    assert _ids(index.search("plaza espa", limit=10)) == [2]
+    # "pla" prefixes "Plaza de España"; "laz" only appears inside it as a substring.
+    assert _ids(index.search("laz", limit=10)) == [2]
+    assert _ids(index.search("ez lo", limit=10)) == [42]
+    assert _ids(index.search("e", limit=10))[0] == 42
+    # Fragmentos más cortos que un trigrama también encuentran subcadenas.
+    assert _ids(index.search("za", limit=10)) == [1, 42, 2, 3]
+
+
+def test_empty_query_and_id_lookup() -> None:
+    index = StopSearchIndex(STOPS)
+    assert _ids(index.search("  ", limit=2)) == _ids(STOPS[:2])
+    assert _ids(index.search("42", limit=10)) == [42]
+    assert index.search("zzz", limit=10) == []
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app.core.config import Settings
+from app.services.shared import SharedStore
+from app.services.transit import TransitService
+from tests.conftest import FakeUpstream
+
+
+@pytest.fixture()
+def shared_settings(tmp_path, service_settings: Settings) -> Settings:
+    return service_settings.model_copy(
+        update={"shared_cache_path": str(tmp_path / "shared.sqlite")}
+    )
+
+
+def test_lease_is_exclusive_until_released_or_expired(tmp_path) -> None:
+    first = SharedStore(tmp_path / "shared.sqlite")
+    second = SharedStore(tmp_path / "shared.sqlite")
+
+    assert first.acquire("catalog", 30)
+    assert first.acquire("catalog", 30)  # el titular puede renovarlo
+    assert not second.acquire("catalog", 30)
+    first.release("catalog")
+    assert second.acquire("catalog", 0)
+    assert first.acquire("catalog", 30)  # caducado
+
+
+@pytest.mark.anyio("asyncio")
+async def test_workers_share_catalog_and_arrivals(
+    fake_upstream: FakeUpstream, shared_settings: Settings
+) -> None:
+    worker_a = TransitService(settings=shared_settings)
+    worker_b = TransitService(settings=shared_settings)
+    try:
+        first = await worker_a.get_arrivals(42)
+        second = await worker_b.get_arrivals(42)
+        assert fake_upstream.calls == {"stops": 1, "arrivals": 1}
+        assert second == first
+        assert (await worker_b.get_stop(42)) is not None
+    finally:
+        await worker_a.close()
+        await worker_b.close()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_concurrent_misses_fetch_upstream_once(
+    fake_upstream: FakeUpstream, shared_settings: Settings
+) -> None:
+    fake_upstream.delay = 0.05
+    workers = [TransitService(settings=shared_settings) for _ in range(3)]
+    try:
+        await asyncio.gather(*(worker._load_stops() for worker in workers))
+        results = await asyncio.gather(*(worker.get_arrivals(42) for worker in workers))
+        assert fake_upstream.calls == {"stops": 1, "arrivals": 1}
+        assert all(result == results[0] for result in results)
+    finally:
+        for worker in workers:
+            await worker.close()
@@ -0,0 +1,23 @@
+from app.services.records import StopRecord
+from app.services.snapshot import LineEntry, load_snapshot, save_snapshot
+
+
+def test_snapshot_round_trip(tmp_path) -> None:
+    path = tmp_path / "nested" / "catalog.json"
+    stops = [StopRecord(id=42, name="Praza de España", latitude=43.3, longitude=-8.4, lines=(3,))]
+    lines = [LineEntry(id=3, name="3", color="#C0910F", routes=((10, 42), (42, 10)))]
+
+    save_snapshot(path, stops, lines)
+    data = load_snapshot(path)
+
+    assert data is not None
+    assert data.stops == stops
+    assert data.lines == lines
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_missing_or_corrupt_snapshot_is_ignored(tmp_path) -> None:
+    assert load_snapshot(tmp_path / "missing.json") is None
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text('{"format": 1, "stops": [[1]]')
+    assert load_snapshot(corrupt) is None
@@ -41,3 +41,84 @@ def test_index_template_renders_stop_name(client: TestClient, fake_service):
     response = client.get("/")
     assert response.status_code == 200
     assert fake_service.stop.name in response.text
+
+
+def test_batch_arrivals_reports_errors_per_stop(client: TestClient, fake_service):
+    stop_id = fake_service.stop.id
+    response = client.get("/api/arrivals", params={"stops": f"{stop_id},999,{stop_id}"})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["stop_id"] for item in results] == [stop_id, 999]
+    assert results[0]["arrivals"]["stop_id"] == stop_id
+    assert results[0]["error"] is None
+    assert results[1] == {"stop_id": 999, "arrivals": None, "error": "stop_not_found"}
+
+
+def test_batch_arrivals_validates_stop_list(client: TestClient, fake_service):
+    assert client.get("/api/arrivals", params={"stops": "42,abc"}).status_code == 400
+    too_many = ",".join(str(i) for i in range(fake_service.settings.batch_max_stops + 1))
+    response = client.get("/api/arrivals", params={"stops": too_many})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "too_many_stops"
+
+
+def test_arrivals_stream_unknown_stop_returns_404(client: TestClient):
+    response = client.get("/api/stops/999/arrivals/stream")
+    assert response.status_code == 404
+
+
+def test_conditional_get_returns_304(client: TestClient, fake_service):
+    stop_id = fake_service.stop.id
+    for path in ("/api/stops?limit=400", f"/api/stops/{stop_id}", f"/api/stops/{stop_id}/arrivals"):
+        first = client.get(path)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert "max-age" in first.headers["cache-control"]
+
+        cached = client.get(path, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+        assert cached.content == b""
+
+        assert client.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_catalog_etag_changes_with_query(client: TestClient):
+    assert (
+        client.get("/api/stops").headers["etag"]
+        != client.get("/api/stops", params={"q": "emilio"}).headers["etag"]
+    )
+
+
+def test_stop_list_is_served_pre_rendered(client: TestClient, fake_service):
+    response = client.get("/api/stops", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()["stops"][0]["id"] == fake_service.stop.id
+
+
+def test_nearby_stops_endpoint(client: TestClient, fake_service):
+    stop = fake_service.stop
+    response = client.get(
+        "/api/stops/nearby", params={"lat": stop.latitude, "lon": stop.longitude + 0.001}
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["total"] == 1
+    assert payload["stops"][0]["id"] == stop.id
+    assert 0 < payload["stops"][0]["distance_meters"] < 100
+
+    far = client.get("/api/stops/nearby", params={"lat": 40.0, "lon": -3.7, "radius": 1000})
+    assert far.json()["total"] == 0
+    assert client.get("/api/stops/nearby", params={"lat": 43.3}).status_code == 422
+
+
+def test_stale_arrivals_are_served_with_no_cache(client: TestClient, fake_service):
+    fake_service.arrivals = fake_service.arrivals.model_copy(
+        update={"stale": True, "age_seconds": 42.0}
+    )
+    response = client.get(f"/api/stops/{fake_service.stop.id}/arrivals")
+    assert response.status_code == 200
+    assert response.json()["stale"] is True
+    assert response.json()["age_seconds"] == 42.0
+    assert response.headers["cache-control"] == "no-cache"
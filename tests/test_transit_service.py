@@ -1,92 +1,21 @@
+import asyncio
+import json
+
+import httpx
 import pytest
 
 from app.core.config import Settings
+from app.core.logging import request_id_ctx
+from app.core.metrics import UPSTREAM_REQUEST_DURATION
+from app.services import cache as cache_module
 from app.services.transit import TransitService, TransitServiceError
-
-STOPS_PAYLOAD = {
-    "iTranvias": {
-        "actualizacion": {
-            "paradas": [
-                {
-                    "id": 42,
-                    "nombre": "Demo Stop",
-                    "posx": -8.4,
-                    "posy": 43.37,
-                    "enlaces": [3, "12"],
-                },
-                {
-                    "id": 7,
-                    "nombre": "Other",
-                    "posx": -8.3,
-                    "posy": 43.3,
-                    "enlaces": [99],
-                },
-            ],
-            "lineas": [
-                {"id": 14, "lin_comer": "14", "color": "982135"},
-                {"id": 3, "lin_comer": "3", "color": "C0910F"},
-            ],
-        }
-    }
-}
-
-ARRIVALS_PAYLOAD = {
-    "buses": {
-        "lineas": [
-            {
-                "linea": "14",
-                "buses": [
-                    {
-                        "bus": "1002",
-                        "tiempo": "12",
-                        "distancia": "500",
-                        "estado": "0",
-                        "ult_parada": "12",
-                    },
-                    {
-                        "bus": "1001",
-                        "tiempo": "3",
-                        "distancia": "120",
-                        "estado": "0",
-                        "ult_parada": "13",
-                    },
-                ],
-            },
-            {
-                "linea": "3",
-                "buses": [
-                    {
-                        "bus": "2001",
-                        "tiempo": "----",
-                        "distancia": "3000",
-                        "estado": "1",
-                        "ult_parada": "90",
-                    }
-                ],
-            },
-        ]
-    }
-}
-
-
-@pytest.fixture()
-def service_settings() -> Settings:
-    return Settings(
-        stops_source_url="https://example.com/stops",
-        arrivals_url_template="https://example.com/arrivals?stop={stop_id}",
-        cache_ttl_seconds=60,
-    )
+from tests.conftest import ARRIVALS_PAYLOAD, STOPS_PAYLOAD, FakeUpstream
 
 
 @pytest.mark.anyio("asyncio")
-async def test_search_stops_uses_cache(monkeypatch, service_settings: Settings) -> None:
-    calls = {"count": 0}
-
-    async def fake_fetch(self, url):  # type: ignore[override]
-        calls["count"] += 1
-        return STOPS_PAYLOAD
-
-    monkeypatch.setattr(TransitService, "_fetch_json", fake_fetch)
+async def test_search_stops_uses_cache(
+    fake_upstream: FakeUpstream, service_settings: Settings
+) -> None:
     service = TransitService(settings=service_settings)
 
     first = await service.search_stops(None)
@@ -95,18 +24,13 @@ async def test_search_stops_uses_cache(monkeypatch, service_settings: Settings)
 
     second = await service.search_stops("demo")
     assert second
-    assert calls["count"] == 1
+    assert fake_upstream.calls["stops"] == 1
 
 
 @pytest.mark.anyio("asyncio")
-async def test_get_arrivals_orders_buses(monkeypatch, service_settings: Settings) -> None:
-    async def fake_fetch(self, url):  # type: ignore[override]
-        target = str(url)
-        if "func=7" in target:
-            return STOPS_PAYLOAD
-        return ARRIVALS_PAYLOAD
-
-    monkeypatch.setattr(TransitService, "_fetch_json", fake_fetch)
+async def test_get_arrivals_orders_buses(
+    fake_upstream: FakeUpstream, service_settings: Settings
+) -> None:
     service = TransitService(settings=service_settings)
 
     arrivals = await service.get_arrivals(42)
@@ -121,14 +45,294 @@ async def test_get_arrivals_orders_buses(monkeypatch, service_settings: Settings
 
 @pytest.mark.anyio("asyncio")
 async def test_catalog_fallback_when_source_unavailable(
-    monkeypatch, service_settings: Settings
+    patch_upstream, service_settings: Settings
 ) -> None:
     async def failing_fetch(self, url):  # type: ignore[override]
         raise TransitServiceError("boom")
 
-    monkeypatch.setattr(TransitService, "_fetch_json", failing_fetch)
+    patch_upstream(failing_fetch)
     service = TransitService(settings=service_settings)
 
     stops = await service.search_stops(None)
     assert stops[0].id == service_settings.default_stop_id
     assert stops[0].name.startswith("Parada")
+
+
+@pytest.mark.anyio("asyncio")
+async def test_fetch_json_reuses_shared_client(service_settings: Settings) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=STOPS_PAYLOAD)
+
+    service = TransitService(settings=service_settings, transport=httpx.MockTransport(handler))
+    await service.start()
+    client = service._client
+    assert client is not None
+
+    await service._fetch_json("https://example.com/a")
+    await service._fetch_json("https://example.com/b")
+    assert service._client is client
+
+    await service.close()
+    assert client.is_closed
+    assert service._client is None
+
+
+@pytest.mark.anyio("asyncio")
+async def test_catalog_is_parsed_while_streaming(service_settings: Settings) -> None:
+    body = json.dumps(STOPS_PAYLOAD).encode()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=httpx.ByteStream(body))
+
+    service = TransitService(settings=service_settings, transport=httpx.MockTransport(handler))
+    downloads = UPSTREAM_REQUEST_DURATION.count("catalog")
+    stops, lines = await service._fetch_catalog()
+    assert UPSTREAM_REQUEST_DURATION.count("catalog") == downloads + 1
+    assert [stop.id for stop in stops] == [42, 7]
+    assert stops[0].lines == (3, 12, 1)
+    assert [(line.id, line.color) for line in lines] == [
+        (14, "#982135"),
+        (3, "#C0910F"),
+        (1, "#E3000F"),
+    ]
+
+    catalog = await service._load_stops()
+    assert [stop.id for stop in catalog.interest_stops] == [42]
+    await service.close()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_get_arrivals_coalesces_and_caches(
+    fake_upstream: FakeUpstream, service_settings: Settings
+) -> None:
+    fake_upstream.delay = 0.01
+    service = TransitService(settings=service_settings)
+
+    results = await asyncio.gather(*(service.get_arrivals(42) for _ in range(5)))
+    assert all(result is results[0] for result in results)
+    await service.get_arrivals(42)
+    assert fake_upstream.calls["arrivals"] == 1
+
+
+@pytest.mark.anyio("asyncio")
+async def test_get_stop_uses_prebuilt_interest_view(
+    fake_upstream: FakeUpstream, service_settings: Settings
+) -> None:
+    service = TransitService(settings=service_settings)
+
+    stop = await service.get_stop(42)
+    assert stop is not None
+    assert stop.lines == [3]
+    assert await service.get_stop(42) == stop
+    assert await service.get_stop(7) is not None
+    assert await service.get_stop(1234) is None
+    assert [item.id for item in await service.search_stops(None)] == [42]
+
+
+def test_direction_table_is_precomputed(service_settings: Settings) -> None:
+    service = TransitService(settings=service_settings)
+    entries = service._parse_line_entries(
+        [
+            {
+                "id": 3,
+                "lin_comer": "3",
+                "rutas": [
+                    {"paradas": ["10", "11", "42"]},
+                    {"paradas": [50, "42", "11", "10"]},
+                ],
+            },
+            {"id": 14, "lin_comer": "14", "rutas": [{"paradas": [60, 61]}, {"paradas": [61, 7]}]},
+        ]
+    )
+    lines = service._build_line_catalog(entries)
+
+    # (ida, posición): ida si la ruta empieza en el origen de la línea.
+    assert lines.stop_positions[(3, 42)] == (True, 2)
+    assert lines.stop_positions[(3, 50)] == (False, 0)
+    assert (99, 42) not in lines.stop_positions
+    assert lines.stop_positions[(14, 7)] == (False, 1)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_expired_catalog_is_served_while_refreshing(
+    patch_upstream, service_settings: Settings
+) -> None:
+    release = asyncio.Event()
+    calls = {"count": 0}
+    request_ids: list[str | None] = []
+
+    async def fake_fetch(self, url):  # type: ignore[override]
+        calls["count"] += 1
+        request_ids.append(request_id_ctx.get())
+        if calls["count"] > 1:
+            await release.wait()
+        return STOPS_PAYLOAD
+
+    patch_upstream(fake_fetch)
+    service = TransitService(settings=service_settings)
+    first = await service._load_stops()
+    assert service.catalog_age_seconds is not None
+
+    service._cache_expires_at = 0.0
+    token = request_id_ctx.set("req-1")
+    try:
+        assert await service._load_stops() is first
+    finally:
+        request_id_ctx.reset(token)
+    assert await service.get_stop(42) is not None
+    await asyncio.sleep(0)
+    assert calls["count"] == 2
+    # El refresco en segundo plano no hereda el request_id de quien lo disparó.
+    assert request_ids == [None, None]
+
+    release.set()
+    assert service._refresh_task is not None
+    assert await service._refresh_task is True
+    assert service._catalog is not first
+
+
+@pytest.mark.anyio("asyncio")
+async def test_failed_refresh_keeps_snapshot_and_backs_off(
+    patch_upstream, service_settings: Settings
+) -> None:
+    responses: list[dict | Exception] = [STOPS_PAYLOAD, TransitServiceError("boom")]
+
+    async def fake_fetch(self, url):  # type: ignore[override]
+        result = responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    patch_upstream(fake_fetch)
+    service = TransitService(settings=service_settings)
+    catalog = await service._load_stops()
+
+    assert await service.refresh_catalog(force=True) is False
+    assert service._catalog is catalog
+    assert service._refresh_failures == 1
+    assert service._cache_expires_at > 0
+
+
+@pytest.mark.anyio("asyncio")
+async def test_catalog_snapshot_survives_restart_during_outage(
+    patch_upstream, tmp_path, fake_upstream: FakeUpstream, service_settings: Settings
+) -> None:
+    settings = service_settings.model_copy(
+        update={"catalog_snapshot_path": str(tmp_path / "catalog.json")}
+    )
+    await TransitService(settings=settings).refresh_catalog(force=True)
+    assert (tmp_path / "catalog.json").exists()
+
+    async def failing_fetch(self, url):  # type: ignore[override]
+        raise TransitServiceError("boom")
+
+    patch_upstream(failing_fetch)
+    restarted = TransitService(settings=settings)
+    stops = await restarted.search_stops(None)
+    assert [stop.name for stop in stops] == ["Demo Stop"]
+    assert restarted.catalog_age_seconds is not None
+    assert (await restarted.get_stop(42)).lines == [3]
+
+
+@pytest.mark.anyio("asyncio")
+async def test_batch_arrivals_isolates_upstream_failures(
+    patch_upstream, service_settings: Settings
+) -> None:
+    async def fake_fetch(self, url):  # type: ignore[override]
+        if str(url) == str(service_settings.stops_source_url):
+            return STOPS_PAYLOAD
+        if "stop=7" in str(url):
+            raise TransitServiceError("transit_api_unavailable")
+        return ARRIVALS_PAYLOAD
+
+    patch_upstream(fake_fetch)
+    service = TransitService(settings=service_settings)
+
+    results = await service.get_arrivals_batch([42, 7, 1234])
+    assert results[0].arrivals is not None
+    assert results[1].error == "transit_api_unavailable"
+    assert results[2].error == "stop_not_found"
+
+
+@pytest.mark.anyio("asyncio")
+async def test_malformed_stop_fails_the_half_open_probe(service_settings: Settings) -> None:
+    payload = json.loads(json.dumps(STOPS_PAYLOAD))
+    payload["iTranvias"]["actualizacion"]["paradas"][1]["posy"] = None
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=payload)
+
+    settings = service_settings.model_copy(
+        update={"circuit_failure_threshold": 1, "circuit_open_seconds": 0.0}
+    )
+    service = TransitService(settings=settings, transport=httpx.MockTransport(handler))
+    service.breaker.record_failure(0.1)
+    assert service.breaker.state.value == "half_open"
+
+    with pytest.raises(TransitServiceError, match="transit_api_invalid_response"):
+        await service._fetch_catalog()
+    # La sonda fallida reabre el circuito y deja pasar la siguiente.
+    assert service.breaker.allow_request()
+    await service.close()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_open_circuit_fails_fast_and_serves_stale_arrivals(
+    service_settings: Settings,
+) -> None:
+    calls = {"arrivals": 0}
+    healthy = {"value": True}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if str(request.url) == str(service_settings.stops_source_url):
+            return httpx.Response(200, json=STOPS_PAYLOAD)
+        calls["arrivals"] += 1
+        if healthy["value"]:
+            return httpx.Response(200, json=ARRIVALS_PAYLOAD)
+        return httpx.Response(503)
+
+    settings = service_settings.model_copy(
+        update={"arrivals_cache_ttl_seconds": 0.0, "circuit_failure_threshold": 2}
+    )
+    service = TransitService(settings=settings, transport=httpx.MockTransport(handler))
+
+    assert (await service.get_arrivals(42)).stale is False
+    healthy["value"] = False
+    for _ in range(2):
+        with pytest.raises(TransitServiceError):
+            await service.get_arrivals(7)
+    assert service.breaker.state.value == "open"
+
+    before = calls["arrivals"]
+    stale = await service.get_arrivals(42)
+    assert stale.stale is True
+    assert stale.lines
+    with pytest.raises(TransitServiceError):
+        await service.get_arrivals(7)
+    assert calls["arrivals"] == before
+    await service.close()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_upstream_failure_serves_aged_last_known_arrivals(
+    monkeypatch, fake_upstream: FakeUpstream, service_settings: Settings
+) -> None:
+    now = {"value": 1000.0}
+    monkeypatch.setattr(cache_module, "monotonic", lambda: now["value"])
+    service = TransitService(settings=service_settings)
+    fresh = await service.get_arrivals(42)
+    assert fresh.stale is False
+    assert fresh.age_seconds is None
+
+    fake_upstream.available = False
+    now["value"] += 130
+    stale = await service.get_arrivals(42)
+    assert stale.stale is True
+    assert stale.age_seconds == 130
+    assert [bus.eta_minutes for bus in stale.lines[0].buses] == [1, 10]
+    assert stale.lines[1].buses[0].eta_minutes is None
+    assert fresh.lines[0].buses[0].eta_minutes == 3
+
+    now["value"] += service_settings.arrivals_stale_max_age_seconds
+    with pytest.raises(TransitServiceError):
+        await service.get_arrivals(42)